@@ -1,18 +1,44 @@
 import json
+import argparse
 import os  # اضافه کردن import برای رفع خطای 'os' is not defined
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from listening_and_speaking.speech_to_text import SpeechRecognizer
-from listening_and_speaking.text_to_speech import TextToSpeech
+from listening_and_speaking.text_to_speech import TextToSpeech, StreamingSpeaker
 from search_pdf.pdf_search import PDFSearcher
-from request_ollama.ollama_api import OllamaAPI
-from web_scraping.web_searcher import WebSearcher
-from request_ollama.openrouter_api import OpenRouterAPI
+from search_pdf.context_builder import estimate_tokens
+from request_ollama.async_ollama_api import AsyncOllamaAPI
+from web_scraping.async_web_searcher import AsyncWebSearcher
+from request_ollama.async_openrouter_api import AsyncOpenRouterAPI
+from request_ollama.response_cache import ResponseCache
+from request_ollama.model_router import ModelRouter
 from utils.text_processing import TextProcessor
 from utils.environment import Environment
+from utils.rate_limiter import RateLimiter
 from tools.tool_manager import ToolManager
 
 
 class ChatBot:
-    def __init__(self, pdf_path: str = None):
+    # تنظیمات تولید پاسخ با Ollama
+    OLLAMA_OPTIONS = {
+        "temperature": 0.3,
+        "top_p": 0.9,
+        "num_predict": 1000
+    }
+    # تاریخچه به صورت پله‌ای کوتاه می‌شود (نه پنجره لغزان) تا پیشوند پرامپت بین نوبت‌ها ثابت بماند
+    MAX_HISTORY = 8
+    MIN_HISTORY = 4
+
+    def __init__(self, pdf_path: str = None, corpus: bool = False, stream_speech: bool = False,
+                 headless: bool = False):
+        """
+        Args:
+            pdf_path: مسیر یک فایل PDF برای جستجو فقط در همان فایل
+            corpus: در صورت True همه فایل‌های PDF پوشه search_pdf/pdf_files در یک مجموعه ادغام‌شده جستجو می‌شوند
+            stream_speech: در صورت True پاسخ مدل به صورت جریانی دریافت و هر جمله کامل همزمان با ادامه تولید پخش می‌شود
+            headless: در صورت True میکروفون و موتور گفتار راه‌اندازی نمی‌شوند (حالت دسته‌ای با run_batch)
+        """
         # بارگذاری متغیرهای محیطی
         Environment.load_env()
         self.model = Environment.get_env_variable("MODEL_NAME", "nomic-embed-text:latest")
@@ -31,31 +57,152 @@ class ChatBot:
             raise ValueError("متغیر محیطی ONLINE_MODEL_URL تنظیم نشده است.")
 
         self.current_model = "ollama"
-        self.ollama_api = OllamaAPI()
-        self.speech_recognizer = SpeechRecognizer()
-        self.text_to_speech = TextToSpeech()
+        self.stream_speech = stream_speech
+        self.ollama_api = AsyncOllamaAPI()
         self.pdf_searcher = None
-        self.web_searcher = WebSearcher()
+        self.pdf_name = None  # None یعنی جستجو در مجموعه ادغام‌شده همه PDF‌ها
         self.search_mode = "pdf"
         self.tool_manager = ToolManager()  # اضافه کردن مدیریت ابزار
         self.conversation_history = []  # اضافه کردن لیست برای ذخیره تاریخچه مکالمه
+        self.history_start = 0  # ابتدای بخشی از تاریخچه که به مدل فرستاده می‌شود
+        self.prompt_cache_stats = {"turns": 0, "reused_tokens": 0, "saved_ms": 0.0}
+        self.embedding_model = "nomic-embed-text:latest"  # مدل embedding پرسش‌ها (همان مدل جستجوی PDF)
+        self.verbose = True  # چاپ پرامپت کامل و متن زمینه هر نوبت
+        self.rate_limiters = {}  # نام سرویس (ollama، online، web) -> RateLimiter
+
+        # مراحل مستقل راه‌اندازی همزمان اجرا می‌شوند؛ بارگذاری مدل‌ها در Ollama در پس‌زمینه ادامه پیدا می‌کند
+        # تا اولین پاسخ هزینه بارگذاری مدل را نپردازد
+        self.startup_timings = {}
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=7, thread_name_prefix="startup")
+        self.warmup_futures = [
+            executor.submit(self._timed, f"بارگذاری مدل {self.model}", self.ollama_api.preload, self.model),
+            executor.submit(self._timed, f"بارگذاری مدل {self.embedding_model}", self.ollama_api.preload,
+                            self.embedding_model, embedding=True),
+        ]
+        if not headless:
+            speech_recognizer = executor.submit(self._timed, "میکروفون", SpeechRecognizer)
+            text_to_speech = executor.submit(self._timed, "espeak", TextToSpeech)
+        web_searcher = executor.submit(self._timed, "جستجوگر وب", AsyncWebSearcher)
+        response_cache = executor.submit(
+            self._timed, "کش پاسخ‌ها", ResponseCache,
+            similarity_threshold=float(Environment.get_env_variable("RESPONSE_CACHE_SIMILARITY", "0.95"))
+        )
+        pdf = executor.submit(self._timed, "پردازش PDF", self.init_pdf_searcher, pdf_path, corpus)
+        executor.shutdown(wait=False)
+
+        if headless:
+            self.speech_recognizer = self.text_to_speech = self.speaker = None
+        else:
+            self.speech_recognizer = speech_recognizer.result()
+            self.text_to_speech = text_to_speech.result()
+            self.speaker = StreamingSpeaker(self.text_to_speech)  # پخش در پس‌زمینه تا مراحل بعدی منتظر صدا نمانند
+        self.web_searcher = web_searcher.result()
+        self.response_cache = response_cache.result()
+        pdf.result()
+
+        # پاسخ‌های ساخته‌شده با نسخه قبلی نمایه PDF دیگر معتبر نیستند
+        if self.pdf_searcher:
+            scope, version = self.cache_scope()
+            removed = self.response_cache.invalidate(scope, version)
+            if removed:
+                print(f"{removed} پاسخ ذخیره‌شده به دلیل تغییر نمایه PDF حذف شد.")
+
+        # ایجاد نمونه از OpenRouterAPI اگر کلید API تنظیم شده باشد
+        if self.online_api_key:
+            self.openrouter_api = AsyncOpenRouterAPI(api_key=self.online_api_key, base_url=self.online_model_url)
+        else:
+            self.openrouter_api = None
 
-        # راه‌اندازی جستجوگر PDF اگر مسیر مشخص شده باشد
-        if pdf_path:
+        self.report_startup(time.perf_counter() - started)
+
+        # مسیریاب بین Ollama و مدل آنلاین: hedge در پاسخ‌های کند و کنار گذاشتن سرویس پرخطا با قطع‌کننده مدار
+        backends = {
+            "ollama": lambda messages: self.call_backend(
+                "ollama", self.ollama_api.chat, messages, model=self.model, options=self.OLLAMA_OPTIONS
+            )
+        }
+        stream_backends = {
+            "ollama": lambda messages: self.call_backend_stream(
+                "ollama", self.ollama_api.chat_stream, messages, model=self.model, options=self.OLLAMA_OPTIONS
+            )
+        }
+        if self.openrouter_api:
+            backends["online"] = lambda messages: self.call_backend(
+                "online", self.openrouter_api.generate_response, messages, self.online_model
+            )
+            stream_backends["online"] = lambda messages: self.call_backend_stream(
+                "online", self.openrouter_api.generate_stream, messages, self.online_model
+            )
+        self.router = ModelRouter(backends, is_error=self.is_error_response, stream_backends=stream_backends)
+
+    def init_pdf_searcher(self, pdf_path: str = None, corpus: bool = False):
+        """
+        راه‌اندازی جستجوگر PDF و ساخت یا بارگذاری نمایه
+        """
+        if corpus:
+            try:
+                self.pdf_searcher = PDFSearcher()
+                print("در حال پردازش همه فایل‌های PDF...")
+                self.pdf_searcher.process_corpus()
+            except Exception as e:
+                print(f"خطا در پردازش PDF‌ها: {e}")
+        elif pdf_path:
             try:
                 self.pdf_searcher = PDFSearcher()
-                pdf_name = os.path.basename(pdf_path)
-                print(f"در حال پردازش فایل PDF: {pdf_name}...")
-                self.pdf_searcher.process_pdf(pdf_name)
-                print(f"عمل embedding برای فایل {pdf_name} با موفقیت انجام شد.")
+                self.pdf_name = os.path.basename(pdf_path)
+                print(f"در حال پردازش فایل PDF: {self.pdf_name}...")
+                self.pdf_searcher.process_pdf(self.pdf_name)
+                print(f"عمل embedding برای فایل {self.pdf_name} با موفقیت انجام شد.")
             except Exception as e:
                 print(f"خطا در پردازش PDF: {e}")
 
-        # ایجاد نمونه از OpenRouterAPI اگر کلید API تنظیم شده باشد
-        if self.online_api_key:
-            self.openrouter_api = OpenRouterAPI(api_key=self.online_api_key, base_url=self.online_model_url)
-        else:
-            self.openrouter_api = None
+    def _timed(self, stage: str, function, *args, **kwargs):
+        """
+        اجرای یک مرحله راه‌اندازی و ثبت مدت آن در startup_timings
+        """
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.startup_timings[stage] = time.perf_counter() - started
+
+    def report_startup(self, elapsed: float):
+        """
+        گزارش زمان مراحل راه‌اندازی؛ مجموع مراحل زمانی است که اجرای پشت‌سرهم آن‌ها لازم داشت
+        """
+        print("\n⏱️ زمان راه‌اندازی:")
+        for stage, seconds in sorted(self.startup_timings.items(), key=lambda item: -item[1]):
+            print(f"  {stage:<40} {seconds:>7.2f} ثانیه")
+        pending = sum(1 for future in self.warmup_futures if not future.done())
+        if pending:
+            print(f"  {pending} مدل هنوز در پس‌زمینه در حال بارگذاری است.")
+        print(f"  مجموع مراحل: {sum(self.startup_timings.values()):.2f} ثانیه؛ "
+              f"زمان واقعی با اجرای همزمان: {elapsed:.2f} ثانیه")
+
+    async def throttle(self, backend: str):
+        """
+        انتظار برای محدودکننده نرخ سرویس (در صورت تنظیم)
+        """
+        limiter = self.rate_limiters.get(backend)
+        if limiter is not None:
+            await limiter.acquire_async()
+
+    async def call_backend(self, backend: str, function, *args, **kwargs):
+        await self.throttle(backend)
+        return await function(*args, **kwargs)
+
+    async def call_backend_stream(self, backend: str, function, *args, **kwargs):
+        await self.throttle(backend)
+        async for chunk in function(*args, **kwargs):
+            yield chunk
+
+    @staticmethod
+    def is_error_response(response: str) -> bool:
+        """
+        کلاینت‌های مدل خطا را به صورت متن برمی‌گردانند
+        """
+        return response.startswith(("خطا", "مدل آنلاین در دسترس نیست"))
 
     def log_response(self, response: str):
         """
@@ -70,106 +217,295 @@ class ChatBot:
             print(f"⚠️ خطا در ذخیره پاسخ مدل: {e}")
 
     def send_request(self, prompt: str) -> None:
+        """
+        پردازش یک نوبت گفتگو؛ پوشش همگام send_request_async که تا پایان پخش پاسخ منتظر می‌ماند
+        """
+        asyncio.run(self._run_until_complete(self.send_request_async(prompt)))
+
+    async def _run_until_complete(self, coroutine):
+        try:
+            return await coroutine
+        finally:
+            await self.finish_speaking()
+            await self.close_async()
+
+    async def send_request_async(self, prompt: str) -> None:
+        """
+        پردازش ناهمگام یک نوبت گفتگو
+        مراحل مستقل همزمان اجرا می‌شوند: embedding پرسش (برای کش پاسخ‌ها) همزمان با بازیابی متن زمینه، پخش جمله‌ها
+        همزمان با تولید پاسخ و ثبت لاگ همزمان با پخش پاسخ یا اجرای ابزار.
+        """
         try:
             # بررسی دستور تغییر حالت جستجو
             if "تغییر سرچ" in prompt.lower() or "تغییر جستجو" in prompt.lower():
                 self.toggle_search_mode()
-                self.text_to_speech.speak(f"حالت جستجو به حالت {self.search_mode} تغییر کرد.")
+                self.say(f"حالت جستجو به حالت {self.search_mode} تغییر کرد.")
                 return
 
             # بررسی دستور تغییر مدل
             if "تغییر مدل" in prompt.lower():
                 self.toggle_model()
-                self.text_to_speech.speak(f"مدل به {self.current_model} تغییر کرد.")
+                self.say(f"مدل به {self.current_model} تغییر کرد.")
                 return
 
             # جستجو در PDF یا اینترنت بر اساس حالت فعلی
-            context = ""
-            if self.search_mode == "pdf" and self.pdf_searcher:
-                pdf_name = "1.pdf"
-                context = self.pdf_searcher.get_relevant_context(prompt, pdf_name=pdf_name, max_chars=1000)
-                if context:
-                    print("\nمتن مرتبط از PDF:")
-                    print("-" * 50)
-                    print(context)
-                    print("-" * 50)
-                else:
-                    print("\nنتیجه مرتبطی در PDF یافت نشد.")
-                    print("لطفاً بررسی کنید که فایل PDF حاوی متن قابل استخراج باشد.")
-            elif self.search_mode == "web":
-                print("\nجستجو در وب...")
-                context = self.web_searcher.search(prompt)
-                if context:
-                    print("\nنتایج مرتبط از وب یافت شد:")
-                    print("-" * 50)
-                    print(context)
-                    print("-" * 50)
-                else:
-                    print("\nنتیجه مرتبطی در وب یافت نشد.")
-
-            # اضافه کردن پیام کاربر به تاریخچه مکالمه
+            context, query_vector = await asyncio.gather(
+                self.retrieve_context_async(prompt),
+                self.ollama_api.get_embedding(prompt, model=self.embedding_model),
+            )
+            response, from_cache = await self.cached_generate_async(prompt, context, query_vector)
+
+            # اضافه کردن پرسش (بدون متن زمینه) و پاسخ مدل به تاریخچه مکالمه
             self.conversation_history.append({"role": "user", "content": prompt})
+            self.conversation_history.append({"role": "assistant", "content": response})
+            self.trim_history()
 
-            # محدود کردن تاریخچه مکالمه به ۵ پیام آخر
-            limited_history = self.conversation_history[-5:]
+            # لاگ گرفتن از پاسخ مدل همزمان با بررسی دستورات ابزار و پخش پاسخ
+            await asyncio.gather(
+                asyncio.to_thread(self.log_response, response),
+                self.handle_response_async(response, spoken=self.stream_speech and not from_cache),
+            )
 
-            # ساخت پیام‌ها با توجه به تاریخچه محدودشده
-            messages = [{"role": "system", "content": self.system_prompt}]
-            if context:
-                messages.append({"role": "system", "content": f"متن مرتبط با سوال شما:\n{context}"})
-            messages.extend(limited_history)
+        except Exception as e:
+            print(f"\nخطای ناشناخته: {e}")
 
+    async def cached_generate_async(self, prompt: str, context: str, query_vector: list = None) -> tuple:
+        """
+        دریافت پاسخ از کش پاسخ‌ها (دقیق یا پرسش مشابه) یا در صورت عدم وجود، از مدل
+        Args:
+            query_vector: embedding پرسش برای جستجوی معنایی کش؛ اگر داده نشود همین‌جا محاسبه می‌شود
+        Returns:
+            tuple: (پاسخ، True اگر از کش آمده باشد)
+        """
+        scope, version = self.cache_scope()
+        model_name = self.backend_model_name(self.current_model)
+        history = self.active_history()
+        if query_vector is None:
+            query_vector = await self.ollama_api.get_embedding(prompt, model=self.embedding_model)
+        cached = self.response_cache.get(model_name, prompt, context, scope, version, query_vector, history)
+        if cached is not None:
+            response, kind = cached
+            print(f"\n♻️ پاسخ از کش پاسخ‌ها ({'پرسش یکسان' if kind == 'exact' else 'پرسش مشابه'}): {response}")
+            return response, True
+
+        messages = self.build_messages(prompt, context)
+
+        if self.verbose:
             print("\nپرامپت کامل ارسال شده به مدل:")
             print("-" * 50)
             for msg in messages:
                 print(f"{msg['role']}: {msg['content']}")
             print("-" * 50)
 
-            print("\nدر حال دریافت پاسخ از مدل...")
-            if self.current_model == "ollama":
-                response = self.ollama_api.generate_response(
-                    prompt="\n".join([f"{msg['role']}: {msg['content']}" for msg in messages]),
-                    model=self.model,
-                    options={
-                        "temperature": 0.3,
-                        "top_p": 0.9,
-                        "num_predict": 1000
-                    }
-                )
-            elif self.current_model == "online":
-                response = self.generate_response_online(
-                    messages=messages,
-                    model=self.online_model
-                )
+        print("\nدر حال دریافت پاسخ از مدل...")
+        # آمار ارزیابی پرامپت همین نوبت، جدا از نوبت‌های همزمان دیگر (مثلاً در اجرای دسته‌ای)
+        self.ollama_api.begin_metrics()
+        if self.stream_speech:
+            response, backend = await self.stream_and_speak_async(messages)
+        else:
+            # مدل انتخابی کاربر ترجیح دارد؛ در صورت کندی یا خطا مسیریاب از مدل دیگر استفاده می‌کند
+            try:
+                response, backend = await self.router.route(messages, preferred=self.current_model)
+            except Exception as e:
+                print(f"خطا در دریافت پاسخ از مدل‌ها: {e}")
+                response, backend = "خطا در دریافت پاسخ از مدل.", None
+        if backend and backend != self.current_model:
+            print(f"↪️ پاسخ از مدل {backend} دریافت شد.")
+        if backend == "ollama":
+            self.report_prompt_cache(messages)
+
+        # پاسخ‌های خطا و پاسخ‌های مدل جایگزین (پس از خطا یا کندی مدل انتخابی) ذخیره نمی‌شوند تا کلید
+        # مدل انتخابی فقط پاسخ همان مدل را برگرداند
+        if backend == self.current_model and not self.is_error_response(response):
+            self.response_cache.put(model_name, prompt, context, scope, version, response, query_vector, history)
+        return response, False
+
+    def backend_model_name(self, backend: str) -> str:
+        """
+        نام کامل مدل یک سرویس (ollama یا online) برای کلید کش پاسخ‌ها
+        """
+        return f"{backend}:{self.model if backend == 'ollama' else self.online_model}"
+
+    def cache_scope(self) -> tuple:
+        """
+        حوزه و نسخه نمایه‌ای که متن زمینه از آن آمده است؛ با بازسازی نمایه PDF پاسخ‌های قبلی نامعتبر می‌شوند
+        """
+        if self.search_mode == "pdf" and self.pdf_searcher:
+            return f"pdf:{self.pdf_name or PDFSearcher.CORPUS_NAME}", self.pdf_searcher.index_version(self.pdf_name)
+        return self.search_mode, ""
+
+    async def retrieve_context_async(self, prompt: str) -> str:
+        """
+        بازیابی متن زمینه از PDF (در thread جداگانه) یا از وب (ناهمگام)
+        """
+        context = ""
+        if self.search_mode == "pdf" and self.pdf_searcher:
+            context = await asyncio.to_thread(
+                self.pdf_searcher.get_relevant_context, prompt, pdf_name=self.pdf_name, max_tokens=600
+            )
+            if context and self.verbose:
+                print("\nمتن مرتبط از PDF:")
+                print("-" * 50)
+                print(context)
+                print("-" * 50)
+            elif not context:
+                print("\nنتیجه مرتبطی در PDF یافت نشد.")
+                print("لطفاً بررسی کنید که فایل PDF حاوی متن قابل استخراج باشد.")
+        elif self.search_mode == "web":
+            print("\nجستجو در وب...")
+            await self.throttle("web")
+            context = await self.web_searcher.search(prompt)
+            if context and self.verbose:
+                print("\nنتایج مرتبط از وب یافت شد:")
+                print("-" * 50)
+                print(context)
+                print("-" * 50)
+            elif not context:
+                print("\nنتیجه مرتبطی در وب یافت نشد.")
+        return context
+
+    async def handle_response_async(self, response: str, spoken: bool = False):
+        """
+        اجرای دستورات ابزار موجود در پاسخ یا پخش پاسخ
+        Args:
+            spoken: True اگر پاسخ در حالت جریانی همزمان با تولید پخش شده باشد
+        """
+        # بررسی پاسخ برای دستورات ابزار
+        if "%%" in response:
+            print("\nپاسخ شامل دستور ابزار است. ارسال به مدیریت ابزار...")
+            results = await asyncio.to_thread(self.tool_manager.process_response, response)
+
+            if "موفقیت" in results:
+                print("\n✅ دستورات با موفقیت اجرا شدند.")
+                self.say("دستورات با موفقیت اجرا شدند.")
             else:
-                response = "مدل آنلاین در دسترس نیست یا کلید API تنظیم نشده است."
+                print("\n❌ مشکلی در اجرای دستورات وجود داشت.")
+                self.say("مشکلی در اجرای دستورات وجود داشت.")
+        elif not spoken:
+            # پاک‌سازی پاسخ از کاراکترهای غیرمجاز و پخش آن
+            cleaned_response = TextProcessor.clean_response(response)
+            print("\nپاسخ دریافت شد. در حال پخش...")
+            print(f"پاسخ: {cleaned_response}")
+            self.say(cleaned_response)
+
+    def say(self, text: str):
+        """
+        افزودن متن به صف پخش؛ در حالت headless بلندگویی وجود ندارد و چیزی پخش نمی‌شود
+        """
+        if self.speaker is not None:
+            self.speaker.say(text)
 
-            # اضافه کردن پاسخ مدل به تاریخچه مکالمه
-            self.conversation_history.append({"role": "assistant", "content": response})
+    async def finish_speaking(self):
+        """
+        انتظار تا پخش همه جمله‌های صف‌شده تمام شود
+        """
+        if self.speaker is not None:
+            await asyncio.to_thread(self.speaker.wait)
 
-            # لاگ گرفتن از پاسخ مدل
-            self.log_response(response)
+    async def close_async(self):
+        """
+        بستن session‌های HTTP ناهمگام (وابسته به حلقه رویداد فعلی)
+        """
+        await self.ollama_api.close()
+        await self.web_searcher.close()
+        if self.openrouter_api:
+            await self.openrouter_api.close()
 
-            # بررسی پاسخ برای دستورات ابزار
-            if "%%" in response:
-                print("\nپاسخ شامل دستور ابزار است. ارسال به مدیریت ابزار...")
-                results = self.tool_manager.process_response(response)
+    def trim_history(self):
+        """
+        جابه‌جایی ابتدای پنجره تاریخچه پس از افزودن یک نوبت؛ پنجره یکجا کوتاه می‌شود تا پیشوند پرامپت
+        در چند نوبت بعدی ثابت بماند و از کش Ollama استفاده شود
+        """
+        if len(self.conversation_history) - self.history_start > self.MAX_HISTORY:
+            self.history_start = len(self.conversation_history) - self.MIN_HISTORY
 
-                if "موفقیت" in results:
-                    print("\n✅ دستورات با موفقیت اجرا شدند.")
-                    self.text_to_speech.speak("دستورات با موفقیت اجرا شدند.")
-                else:
-                    print("\n❌ مشکلی در اجرای دستورات وجود داشت.")
-                    self.text_to_speech.speak("مشکلی در اجرای دستورات وجود داشت.")
-            else:
-                # پاک‌سازی پاسخ از کاراکترهای غیرمجاز و پخش آن
-                cleaned_response = TextProcessor.clean_response(response)
-                print("\nپاسخ دریافت شد. در حال پخش...")
-                print(f"پاسخ: {cleaned_response}")
-                self.text_to_speech.speak(cleaned_response)
+    def active_history(self) -> list:
+        """
+        بخشی از تاریخچه مکالمه که همراه پرسش فعلی به مدل فرستاده می‌شود (بدون تغییر وضعیت ربات)
+        """
+        return self.conversation_history[self.history_start:]
+
+    def build_messages(self, prompt: str, context: str = "") -> list:
+        """
+        ساخت پیام‌ها با ترتیب پیشوند ثابت: پرامپت سیستم ثابت، سپس تاریخچه و در انتها متن زمینه متغیر همراه با سوال فعلی
+        به این ترتیب Ollama بخش ثابت پرامپت را از کش مدل استفاده می‌کند و فقط پیام آخر دوباره ارزیابی می‌شود.
+        """
+        messages = [{"role": "system", "content": self.system_prompt}]
+        messages.extend(self.active_history())
+        if context:
+            messages.append({"role": "user", "content": f"متن مرتبط با سوال:\n{context}\n\nسوال: {prompt}"})
+        else:
+            messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def report_prompt_cache(self, messages: list):
+        """
+        گزارش زمان ارزیابی پرامپت صرفه‌جویی‌شده با کش پیشوند Ollama در این نوبت
+        توکن‌هایی از پرامپت که ارزیابی نشده‌اند (تخمین کل توکن‌ها منهای prompt_eval_count) از کش آمده‌اند و
+        زمان صرفه‌جویی‌شده با سرعت ارزیابی همین نوبت تخمین زده می‌شود.
+        """
+        metrics = self.ollama_api.last_metrics
+        evaluated = metrics.get("prompt_eval_count", 0)
+        duration_ms = metrics.get("prompt_eval_duration", 0) / 1e6
+        if not evaluated:
+            return
+        # حدود ۴ توکن برای قالب نقش هر پیام
+        prompt_tokens = sum(estimate_tokens(msg["content"]) + 4 for msg in messages)
+        reused = max(0, prompt_tokens - evaluated)
+        saved_ms = reused * duration_ms / evaluated
+
+        self.prompt_cache_stats["turns"] += 1
+        self.prompt_cache_stats["reused_tokens"] += reused
+        self.prompt_cache_stats["saved_ms"] += saved_ms
+        print(f"⏱️ ارزیابی پرامپت: {evaluated} توکن در {duration_ms:.0f} میلی‌ثانیه؛ "
+              f"حدود {reused} توکن از کش (صرفه‌جویی تقریبی {saved_ms:.0f} میلی‌ثانیه، "
+              f"مجموع {self.prompt_cache_stats['saved_ms']:.0f} میلی‌ثانیه در {self.prompt_cache_stats['turns']} نوبت)")
+
+    def stream_and_speak(self, messages: list) -> tuple:
+        """
+        پوشش همگام stream_and_speak_async
+        """
+        return asyncio.run(self._run_until_complete(self.stream_and_speak_async(messages)))
 
+    async def stream_and_speak_async(self, messages: list) -> tuple:
+        """
+        دریافت جریانی پاسخ مدل (از طریق مسیریاب: مدل انتخابی و در صورت خطای پیش از اولین بخش، مدل دیگر)
+        و پخش هر جمله کامل در پس‌زمینه همزمان با ادامه تولید
+        اگر پاسخ شامل دستور ابزار (%%) باشد، از آن نقطه به بعد چیزی پخش نمی‌شود.
+        Returns:
+            tuple: (متن کامل پاسخ مدل، نام سرویسی که پاسخ داد یا None)
+        """
+        if self.speaker is not None:
+            self.speaker.start()
+        response = ""
+        pending = ""
+        tool_output = False
+        backend = None
+        try:
+            async for backend, chunk in self.router.route_stream(messages, preferred=self.current_model):
+                response += chunk
+                print(chunk, end="", flush=True)
+                if tool_output or "%%" in response:
+                    tool_output = True
+                    continue
+                pending += chunk
+                sentences, pending = TextProcessor.split_sentences(pending)
+                for sentence in sentences:
+                    self.say(TextProcessor.clean_response(sentence).strip())
+            print()
         except Exception as e:
-            print(f"\nخطای ناشناخته: {e}")
+            print(f"خطا در دریافت پاسخ از مدل‌ها: {e}")
+            # پاسخ ناقص در کش ذخیره نمی‌شود
+            backend = None
+            if not response:
+                response = pending = "خطا در دریافت پاسخ از مدل."
+        if not tool_output:
+            self.say(TextProcessor.clean_response(pending).strip())
+
+        # معمولاً پخش اولین جمله پیش از پایان تولید آغاز شده است
+        if self.speaker is not None and self.speaker.time_to_first_audio is not None:
+            print(f"⏱️ زمان تا اولین صدا: {self.speaker.time_to_first_audio:.2f} ثانیه")
+        return response, backend
 
     def toggle_model(self):
         """تغییر مدل اصلی بین Ollama و مدل آنلاین"""
@@ -190,6 +526,12 @@ class ChatBot:
             print("\nحالت جستجو به حالت PDF تغییر کرد.")
 
     def generate_response_online(self, messages: list, model: str = None) -> str:
+        """
+        ارسال درخواست به مدل آنلاین OpenRouter (پوشش همگام generate_response_online_async)
+        """
+        return asyncio.run(self._run_until_complete(self.generate_response_online_async(messages, model)))
+
+    async def generate_response_online_async(self, messages: list, model: str = None) -> str:
         """
         ارسال درخواست به مدل آنلاین OpenRouter
         Args:
@@ -204,11 +546,146 @@ class ChatBot:
         # استفاده از مدل پیش‌فرض اگر مدل مشخص نشده باشد
         model = model or self.online_model
 
-        return self.openrouter_api.generate_response(messages, model)
+        return await self.openrouter_api.generate_response(messages, model)
+
+    async def answer(self, question: str) -> dict:
+        """
+        پاسخ به یک پرسش بدون ورودی و خروجی صوتی و بدون تغییر تاریخچه مکالمه
+        Returns:
+            dict: پاسخ، متن زمینه، آمدن پاسخ از کش و زمان هر مرحله بر حسب میلی‌ثانیه
+        """
+        started = time.perf_counter()
+        context, query_vector = await asyncio.gather(
+            self.retrieve_context_async(question),
+            self.ollama_api.get_embedding(question, model=self.embedding_model),
+        )
+        retrieved = time.perf_counter()
+        response, from_cache = await self.cached_generate_async(question, context, query_vector)
+        finished = time.perf_counter()
+        return {
+            "answer": response,
+            "context": context,
+            "from_cache": from_cache,
+            "timings": {
+                "retrieval_ms": (retrieved - started) * 1000,
+                "generation_ms": (finished - retrieved) * 1000,
+                "total_ms": (finished - started) * 1000,
+            },
+        }
+
+    def run_batch(self, input_path: str, output_path: str, concurrency: int = 4) -> list:
+        """
+        پوشش همگام run_batch_async
+        """
+        try:
+            return asyncio.run(self._run_until_complete(self.run_batch_async(input_path, output_path, concurrency)))
+        except KeyboardInterrupt:
+            print("\n\nاجرای دسته‌ای متوقف شد؛ با اجرای دوباره همان دستور، پرسش‌های باقی‌مانده پردازش می‌شوند.")
+            return []
+
+    async def run_batch_async(self, input_path: str, output_path: str, concurrency: int = 4) -> list:
+        """
+        پاسخ به پرسش‌های یک فایل JSONL (هر سطر {"id": ..., "question": ...}) با حداکثر concurrency پرسش همزمان
+        هر پاسخ به محض آماده شدن به فایل خروجی اضافه می‌شود؛ در اجرای دوباره، پرسش‌هایی که پاسخ موفق
+        در فایل خروجی دارند دوباره پردازش نمی‌شوند.
+        Returns:
+            list: رکوردهای نوشته‌شده در این اجرا
+        """
+        questions = []
+        with open(input_path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                questions.append((str(item.get("id", number)), item.get("question") or item.get("prompt", "")))
+
+        answered = set()
+        needs_newline = False
+        if os.path.exists(output_path):
+            with open(output_path, encoding="utf-8") as f:
+                content = f.read()
+            needs_newline = bool(content) and not content.endswith("\n")
+            for line in content.splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # سطر ناقص ناشی از توقف ناگهانی اجرای قبلی
+                if record.get("ok"):
+                    answered.add(record["id"])
+
+        pending = [(item_id, question) for item_id, question in questions if item_id not in answered]
+        print(f"{len(questions)} پرسش در فایل؛ {len(questions) - len(pending)} پرسش قبلاً پاسخ داده شده است.")
+
+        semaphore = asyncio.Semaphore(concurrency)
+        records = []
+        started = time.perf_counter()
+        with open(output_path, "a", encoding="utf-8") as out:
+            if needs_newline:
+                out.write("\n")
+
+            async def run(item_id: str, question: str):
+                queued = time.perf_counter()
+                async with semaphore:
+                    queue_ms = (time.perf_counter() - queued) * 1000
+                    try:
+                        result = await self.answer(question)
+                        error = result["answer"] if self.is_error_response(result["answer"]) else None
+                    except Exception as e:
+                        result = {"answer": "", "context": "", "from_cache": False, "timings": {}}
+                        error = str(e)
+                result["timings"]["queue_ms"] = queue_ms
+                record = {"id": item_id, "question": question, "ok": error is None, "error": error, **result}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                records.append(record)
+                status = "✅" if error is None else "❌"
+                print(f"{status} [{len(records)}/{len(pending)}] {item_id}: "
+                      f"{record['timings'].get('total_ms', 0):.0f} میلی‌ثانیه")
+
+            await asyncio.gather(*(run(item_id, question) for item_id, question in pending))
+
+        self.report_batch(records, time.perf_counter() - started)
+        return records
+
+    def report_batch(self, records: list, elapsed: float):
+        """
+        خلاصه اجرای دسته‌ای: تعداد موفق و ناموفق، برخورد کش، صدک‌های زمان هر مرحله و انتظار محدودکننده‌های نرخ
+        """
+        ok = sum(1 for record in records if record["ok"])
+        cached = sum(1 for record in records if record["from_cache"])
+        print(f"\n=== اجرای دسته‌ای: {ok} موفق، {len(records) - ok} ناموفق، {cached} از کش پاسخ‌ها؛ "
+              f"{elapsed:.1f} ثانیه ({len(records) / elapsed if elapsed else 0:.2f} پرسش در ثانیه) ===")
+        for stage in ("queue_ms", "retrieval_ms", "generation_ms", "total_ms"):
+            values = sorted(record["timings"][stage] for record in records if stage in record["timings"])
+            if values:
+                p50 = values[len(values) // 2]
+                p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+                print(f"  {stage:<14} میانگین {sum(values) / len(values):>8.0f}  p50 {p50:>8.0f}  p95 {p95:>8.0f}")
+        for backend, row in self.router.stats().items():
+            print(f"  مدل {backend}: {row['requests']} درخواست، خطا {row['error_rate'] * 100:.0f}٪، "
+                  f"مدار {row['circuit']}، hedge {row['hedges']}")
+        for backend, limiter in self.rate_limiters.items():
+            print(f"  محدودکننده نرخ {backend}: مجموع انتظار {limiter.total_wait:.1f} ثانیه")
+        if self.search_mode == "web":
+            web_cache = self.web_searcher.http_cache.stats()
+            print(f"  کش HTTP وب: نرخ برخورد {web_cache['hit_rate'] * 100:.0f}٪ "
+                  f"({web_cache['hits']} مستقیم، {web_cache['revalidated']} با اعتبارسنجی مجدد، {web_cache['misses']} عدم برخورد)")
+            web_index = self.web_searcher.web_index.stats()
+            print(f"  نمایه محلی وب: {web_index['hits']} پرسش با نتیجه، {web_index['misses']} بدون نتیجه "
+                  f"({web_index['pages']} صفحه، {web_index['chunks']} جمله)")
 
     def chat(self):
         """
-        متد اصلی برای شروع چت با کاربر
+        متد اصلی برای شروع چت با کاربر (پوشش همگام chat_async)
+        """
+        try:
+            asyncio.run(self._run_until_complete(self.chat_async()))
+        except KeyboardInterrupt:
+            print("\n\nبرنامه توسط کاربر متوقف شد.")
+
+    async def chat_async(self):
+        """
+        حلقه اصلی گفتگو؛ همه نوبت‌ها در یک حلقه رویداد اجرا می‌شوند تا اتصال‌های HTTP بین نوبت‌ها حفظ شوند
         """
         print("\n=== ربات چت فارسی با هوش مصنوعی (ورودی صوتی و خروجی صوتی) ===")
         print("برای خروج، کلمه 'خروج' را بگویید.")
@@ -219,7 +696,9 @@ class ChatBot:
 
         while True:
             try:
-                user_input = self.speech_recognizer.listen_for_audio()
+                # میکروفون نباید صدای پاسخ قبلی را ضبط کند
+                await self.finish_speaking()
+                user_input = await asyncio.to_thread(self.speech_recognizer.listen_for_audio)
 
                 if user_input.lower() in ['خروج', 'exit', 'quit']:
                     print("\nخداحافظ!")
@@ -228,18 +707,44 @@ class ChatBot:
                 if not user_input:
                     continue
 
-                self.send_request(user_input)
+                await self.send_request_async(user_input)
 
-            except KeyboardInterrupt:
-                print("\n\nبرنامه توسط کاربر متوقف شد.")
-                break
             except Exception as e:
                 print(f"\nخطای ناشناخته: {e}")
 
 
-if __name__ == "__main__":
-    chatbot = ChatBot(pdf_path="search_pdf/pdf_files/1.pdf")
-    chatbot.chat()
-
+def parse_rate_limits(specs: list) -> dict:
+    """
+    تبدیل مقادیر --rate به شکل SERVICE=RPS یا SERVICE=RPS:BURST (مثلاً online=0.5 یا ollama=4:2) به محدودکننده‌ها
+    """
+    limiters = {}
+    for spec in specs:
+        service, _, value = spec.partition("=")
+        rate, _, burst = value.partition(":")
+        limiters[service] = RateLimiter(float(rate), int(burst or 1))
+    return limiters
 
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="دستیار صوتی فارسی")
+    parser.add_argument("--batch", metavar="QUESTIONS.jsonl",
+                        help="پاسخ به پرسش‌های فایل JSONL بدون میکروفون و بلندگو")
+    parser.add_argument("--output", default="batch_answers.jsonl", help="فایل JSONL پاسخ‌ها (ادامه اجرای قبلی)")
+    parser.add_argument("--concurrency", type=int, default=4, help="حداکثر پرسش‌های همزمان")
+    parser.add_argument("--search-mode", choices=["pdf", "web"], default="pdf")
+    parser.add_argument("--model", choices=["ollama", "online"], default="ollama", help="مدل ترجیحی")
+    parser.add_argument("--pdf", help="جستجو فقط در این فایل PDF (پیش‌فرض: همه فایل‌های pdf_files)")
+    parser.add_argument("--rate", action="append", default=[], metavar="SERVICE=RPS[:BURST]",
+                        help="محدودیت نرخ برای ollama، online یا web (قابل تکرار)")
+    args = parser.parse_args()
+
+    if args.batch:
+        chatbot = ChatBot(pdf_path=args.pdf, corpus=args.pdf is None, headless=True)
+        chatbot.search_mode = args.search_mode
+        chatbot.current_model = args.model
+        chatbot.verbose = False
+        chatbot.rate_limiters = parse_rate_limits(args.rate)
+        chatbot.run_batch(args.batch, args.output, concurrency=args.concurrency)
+    else:
+        chatbot = ChatBot(corpus=True, stream_speech=True)
+        chatbot.chat()
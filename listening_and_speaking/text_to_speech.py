@@ -1,5 +1,7 @@
 import subprocess
 import time
+import queue
+import threading
 
 class TextToSpeech:
     """
@@ -101,6 +103,81 @@ class TextToSpeech:
         """تنظیم مکث بین جملات"""
         self.sentence_break = break_time
 
+class StreamingSpeaker:
+    """
+    پخش جمله‌ها در یک thread پس‌زمینه تا تولید پاسخ مدل (یا مراحل بعدی برنامه) همزمان ادامه پیدا کند
+    جمله‌ها به ترتیب ورود در صف قرار گرفته و یکی‌یکی با TextToSpeech خوانده می‌شوند.
+    """
+
+    def __init__(self, text_to_speech: TextToSpeech):
+        self.text_to_speech = text_to_speech
+        self._queue = queue.Queue()
+        self._thread = None
+        self._turn = 0
+        self.started_at = None
+        self.first_audio_at = None
+
+    def start(self):
+        """
+        شروع زمان‌سنجی تا اولین صدای یک پاسخ جدید (thread پخش در صورت نیاز راه‌اندازی می‌شود)
+        جمله‌های باقیمانده از پاسخ قبلی ابتدا پخش می‌شوند ولی در زمان‌سنجی حساب نمی‌شوند.
+        """
+        self._turn += 1
+        self.started_at = time.perf_counter()
+        self.first_audio_at = None
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def say(self, sentence: str):
+        """
+        افزودن یک جمله کامل به صف پخش (بدون انتظار)
+        """
+        if sentence:
+            if self._thread is None:
+                self.start()
+            self._queue.put((self._turn, sentence))
+
+    def wait(self):
+        """
+        انتظار تا پخش همه جمله‌های صف‌شده تمام شود (thread پخش فعال می‌ماند)
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def finish(self):
+        """
+        پخش جمله‌های باقیمانده و توقف thread پخش
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def time_to_first_audio(self):
+        """
+        فاصله زمانی (ثانیه) از شروع تا آغاز پخش اولین جمله؛ None اگر جمله‌ای پخش نشده باشد
+        """
+        if self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.started_at
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                turn, sentence = item
+                if turn == self._turn and self.first_audio_at is None:
+                    self.first_audio_at = time.perf_counter()
+                self.text_to_speech.speak(sentence)
+            finally:
+                self._queue.task_done()
+
+
 def main():
     """
     تابع اصلی برای خواندن متن از ورودی کاربر
@@ -0,0 +1,85 @@
+import threading
+from contextlib import contextmanager
+
+
+class AdaptiveBatchController:
+    """
+    تنظیم خودکار اندازه دسته و تعداد درخواست‌های همزمان بر اساس تأخیر مشاهده‌شده
+    اگر تأخیر هر دسته کمتر از نصف تأخیر هدف باشد اندازه دسته دو برابر و همزمانی یکی زیاد می‌شود؛
+    اگر از تأخیر هدف بیشتر شود یا خطا رخ دهد، اندازه دسته نصف و همزمانی کم می‌شود (افزایش جمعی، کاهش ضربی).
+    """
+
+    def __init__(self, target_latency: float = 2.0, initial_batch: int = 16, min_batch: int = 1, max_batch: int = 256,
+                 initial_concurrency: int = 2, min_concurrency: int = 1, max_concurrency: int = 8, smoothing: float = 0.3):
+        """
+        Args:
+            target_latency: تأخیر هدف هر درخواست دسته‌ای (ثانیه)
+            initial_batch / min_batch / max_batch: اندازه اولیه و محدوده اندازه دسته
+            initial_concurrency / min_concurrency / max_concurrency: تعداد اولیه و محدوده درخواست‌های همزمان
+            smoothing: ضریب میانگین متحرک نمایی تأخیر
+        """
+        self.target_latency = target_latency
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.smoothing = smoothing
+
+        self._batch_size = initial_batch
+        self._concurrency = initial_concurrency
+        self._in_flight = 0
+        self._latency = None
+        self._condition = threading.Condition()
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency
+
+    @property
+    def latency(self) -> float:
+        """میانگین متحرک تأخیر هر دسته (ثانیه)"""
+        return self._latency
+
+    @contextmanager
+    def slot(self):
+        """
+        گرفتن یک جایگاه درخواست؛ تا زمانی که تعداد درخواست‌های در جریان به سقف همزمانی رسیده باشد منتظر می‌ماند
+        """
+        with self._condition:
+            while self._in_flight >= self._concurrency:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def record(self, latency: float, ok: bool = True):
+        """
+        ثبت نتیجه یک درخواست دسته‌ای و به‌روزرسانی اندازه دسته و همزمانی
+        """
+        with self._condition:
+            if not ok:
+                self._batch_size = max(self.min_batch, self._batch_size // 2)
+                self._concurrency = max(self.min_concurrency, self._concurrency // 2)
+                self._condition.notify_all()
+                return
+
+            if self._latency is None:
+                self._latency = latency
+            else:
+                self._latency = self.smoothing * latency + (1 - self.smoothing) * self._latency
+
+            if self._latency > self.target_latency:
+                self._batch_size = max(self.min_batch, self._batch_size // 2)
+                self._concurrency = max(self.min_concurrency, self._concurrency - 1)
+            elif self._latency < self.target_latency / 2:
+                self._batch_size = min(self.max_batch, self._batch_size * 2)
+                self._concurrency = min(self.max_concurrency, self._concurrency + 1)
+            self._condition.notify_all()
@@ -0,0 +1,206 @@
+import json
+import time
+import asyncio
+import contextvars
+from request_ollama.ollama_api import OllamaAPI
+from request_ollama.embedding_cache import EmbeddingCache
+from request_ollama.async_transport import AsyncHttpTransport
+
+# آمار زمانی آخرین پاسخ chat در هر زمینه اجرا (coroutine‌های همزمان روی یک thread اجرا می‌شوند و threading.local
+# بین آن‌ها مشترک است). مقدار یک dict قابل تغییر است تا taskهای فرزند (مثلاً درخواست‌های مسیریاب) در همان dict بنویسند.
+_chat_metrics = contextvars.ContextVar("ollama_chat_metrics", default=None)
+
+
+class AsyncOllamaAPI(OllamaAPI):
+    """
+    نسخه asyncio کلاس OllamaAPI با همان endpoint‌ها، کش embedding و کنترل‌کننده دسته
+    متدهای عمومی coroutine (یا async generator در حالت جریانی) هستند.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", async_transport: AsyncHttpTransport = None, **kwargs):
+        """
+        Args:
+            async_transport: لایه HTTP ناهمگام (پیش‌فرض: یک transport جدید برای همین نمونه)
+            **kwargs: سایر تنظیمات OllamaAPI
+        """
+        super().__init__(base_url=base_url, **kwargs)
+        self.async_transport = async_transport or AsyncHttpTransport()
+
+    def begin_metrics(self) -> dict:
+        """
+        شروع ثبت آمار برای درخواست‌های chat زمینه فعلی (و taskهایی که از این پس در آن ساخته می‌شوند)
+        بدون فراخوانی آن، آمار فقط در همان زمینه‌ای که درخواست در آن اجرا شده دیده می‌شود.
+        """
+        metrics = {}
+        _chat_metrics.set(metrics)
+        return metrics
+
+    @property
+    def last_metrics(self) -> dict:
+        """
+        آمار زمانی آخرین پاسخ chat در زمینه اجرای فعلی (مقادیر duration بر حسب نانوثانیه)
+        """
+        return dict(_chat_metrics.get() or {})
+
+    def _reset_metrics(self):
+        metrics = _chat_metrics.get()
+        if metrics is None:
+            _chat_metrics.set({})
+        else:
+            metrics.clear()
+
+    def _record_metrics(self, result: dict):
+        metrics = _chat_metrics.get()
+        if metrics is None:
+            metrics = {}
+            _chat_metrics.set(metrics)
+        metrics.clear()
+        metrics.update({key: result.get(key, 0) for key in self.METRIC_KEYS})
+
+    async def generate_response(self, prompt: str, model: str = "llama3.1:8b", **kwargs) -> str:
+        try:
+            payload = self._generate_payload(prompt, model, stream=False, **kwargs)
+            async with self.async_transport.post(self.generate_url, json=payload) as response:
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+            return result.get("response", "")
+
+        except Exception as e:
+            print(f"خطا در دریافت پاسخ از مدل: {e}")
+            return "خطا در دریافت پاسخ از مدل."
+
+    async def generate_stream(self, prompt: str, model: str = "llama3.1:8b", **kwargs):
+        payload = self._generate_payload(prompt, model, stream=True, **kwargs)
+        async for chunk in self._stream(self.generate_url, payload):
+            if chunk.get("response"):
+                yield chunk["response"]
+
+    async def chat(self, messages: list, model: str = "llama3.1:8b", **kwargs) -> str:
+        try:
+            self._reset_metrics()
+            payload = self._chat_payload(messages, model, stream=False, **kwargs)
+            async with self.async_transport.post(self.chat_url, json=payload) as response:
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+            self._record_metrics(result)
+            return result.get("message", {}).get("content", "")
+
+        except Exception as e:
+            print(f"خطا در دریافت پاسخ از مدل: {e}")
+            return "خطا در دریافت پاسخ از مدل."
+
+    async def chat_stream(self, messages: list, model: str = "llama3.1:8b", **kwargs):
+        self._reset_metrics()
+        payload = self._chat_payload(messages, model, stream=True, **kwargs)
+        async for chunk in self._stream(self.chat_url, payload):
+            content = chunk.get("message", {}).get("content")
+            if content:
+                yield content
+
+    async def _stream(self, url: str, payload: dict):
+        """
+        خواندن پاسخ NDJSON سطر به سطر؛ آمار زمانی آخرین سطر در last_metrics ثبت می‌شود
+        """
+        try:
+            async with self.async_transport.post(url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    yield chunk
+                    if chunk.get("done"):
+                        self._record_metrics(chunk)
+                        break
+
+        except Exception as e:
+            print(f"خطا در دریافت پاسخ جریانی از مدل: {e}")
+            yield {"response": "خطا در دریافت پاسخ از مدل.", "message": {"content": "خطا در دریافت پاسخ از مدل."}}
+
+    async def get_embedding(self, text: str, model: str = "nomic-embed-text") -> list:
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(model, text)
+            if cached is not None:
+                return cached
+
+        embedding = await self._request_embedding(text, model)
+        if embedding and self.embedding_cache is not None:
+            self.embedding_cache.put(model, text, embedding)
+        return embedding
+
+    async def _request_embedding(self, text: str, model: str) -> list:
+        try:
+            payload = {"model": model, "prompt": text, "keep_alive": self.keep_alive}
+            async with self.async_transport.post(self.embeddings_url, json=payload, idempotent=True) as response:
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+            return EmbeddingCache.unit(result.get("embedding", [])).tolist()
+
+        except Exception as e:
+            print(f"خطا در دریافت embedding: {e}")
+            return []
+
+    async def get_embeddings_batch(self, texts: list, model: str = "nomic-embed-text") -> list:
+        texts = list(texts)
+        if self.embedding_cache is None:
+            return await self._fetch_embeddings_batch(texts, model)
+
+        results = [[] for _ in texts]
+        cached = self.embedding_cache.get_many(model, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                results[i] = vector
+        if missing:
+            fetched = await self._fetch_embeddings_batch([texts[i] for i in missing], model)
+            for i, vector in zip(missing, fetched):
+                results[i] = vector
+            self.embedding_cache.put_many(model, [texts[i] for i in missing], fetched)
+        return results
+
+    async def _fetch_embeddings_batch(self, texts: list, model: str) -> list:
+        """
+        ارسال همزمان دسته‌ها با اندازه و همزمانی فعلی کنترل‌کننده تطبیقی
+        """
+        controller = self.batch_controller
+        semaphore = asyncio.Semaphore(controller.concurrency)
+        size = controller.batch_size
+        batches = [texts[start:start + size] for start in range(0, len(texts), size)]
+
+        async def run(batch):
+            async with semaphore:
+                return await self._embed_batch(batch, model)
+
+        results = []
+        for embeddings in await asyncio.gather(*(run(batch) for batch in batches)):
+            results.extend(embeddings)
+        return results
+
+    async def _embed_batch(self, texts: list, model: str) -> list:
+        if self._embed_endpoint_available:
+            started = time.perf_counter()
+            try:
+                payload = {"model": model, "input": texts, "keep_alive": self.keep_alive}
+                async with self.async_transport.post(self.embed_url, json=payload, idempotent=True) as response:
+                    body = await response.text()
+                    if response.status == 404 and "model" not in body.lower():
+                        self._embed_endpoint_available = False
+                        print("هشدار: endpoint /api/embed در دسترس نیست؛ از /api/embeddings استفاده می‌شود.")
+                    else:
+                        response.raise_for_status()
+                        embeddings = json.loads(body).get("embeddings", [])
+                        if len(embeddings) != len(texts):
+                            raise ValueError("تعداد embedding‌های دریافتی با تعداد متن‌ها برابر نیست.")
+                        self.batch_controller.record(time.perf_counter() - started, ok=True)
+                        return embeddings
+            except Exception as e:
+                self.batch_controller.record(time.perf_counter() - started, ok=False)
+                print(f"خطا در دریافت embedding دسته‌ای: {e}")
+                return [[] for _ in texts]
+
+        return list(await asyncio.gather(*(self._request_embedding(text, model) for text in texts)))
+
+    async def close(self):
+        await self.async_transport.close()
@@ -0,0 +1,85 @@
+import json
+import aiohttp
+from request_ollama.openrouter_api import OpenRouterAPI
+from request_ollama.async_transport import AsyncHttpTransport
+
+
+class AsyncOpenRouterAPI(OpenRouterAPI):
+    """
+    نسخه asyncio کلاس OpenRouterAPI
+    """
+
+    def __init__(self, api_key: str, base_url: str, async_transport: AsyncHttpTransport = None, **kwargs):
+        """
+        Args:
+            async_transport: لایه HTTP ناهمگام (پیش‌فرض: یک transport جدید برای همین نمونه)
+        """
+        super().__init__(api_key, base_url, **kwargs)
+        self.async_transport = async_transport or AsyncHttpTransport()
+
+    async def generate_response(self, messages: list, model: str = "deepseek/deepseek-v3-base:free") -> str:
+        try:
+            payload = {
+                "model": model,
+                "messages": messages
+            }
+
+            url = f"{self.base_url}/chat/completions"
+            async with self.async_transport.post(url, headers=self._headers(), json=payload) as response:
+                if response.status != 200:
+                    print(f"❌ وضعیت HTTP: {response.status}")
+                    print(f"🧾 پاسخ سرور: {await response.text()}")
+                    return "خطا در دریافت پاسخ از مدل آنلاین."
+                result = await response.json(content_type=None)
+
+            return result.get("choices", [{}])[0].get("message", {}).get("content", "پاسخی دریافت نشد.")
+
+        except aiohttp.ClientError as req_err:
+            print(f"⛔ خطای اتصال به OpenRouter: {req_err}")
+            return "خطای اتصال به OpenRouter."
+
+        except Exception as e:
+            print(f"❌ خطای کلی: {e}")
+            return "خطای کلی در ارتباط با OpenRouter API."
+
+    async def generate_stream(self, messages: list, model: str = "deepseek/deepseek-v3-base:free"):
+        try:
+            payload = {
+                "model": model,
+                "messages": messages,
+                "stream": True
+            }
+
+            url = f"{self.base_url}/chat/completions"
+            async with self.async_transport.post(url, headers=self._headers(), json=payload) as response:
+                if response.status != 200:
+                    print(f"❌ وضعیت HTTP: {response.status}")
+                    print(f"🧾 پاسخ سرور: {await response.text()}")
+                    yield "خطا در دریافت پاسخ از مدل آنلاین."
+                    return
+
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    error = event.get("error")
+                    if error:
+                        raise RuntimeError(error.get("message", error) if isinstance(error, dict) else error)
+                    content = event.get("choices", [{}])[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+
+        except aiohttp.ClientError as req_err:
+            print(f"⛔ خطای اتصال به OpenRouter: {req_err}")
+            yield "خطای اتصال به OpenRouter."
+
+        except Exception as e:
+            print(f"❌ خطای کلی: {e}")
+            yield "خطای کلی در ارتباط با OpenRouter API."
+
+    async def close(self):
+        await self.async_transport.close()
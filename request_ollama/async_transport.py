@@ -0,0 +1,95 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import aiohttp
+from request_ollama.http_transport import HttpTransport
+
+
+class AsyncHttpTransport:
+    """
+    نسخه asyncio لایه HTTP: یک aiohttp.ClientSession با استخر اتصال محدود، مهلت اتصال/خواندن و
+    تلاش مجدد با عقب‌نشینی نمایی؛ آمار تأخیر در HttpTransport مشترک ثبت می‌شود تا گزارش یکسانی داشته باشیم.
+    """
+
+    def __init__(self, pool_size: int = 16, connect_timeout: float = 3.05, read_timeout: float = 300.0,
+                 retries: int = 3, backoff_factor: float = 0.5, stats_transport: HttpTransport = None):
+        """
+        Args:
+            pool_size: حداکثر اتصال‌های همزمان
+            connect_timeout: مهلت برقراری اتصال (ثانیه)
+            read_timeout: حداکثر فاصله بین دریافت داده‌ها (ثانیه)
+            retries: حداکثر تعداد تلاش مجدد برای خطای اتصال و وضعیت‌های گذرا
+            backoff_factor: ضریب عقب‌نشینی نمایی بین تلاش‌ها
+            stats_transport: transport همگامی که آمار تأخیر در آن ثبت می‌شود (پیش‌فرض: transport مشترک پردازه)
+        """
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.stats_transport = stats_transport or HttpTransport.default()
+        self._session = None
+        self._loop = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # هر session به حلقه رویدادی که در آن ساخته شده وابسته است
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=self.timeout,
+            )
+            self._loop = loop
+        return self._session
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, idempotent: bool = None, **kwargs):
+        """
+        ارسال درخواست و برگرداندن پاسخ aiohttp در یک context manager (برای خواندن جریانی بدنه)
+        فقط خطای برقراری اتصال و وضعیت‌های گذرا دوباره تلاش می‌شوند؛ خطای خواندن تکرار نمی‌شود.
+        Args:
+            idempotent: مانند HttpTransport.request؛ درخواست‌های غیر idempotent فقط پس از 429/503 دوباره ارسال می‌شوند
+        """
+        session = self._get_session()
+        endpoint = urlsplit(url).path or "/"
+        statuses = HttpTransport.retry_statuses(method, idempotent)
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            delay = self.backoff_factor * (2 ** attempt)
+            try:
+                response = await session.request(method, url, **kwargs)
+            except aiohttp.ClientConnectorError:
+                self.stats_transport.record(endpoint, time.perf_counter() - started, ok=False)
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                self.stats_transport.record(endpoint, time.perf_counter() - started, ok=False)
+                raise
+
+            if response.status in statuses and attempt < self.retries:
+                delay = HttpTransport.retry_delay(response.headers, attempt, self.backoff_factor)
+                if delay is not None:
+                    self.stats_transport.record(endpoint, time.perf_counter() - started, ok=False)
+                    response.release()
+                    await asyncio.sleep(delay)
+                    continue
+
+            self.stats_transport.record(endpoint, time.perf_counter() - started, ok=response.status < 400)
+            try:
+                yield response
+            finally:
+                response.release()
+            return
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
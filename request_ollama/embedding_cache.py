@@ -0,0 +1,183 @@
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+
+class EmbeddingCache:
+    """
+    کش دوسطحی embedding‌ها: یک LRU محدود در حافظه و یک لایه پایدار SQLite روی دیسک با حذف بر اساس حجم
+    کلید هر مورد هش (نام مدل، متن نرمال‌شده) است. بردارها با طول واحد ذخیره می‌شوند تا خروجی نرمال‌شده /api/embed
+    و خروجی خام /api/embeddings (مسیر جایگزین نسخه‌های قدیمی Ollama) زیر یک کلید یکسان باشند.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, disk_path: str = "request_ollama/cache/embeddings.sqlite", memory_items: int = 10000,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            disk_path: مسیر فایل SQLite لایه دیسک (None برای غیرفعال کردن لایه دیسک)
+            memory_items: حداکثر تعداد بردارهای نگه‌داشته‌شده در حافظه
+            max_disk_bytes: حداکثر حجم بردارهای ذخیره‌شده روی دیسک
+        """
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        self._disk_bytes = 0
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+                self._db = sqlite3.connect(disk_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+                self._db.commit()
+                self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+            except Exception as e:
+                print(f"خطا در راه‌اندازی کش دیسکی embedding: {e}")
+                self._db = None
+
+    @classmethod
+    def default(cls):
+        """
+        نمونه مشترک کش برای همه نمونه‌های OllamaAPI در یک پردازه
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """
+        نرمال‌سازی متن پیش از ساخت کلید (یونیکد NFKC و یکسان‌سازی فاصله‌ها)
+        """
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    @staticmethod
+    def unit(vector) -> array:
+        """
+        نرمال‌سازی L2 بردار (بردار صفر بدون تغییر می‌ماند)
+        """
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return array("f", (v / norm for v in vector))
+
+    @classmethod
+    def make_key(cls, model: str, text: str) -> str:
+        return hashlib.sha1(f"{model}\0{cls.normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str):
+        """
+        Returns:
+            list یا None: بردار embedding در صورت وجود در کش
+        """
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: list) -> list:
+        """
+        جستجوی چند متن در کش؛ برای متن‌های یافت‌نشده None برمی‌گرداند
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        results = [None] * len(keys)
+        disk_lookup = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    results[i] = vector.tolist()
+                else:
+                    disk_lookup.append(i)
+
+            if disk_lookup and self._db is not None:
+                now = time.time()
+                for i in disk_lookup:
+                    row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (keys[i],)).fetchone()
+                    if row is None:
+                        continue
+                    vector = array("f")
+                    vector.frombytes(row[0])
+                    vector = self.unit(vector)  # ردیف‌های قدیمی‌تر ممکن است بردار خام /api/embeddings باشند
+                    self._db.execute("UPDATE embeddings SET last_access = ? WHERE key = ?", (now, keys[i]))
+                    self._remember(keys[i], vector)
+                    self._stats["disk_hits"] += 1
+                    results[i] = vector.tolist()
+                self._db.commit()
+
+            self._stats["misses"] += sum(1 for result in results if result is None)
+        return results
+
+    def put(self, model: str, text: str, vector: list):
+        self.put_many(model, [text], [vector])
+
+    def put_many(self, model: str, texts: list, vectors: list):
+        """
+        ذخیره بردارها (نرمال‌شده به طول واحد) در هر دو لایه کش (بردارهای خالی ذخیره نمی‌شوند)
+        """
+        now = time.time()
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                if not vector:
+                    continue
+                key = self.make_key(model, text)
+                packed = self.unit(vector)
+                self._remember(key, packed)
+                if self._db is not None:
+                    blob = packed.tobytes()
+                    previous = self._db.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                        (key, blob, len(blob), now),
+                    )
+                    self._disk_bytes += len(blob) - (previous[0] if previous else 0)
+            if self._db is not None:
+                self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, vector: array):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """
+        حذف قدیمی‌ترین موارد (بر اساس آخرین دسترسی) تا حجم لایه دیسک به ۹۰٪ سقف برسد
+        """
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        target = int(self.max_disk_bytes * 0.9)
+        rows = self._db.execute("SELECT key, size FROM embeddings ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._disk_bytes -= size
+            self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        """
+        آمار برخورد/عدم برخورد کش
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
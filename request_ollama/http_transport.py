@@ -0,0 +1,181 @@
+import time
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HttpTransport:
+    """
+    لایه مشترک ارتباط HTTP برای کلاینت‌های API
+    یک requests.Session با استخر اتصال‌های پایدار (keep-alive)، مهلت اتصال/خواندن، تلاش مجدد با
+    عقب‌نشینی نمایی برای خطاهای گذرا و آمار تأخیر به تفکیک endpoint.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    # وضعیت‌هایی که برای درخواست‌های idempotent (GET و embedding) گذرا در نظر گرفته شده و دوباره تلاش می‌شوند
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    # برای درخواست‌های تولید متن فقط وضعیت‌هایی که یعنی درخواست پردازش نشده است؛ پس از 500/502/504 ممکن است
+    # تولید (و هزینه مدل آنلاین) روی سرور انجام شده باشد
+    UNPROCESSED_STATUSES = (429, 503)
+    MAX_RETRY_AFTER = 60.0  # انتظار Retry-After طولانی‌تر از این مقدار رعایت نمی‌شود و پاسخ خطا برگردانده می‌شود
+
+    def __init__(self, pool_size: int = 16, connect_timeout: float = 3.05, read_timeout: float = 300.0,
+                 retries: int = 3, backoff_factor: float = 0.5, latency_window: int = 1000):
+        """
+        Args:
+            pool_size: حداکثر اتصال‌های باز به هر میزبان (حداقل برابر تعداد workerهای همزمان)
+            connect_timeout: مهلت برقراری اتصال (ثانیه)
+            read_timeout: مهلت انتظار برای پاسخ (ثانیه)؛ برای تولید متن با مدل‌های محلی باید بزرگ باشد
+            retries: حداکثر تعداد تلاش مجدد برای خطای اتصال و وضعیت‌های گذرا
+            backoff_factor: ضریب عقب‌نشینی نمایی بین تلاش‌ها
+            latency_window: تعداد آخرین تأخیرهای نگه‌داشته‌شده برای محاسبه صدک‌ها
+        """
+        self.pool_size = 0
+        self.timeout = (connect_timeout, read_timeout)
+        self.latency_window = latency_window
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+        # urllib3 فقط خطای برقراری اتصال را دوباره تلاش می‌کند (درخواست هنوز ارسال نشده است)؛ خطای خواندن
+        # تکرار نمی‌شود تا یک تولید طولانی دو بار روی مدل اجرا نشود و وضعیت‌های گذرا در request بررسی می‌شوند
+        self._retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=0,
+            backoff_factor=backoff_factor,
+            raise_on_status=False,
+        )
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.ensure_pool_size(pool_size)
+
+    @classmethod
+    def default(cls):
+        """
+        نمونه مشترک transport برای همه کلاینت‌های API در یک پردازه
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def ensure_pool_size(self, pool_size: int):
+        """
+        بزرگ کردن استخر اتصال‌ها تا حداقل pool_size اتصال همزمان به هر میزبان بدون باز کردن اتصال اضافه
+        """
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=self._retry)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self.pool_size = pool_size
+
+    @classmethod
+    def retry_statuses(cls, method: str, idempotent: bool = None) -> tuple:
+        """
+        وضعیت‌هایی که یک درخواست با آن‌ها دوباره ارسال می‌شود؛ پیش‌فرض: فقط GET idempotent است
+        """
+        if idempotent is None:
+            idempotent = method.upper() == "GET"
+        return cls.RETRY_STATUSES if idempotent else cls.UNPROCESSED_STATUSES
+
+    @classmethod
+    def retry_delay(cls, headers, attempt: int, backoff_factor: float):
+        """
+        زمان انتظار پیش از تلاش بعدی: Retry-After سرور (ثانیه یا تاریخ HTTP) یا عقب‌نشینی نمایی
+        Returns:
+            float یا None اگر Retry-After از MAX_RETRY_AFTER طولانی‌تر باشد
+        """
+        retry_after = (headers.get("Retry-After") or "").strip()
+        delay = backoff_factor * (2 ** attempt)
+        if retry_after.isdigit():
+            delay = float(retry_after)
+        elif retry_after:
+            try:
+                delay = max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+        return delay if delay <= cls.MAX_RETRY_AFTER else None
+
+    def request(self, method: str, url: str, timeout=None, idempotent: bool = None, **kwargs) -> requests.Response:
+        """
+        ارسال درخواست از طریق session مشترک و ثبت تأخیر آن
+        Args:
+            timeout: مهلت این درخواست (عدد یا (اتصال، خواندن))؛ پیش‌فرض مهلت‌های transport
+            idempotent: True اگر تکرار درخواست بی‌خطر باشد (مثلاً embedding)؛ پیش‌فرض فقط برای GET.
+                درخواست‌های غیر idempotent فقط پس از 429/503 دوباره ارسال می‌شوند
+            **kwargs: پارامترهای requests مانند json، headers یا stream
+        """
+        endpoint = urlsplit(url).path or "/"
+        statuses = self.retry_statuses(method, idempotent)
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except Exception:
+                self.record(endpoint, time.perf_counter() - started, ok=False)
+                raise
+            self.record(endpoint, time.perf_counter() - started, ok=response.status_code < 400)
+            if response.status_code not in statuses or attempt >= self.retries:
+                return response
+            delay = self.retry_delay(response.headers, attempt, self.backoff_factor)
+            if delay is None:
+                return response
+            response.close()
+            time.sleep(delay)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def record(self, endpoint: str, latency: float, ok: bool):
+        """
+        ثبت تأخیر یک درخواست؛ کلاینت‌های async نیز آمار خود را در همین transport ثبت می‌کنند
+        """
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = {
+                    "count": 0, "errors": 0, "total": 0.0, "max": 0.0,
+                    "latencies": deque(maxlen=self.latency_window),
+                }
+            stats["count"] += 1
+            stats["errors"] += 0 if ok else 1
+            stats["total"] += latency
+            stats["max"] = max(stats["max"], latency)
+            stats["latencies"].append(latency)
+
+    def stats(self) -> dict:
+        """
+        آمار تأخیر هر endpoint (میلی‌ثانیه)؛ برای درخواست‌های stream زمان تا دریافت سرآیندها اندازه‌گیری می‌شود
+        Returns:
+            dict: نگاشت مسیر endpoint به count، errors، mean_ms، p50_ms، p95_ms و max_ms
+        """
+        report = {}
+        with self._lock:
+            for endpoint, stats in self._stats.items():
+                latencies = sorted(stats["latencies"])
+                report[endpoint] = {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "mean_ms": stats["total"] / stats["count"] * 1000,
+                    "p50_ms": latencies[len(latencies) // 2] * 1000,
+                    "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+                    "max_ms": stats["max"] * 1000,
+                }
+        return report
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,382 @@
+import time
+import asyncio
+from collections import deque
+
+
+class CircuitBreaker:
+    """
+    قطع‌کننده مدار برای یک سرویس مدل
+    closed: درخواست‌ها عادی ارسال می‌شوند؛ پس از failure_threshold خطای متوالی به open می‌رود.
+    open: هیچ درخواستی ارسال نمی‌شود تا reset_timeout ثانیه بگذرد.
+    half_open: فقط یک درخواست آزمایشی مجاز است؛ موفقیت آن مدار را می‌بندد و خطای آن دوباره بازش می‌کند.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        """
+        آیا می‌توان درخواستی به این سرویس فرستاد (در حالت half_open یک درخواست آزمایشی رزرو می‌شود)
+        """
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """
+        آزاد کردن درخواست آزمایشی که بدون نتیجه لغو شد (مثلاً بازنده یک درخواست hedge)
+        """
+        self._probing = False
+
+
+class BackendStats:
+    """
+    آمار چرخشی تأخیر و خطای یک سرویس روی آخرین window درخواست
+    """
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.hedges = 0      # دفعاتی که این سرویس به عنوان درخواست hedge فرستاده شد
+        self.hedge_wins = 0  # دفعاتی که درخواست hedge زودتر از سرویس اول پاسخ داد
+        self.failovers = 0   # دفعاتی که این سرویس پس از خطای سرویس قبلی جایگزین شد
+
+    def record(self, latency: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+
+    def percentile(self, q: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    @property
+    def error_rate(self) -> float:
+        return 1 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class RouterError(Exception):
+    """هیچ سرویسی پاسخ موفق نداد"""
+
+
+class ModelRouter:
+    """
+    مسیریاب درخواست‌های مدل زبانی بین چند سرویس (مثلاً Ollama محلی و OpenRouter)
+    اگر سرویس اول تا صدک ۹۵ تأخیر خودش پاسخ ندهد، همان درخواست به سرویس بعدی هم فرستاده می‌شود (hedge)
+    و اولین پاسخ موفق استفاده و درخواست دیگر لغو می‌شود. سرویس‌های پرخطا با قطع‌کننده مدار کنار گذاشته می‌شوند.
+    پاسخ‌های جریانی (route_stream) از همان قطع‌کننده‌ها و جایگزینی استفاده می‌کنند ولی hedge نمی‌شوند.
+    """
+
+    def __init__(self, backends: dict, is_error=None, hedge_delay: float = 5.0, min_samples: int = 5,
+                 window: int = 100, timeout: float = 120.0, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 stream_backends: dict = None):
+        """
+        Args:
+            backends: نگاشت نام سرویس به تابع async که لیست پیام‌ها را می‌گیرد و متن پاسخ برمی‌گرداند
+            stream_backends: نگاشت نام سرویس به تابعی که لیست پیام‌ها را می‌گیرد و async generator بخش‌های پاسخ است
+            is_error: تابعی که پاسخ‌های متنی خطا را تشخیص می‌دهد (کلاینت‌ها خطا را به صورت متن برمی‌گردانند)
+            hedge_delay: زمان انتظار پیش از hedge وقتی هنوز آمار کافی (min_samples) از سرویس وجود ندارد
+            window: تعداد آخرین درخواست‌های هر سرویس در آمار چرخشی
+            timeout: حداکثر زمان انتظار برای پاسخ هر سرویس
+            failure_threshold / reset_timeout: تنظیمات قطع‌کننده مدار
+        """
+        self.backends = dict(backends)
+        self.stream_backends = dict(stream_backends or {})
+        self.is_error = is_error or (lambda response: False)
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self.stats_by_backend = {name: BackendStats(window) for name in self.backends}
+        self.breakers = {name: CircuitBreaker(failure_threshold, reset_timeout) for name in self.backends}
+
+    def hedge_delay_for(self, name: str) -> float:
+        """
+        زمان انتظار پیش از ارسال درخواست hedge: صدک ۹۵ تأخیر سرویس (یا مقدار پیش‌فرض)
+        """
+        stats = self.stats_by_backend[name]
+        if len(stats.latencies) < self.min_samples:
+            return self.hedge_delay
+        return stats.percentile(0.95)
+
+    async def _call(self, name: str, messages: list) -> str:
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self.backends[name](messages), self.timeout)
+            if self.is_error(response):
+                raise RouterError(f"{name}: {response}")
+        except asyncio.CancelledError:
+            self.breakers[name].release()
+            raise
+        except Exception:
+            self.stats_by_backend[name].record(time.perf_counter() - started, ok=False)
+            self.breakers[name].record_failure()
+            raise
+        self.stats_by_backend[name].record(time.perf_counter() - started, ok=True)
+        self.breakers[name].record_success()
+        return response
+
+    def _order(self, preferred: str = None) -> list:
+        order = list(self.backends)
+        if preferred in self.backends:
+            order.remove(preferred)
+            order.insert(0, preferred)
+        return order
+
+    async def route(self, messages: list, preferred: str = None) -> tuple:
+        """
+        ارسال درخواست به بهترین سرویس در دسترس با hedge و جایگزینی در صورت خطا
+        Args:
+            preferred: سرویس ترجیحی (مثلاً انتخاب کاربر)؛ در غیر این صورت ترتیب backends
+        Returns:
+            tuple: (پاسخ، نام سرویسی که پاسخ داد)
+        """
+        waiting = self._order(preferred)
+        tasks = {}
+        hedged = set()
+        last_error = None
+
+        def launch(reason: str = None) -> bool:
+            while waiting:
+                name = waiting.pop(0)
+                if self.breakers[name].allow():
+                    if reason == "hedge":
+                        self.stats_by_backend[name].hedges += 1
+                        hedged.add(name)
+                    elif reason == "failover":
+                        self.stats_by_backend[name].failovers += 1
+                    tasks[asyncio.ensure_future(self._call(name, messages))] = name
+                    return True
+            return False
+
+        if not launch():
+            raise RouterError("هیچ سرویس مدلی در دسترس نیست (همه مدارها باز هستند).")
+        primary = next(iter(tasks.values()))
+
+        try:
+            hedge_at = time.perf_counter() + self.hedge_delay_for(primary)
+            while tasks:
+                timeout = max(0.0, hedge_at - time.perf_counter()) if waiting else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # سرویس فعلی از صدک ۹۵ خود کندتر است: ارسال همزمان به سرویس بعدی
+                    launch("hedge")
+                    hedge_at = float("inf")
+                    continue
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is None:
+                        if name in hedged:
+                            self.stats_by_backend[name].hedge_wins += 1
+                        return task.result(), name
+                    last_error = task.exception()
+                    print(f"⚠️ خطای سرویس {name}: {last_error}")
+                if not tasks:
+                    # همه درخواست‌های در جریان ناموفق بودند: جایگزینی فوری با سرویس بعدی
+                    launch("failover")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        raise last_error or RouterError("هیچ سرویس مدلی پاسخ نداد.")
+
+    async def route_stream(self, messages: list, preferred: str = None):
+        """
+        دریافت جریانی پاسخ از اولین سرویس در دسترس
+        خطای اتصال یا پاسخ خطا پیش از اولین بخش پاسخ به سرویس بعدی منتقل می‌شود؛ پس از آن که بخشی از پاسخ
+        برگردانده (و احتمالاً پخش) شد جایگزینی ممکن نیست. hedge انجام نمی‌شود چون دو پاسخ جریانی را نمی‌توان همزمان پخش کرد.
+        Yields:
+            tuple: (نام سرویس، بخش پاسخ)
+        """
+        last_error = None
+        for name in self._order(preferred):
+            if name not in self.stream_backends or not self.breakers[name].allow():
+                continue
+            if last_error is not None:
+                self.stats_by_backend[name].failovers += 1
+
+            started = time.perf_counter()
+            chunks = self.stream_backends[name](messages)
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                if self.is_error(first):
+                    raise RouterError(f"{name}: {first}")
+            except StopAsyncIteration:
+                first = ""
+            except asyncio.CancelledError:
+                self.breakers[name].release()
+                await chunks.aclose()
+                raise
+            except Exception as e:
+                self.stats_by_backend[name].record(time.perf_counter() - started, ok=False)
+                self.breakers[name].record_failure()
+                await chunks.aclose()
+                last_error = e
+                print(f"⚠️ خطای سرویس {name}: {e}")
+                continue
+
+            failed = False
+            try:
+                if first:
+                    yield name, first
+                async for chunk in chunks:
+                    yield name, chunk
+            except Exception:
+                failed = True
+                raise
+            finally:
+                await chunks.aclose()
+                self.stats_by_backend[name].record(time.perf_counter() - started, ok=not failed)
+                if failed:
+                    self.breakers[name].record_failure()
+                else:
+                    self.breakers[name].record_success()
+            return
+
+        raise last_error or RouterError("هیچ سرویس مدلی در دسترس نیست (همه مدارها باز هستند).")
+
+    def stats(self) -> dict:
+        """
+        آمار هر سرویس: تعداد، نرخ خطا، صدک‌های تأخیر (میلی‌ثانیه)، وضعیت مدار و آمار hedge
+        """
+        report = {}
+        for name, stats in self.stats_by_backend.items():
+            p50, p95 = stats.percentile(0.5), stats.percentile(0.95)
+            report[name] = {
+                "requests": len(stats.outcomes),
+                "error_rate": stats.error_rate,
+                "p50_ms": p50 * 1000 if p50 is not None else None,
+                "p95_ms": p95 * 1000 if p95 is not None else None,
+                "circuit": self.breakers[name].state,
+                "hedges": stats.hedges,
+                "hedge_wins": stats.hedge_wins,
+                "failovers": stats.failovers,
+            }
+        return report
+
+
+def main():
+    """
+    نمایش مسیریاب با دو سرور محلی جایگزین Ollama و OpenRouter:
+    ۱) حالت عادی با تأخیرهای گاه‌به‌گاه طولانی در Ollama (hedge)، ۲) از کار افتادن Ollama (باز شدن مدار)،
+    ۳) بازگشت Ollama (درخواست آزمایشی و بسته شدن مدار)
+    """
+    import json
+    import random
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from request_ollama.async_ollama_api import AsyncOllamaAPI
+    from request_ollama.async_openrouter_api import AsyncOpenRouterAPI
+    from request_ollama.async_transport import AsyncHttpTransport
+
+    state = {"ollama_down": False}
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path == "/api/chat":
+                if state["ollama_down"]:
+                    self.send_response(500)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                # معمولاً سریع، ولی ۱۵٪ درخواست‌ها کند
+                time.sleep(1.0 if random.random() < 0.15 else random.uniform(0.03, 0.08))
+                body = {"message": {"role": "assistant", "content": "پاسخ Ollama"}, "done": True}
+            else:
+                time.sleep(random.uniform(0.12, 0.18))
+                body = {"choices": [{"message": {"content": "پاسخ OpenRouter"}}]}
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # درخواست بازنده hedge توسط مسیریاب لغو شده است
+
+    servers = []
+    for _ in range(2):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    ollama_url = f"http://127.0.0.1:{servers[0].server_port}"
+    online_url = f"http://127.0.0.1:{servers[1].server_port}/v1"
+
+    async def run():
+        random.seed(0)
+        ollama = AsyncOllamaAPI(base_url=ollama_url, use_cache=False, async_transport=AsyncHttpTransport(retries=0))
+        online = AsyncOpenRouterAPI("demo-key", online_url, async_transport=AsyncHttpTransport(retries=0))
+        router = ModelRouter(
+            {"ollama": lambda messages: ollama.chat(messages, model="demo"),
+             "online": lambda messages: online.generate_response(messages, model="demo")},
+            is_error=lambda response: response.startswith("خطا"),
+            hedge_delay=0.5, failure_threshold=3, reset_timeout=1.0, timeout=5.0,
+        )
+        messages = [{"role": "user", "content": "سلام"}]
+
+        async def phase(title: str, count: int):
+            print(f"\n--- {title} ---")
+            for i in range(count):
+                started = time.perf_counter()
+                try:
+                    _, backend = await router.route(messages, preferred="ollama")
+                except Exception as e:
+                    backend = f"خطا ({e})"
+                print(f"{i + 1:>3}. {backend:<8} {(time.perf_counter() - started) * 1000:>7.1f} ms  "
+                      f"مدار Ollama: {router.breakers['ollama'].state}")
+
+        await phase("حالت عادی", 30)
+        state["ollama_down"] = True
+        await phase("Ollama از کار افتاده", 6)
+        state["ollama_down"] = False
+        await asyncio.sleep(1.1)
+        await phase("بازگشت Ollama", 4)
+
+        print(f"\n{'backend':<8} {'req':>5} {'err%':>6} {'p50ms':>8} {'p95ms':>8} {'circuit':>10} {'hedges':>7} {'wins':>5} {'failover':>9}")
+        for name, row in router.stats().items():
+            p50 = f"{row['p50_ms']:.1f}" if row["p50_ms"] is not None else "-"
+            p95 = f"{row['p95_ms']:.1f}" if row["p95_ms"] is not None else "-"
+            print(f"{name:<8} {row['requests']:>5} {row['error_rate'] * 100:>6.1f} {p50:>8} {p95:>8} "
+                  f"{row['circuit']:>10} {row['hedges']:>7} {row['hedge_wins']:>5} {row['failovers']:>9}")
+        await ollama.close()
+        await online.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,54 @@
-import requests
 import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from request_ollama.adaptive_batcher import AdaptiveBatchController
+from request_ollama.embedding_cache import EmbeddingCache
+from request_ollama.http_transport import HttpTransport
 
 class OllamaAPI:
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        """راه‌اندازی کلاس ارتباط با Ollama API"""
+    def __init__(self, base_url: str = "http://localhost:11434", batch_controller: AdaptiveBatchController = None,
+                 embedding_cache: EmbeddingCache = None, use_cache: bool = True, transport: HttpTransport = None,
+                 keep_alive: str = "30m"):
+        """
+        راه‌اندازی کلاس ارتباط با Ollama API
+        Args:
+            embedding_cache: کش embedding (پیش‌فرض: کش مشترک پردازه)
+            use_cache: غیرفعال کردن کش embedding در صورت False
+            transport: لایه HTTP با اتصال‌های پایدار (پیش‌فرض: transport مشترک پردازه)
+            keep_alive: مدت ماندن مدل در حافظه Ollama پس از هر درخواست (هر درخواست این زمان را از نو شروع می‌کند)
+        """
         self.base_url = base_url
         self.generate_url = f"{base_url}/api/generate"
+        self.chat_url = f"{base_url}/api/chat"
         self.embeddings_url = f"{base_url}/api/embeddings"
+        self.embed_url = f"{base_url}/api/embed"  # endpoint چندورودی embedding
+        self.batch_controller = batch_controller or AdaptiveBatchController()
+        self._embed_endpoint_available = True
+        self.embedding_cache = (embedding_cache or EmbeddingCache.default()) if use_cache else None
+        self.transport = transport or HttpTransport.default()
+        # هر درخواست همزمان embedding یک اتصال از استخر می‌گیرد
+        self.transport.ensure_pool_size(self.batch_controller.max_concurrency)
+        self._local = threading.local()  # آمار آخرین پاسخ chat برای هر thread
+        self.keep_alive = keep_alive
+
+    def _generate_payload(self, prompt: str, model: str, stream: bool, **kwargs) -> dict:
+        default_options = {
+            "temperature": 0.3,
+            "top_p": 0.9,
+            "num_predict": 1000
+        }
+
+        # ترکیب تنظیمات پیش‌فرض با تنظیمات ورودی
+        options = {**default_options, **kwargs.get('options', {})}
+
+        return {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": kwargs.get("keep_alive", self.keep_alive),  # keep_alive پارامتر درخواست است نه options
+            "options": options
+        }
 
     def generate_response(self, prompt: str, model: str = "llama3.1:8b", **kwargs) -> str:
         """
@@ -19,24 +61,8 @@ class OllamaAPI:
             str: پاسخ مدل
         """
         try:
-            default_options = {
-                "keep_alive": "30m",
-                "temperature": 0.3,
-                "top_p": 0.9,
-                "num_predict": 1000
-            }
-            
-            # ترکیب تنظیمات پیش‌فرض با تنظیمات ورودی
-            options = {**default_options, **kwargs.get('options', {})}
-            
-            payload = {
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": options
-            }
-            
-            response = requests.post(self.generate_url, json=payload)  # حذف پروکسی و SSLContext
+            payload = self._generate_payload(prompt, model, stream=False, **kwargs)
+            response = self.transport.post(self.generate_url, json=payload)
             response.raise_for_status()
             
             result = response.json()
@@ -46,6 +72,153 @@ class OllamaAPI:
             print(f"خطا در دریافت پاسخ از مدل: {e}")
             return "خطا در دریافت پاسخ از مدل."
 
+    def generate_stream(self, prompt: str, model: str = "llama3.1:8b", **kwargs):
+        """
+        دریافت پاسخ مدل به صورت جریانی (NDJSON)؛ هر قطعه متن به محض تولید برگردانده می‌شود
+        Args:
+            prompt: متن ورودی
+            model: نام مدل
+            **kwargs: تنظیمات اضافی مانند temperature, top_p و غیره
+        Yields:
+            str: قطعه‌های متوالی پاسخ مدل
+        """
+        try:
+            payload = self._generate_payload(prompt, model, stream=True, **kwargs)
+            with self.transport.post(self.generate_url, json=payload, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+
+        except Exception as e:
+            print(f"خطا در دریافت پاسخ جریانی از مدل: {e}")
+            yield "خطا در دریافت پاسخ از مدل."
+
+    @property
+    def last_metrics(self) -> dict:
+        """
+        آمار زمانی آخرین پاسخ chat در همین thread (مقادیر duration بر حسب نانوثانیه طبق گزارش Ollama)
+        prompt_eval_count فقط توکن‌هایی را می‌شمارد که واقعاً ارزیابی شده‌اند؛ پیشوند موجود در کش مدل شمرده نمی‌شود.
+        """
+        return getattr(self._local, "metrics", {})
+
+    def _chat_payload(self, messages: list, model: str, stream: bool, **kwargs) -> dict:
+        default_options = {
+            "temperature": 0.3,
+            "top_p": 0.9,
+            "num_predict": 1000
+        }
+        return {
+            "model": model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": kwargs.get("keep_alive", self.keep_alive),  # مدل و کش پرامپت آن بین نوبت‌ها در حافظه می‌ماند
+            "options": {**default_options, **kwargs.get('options', {})}
+        }
+
+    METRIC_KEYS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration",
+                   "load_duration", "total_duration")
+
+    def _reset_metrics(self):
+        self._local.metrics = {}
+
+    def _record_metrics(self, result: dict):
+        self._local.metrics = {key: result.get(key, 0) for key in self.METRIC_KEYS}
+
+    def chat(self, messages: list, model: str = "llama3.1:8b", **kwargs) -> str:
+        """
+        دریافت پاسخ از endpoint /api/chat با پیام‌های ساخت‌یافته
+        برای استفاده مجدد از کش پرامپت مدل، پیام‌های ثابت (system و تاریخچه) باید ابتدا و محتوای متغیر در انتها باشند.
+        Args:
+            messages: لیست پیام‌ها شامل system, user، و assistant
+            model: نام مدل
+            **kwargs: تنظیمات اضافی (options و keep_alive)
+        Returns:
+            str: پاسخ مدل
+        """
+        try:
+            self._reset_metrics()
+            payload = self._chat_payload(messages, model, stream=False, **kwargs)
+            response = self.transport.post(self.chat_url, json=payload)
+            response.raise_for_status()
+
+            result = response.json()
+            self._record_metrics(result)
+            return result.get("message", {}).get("content", "")
+
+        except Exception as e:
+            print(f"خطا در دریافت پاسخ از مدل: {e}")
+            return "خطا در دریافت پاسخ از مدل."
+
+    def chat_stream(self, messages: list, model: str = "llama3.1:8b", **kwargs):
+        """
+        نسخه جریانی chat (NDJSON)؛ آمار زمانی پس از پایان جریان در last_metrics قرار می‌گیرد
+        Yields:
+            str: قطعه‌های متوالی پاسخ مدل
+        """
+        try:
+            self._reset_metrics()
+            payload = self._chat_payload(messages, model, stream=True, **kwargs)
+            with self.transport.post(self.chat_url, json=payload, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    content = chunk.get("message", {}).get("content")
+                    if content:
+                        yield content
+                    if chunk.get("done"):
+                        self._record_metrics(chunk)
+                        break
+
+        except Exception as e:
+            print(f"خطا در دریافت پاسخ جریانی از مدل: {e}")
+            yield "خطا در دریافت پاسخ از مدل."
+
+    def preload(self, model: str, embedding: bool = False) -> bool:
+        """
+        بارگذاری مدل در حافظه Ollama پیش از اولین درخواست واقعی
+        درخواست generate بدون prompt فقط مدل را بارگذاری می‌کند؛ مدل‌های embedding از generate پشتیبانی نمی‌کنند
+        و با یک ورودی کوتاه بارگذاری می‌شوند.
+        Args:
+            model: نام مدل
+            embedding: True برای مدل‌های embedding
+        Returns:
+            bool: موفقیت بارگذاری
+        """
+        try:
+            if not embedding:
+                # درخواست بدون prompt فقط مدل را بارگذاری می‌کند و تکرار آن بی‌خطر است
+                response = self.transport.post(
+                    self.generate_url, json={"model": model, "keep_alive": self.keep_alive}, idempotent=True
+                )
+            elif self._embed_endpoint_available:
+                response = self.transport.post(
+                    self.embed_url, json={"model": model, "input": "warm-up", "keep_alive": self.keep_alive},
+                    idempotent=True,
+                )
+            else:
+                response = self.transport.post(
+                    self.embeddings_url, json={"model": model, "prompt": "warm-up", "keep_alive": self.keep_alive},
+                    idempotent=True,
+                )
+            response.raise_for_status()
+            return True
+
+        except Exception as e:
+            print(f"هشدار: بارگذاری اولیه مدل {model} انجام نشد: {e}")
+            return False
+
     def get_embedding(self, text: str, model: str = "nomic-embed-text") -> list:
         """
         دریافت embedding برای متن
@@ -55,18 +228,112 @@ class OllamaAPI:
         Returns:
             list: بردار embedding
         """
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(model, text)
+            if cached is not None:
+                return cached
+
+        embedding = self._request_embedding(text, model)
+        if embedding and self.embedding_cache is not None:
+            self.embedding_cache.put(model, text, embedding)
+        return embedding
+
+    def _request_embedding(self, text: str, model: str) -> list:
+        """
+        ارسال درخواست embedding یک متن به endpoint /api/embeddings
+        خروجی این endpoint نرمال نیست؛ مانند /api/embed به طول واحد نرمال می‌شود تا نتیجه (و کش) به endpoint بستگی نداشته باشد.
+        """
         try:
             payload = {
                 "model": model,
-                "prompt": text
+                "prompt": text,
+                "keep_alive": self.keep_alive
             }
             
-            response = requests.post(self.embeddings_url, json=payload)
+            response = self.transport.post(self.embeddings_url, json=payload, idempotent=True)
             response.raise_for_status()
             
             result = response.json()
-            return result.get("embedding", [])
+            return EmbeddingCache.unit(result.get("embedding", [])).tolist()
             
         except Exception as e:
             print(f"خطا در دریافت embedding: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def get_embeddings_batch(self, texts: list, model: str = "nomic-embed-text") -> list:
+        """
+        دریافت embedding چند متن با endpoint چندورودی /api/embed
+        متن‌ها به دسته‌هایی با اندازه تطبیقی تقسیم و با همزمانی تطبیقی ارسال می‌شوند.
+        Args:
+            texts: لیست متن‌ها
+            model: نام مدل embedding
+        Returns:
+            list: لیست بردارها به ترتیب متن‌ها (برای متن‌های ناموفق لیست خالی)
+        """
+        texts = list(texts)
+        results = [[] for _ in texts]
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get_many(model, texts)
+            missing = [i for i, vector in enumerate(cached) if vector is None]
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    results[i] = vector
+            if missing:
+                fetched = self._fetch_embeddings_batch([texts[i] for i in missing], model)
+                for i, vector in zip(missing, fetched):
+                    results[i] = vector
+                self.embedding_cache.put_many(model, [texts[i] for i in missing], fetched)
+            return results
+        return self._fetch_embeddings_batch(texts, model)
+
+    def _fetch_embeddings_batch(self, texts: list, model: str) -> list:
+        """
+        دریافت embedding متن‌ها از Ollama با اندازه دسته و همزمانی تطبیقی
+        """
+        results = [[] for _ in texts]
+        controller = self.batch_controller
+        position = 0
+        with ThreadPoolExecutor(max_workers=controller.max_concurrency) as executor:
+            while position < len(texts):
+                # هر موج به اندازه همزمانی فعلی دسته ارسال می‌کند تا تغییرات کنترل‌کننده در موج بعد اعمال شود
+                futures = []
+                for _ in range(controller.concurrency):
+                    if position >= len(texts):
+                        break
+                    batch = list(range(position, min(position + controller.batch_size, len(texts))))
+                    position = batch[-1] + 1
+                    futures.append((batch, executor.submit(self._embed_batch, [texts[i] for i in batch], model)))
+                for batch, future in futures:
+                    for i, embedding in zip(batch, future.result()):
+                        results[i] = embedding
+        return results
+
+    def _embed_batch(self, texts: list, model: str) -> list:
+        """
+        ارسال یک دسته متن در یک درخواست HTTP؛ در نسخه‌های قدیمی Ollama که /api/embed ندارند
+        به درخواست جداگانه برای هر متن برمی‌گردد.
+        """
+        if not self._embed_endpoint_available:
+            return [self._request_embedding(text, model) for text in texts]
+
+        with self.batch_controller.slot():
+            started = time.perf_counter()
+            try:
+                payload = {"model": model, "input": texts, "keep_alive": self.keep_alive}
+                response = self.transport.post(self.embed_url, json=payload, idempotent=True)
+                if response.status_code == 404 and "model" not in response.text.lower():
+                    self._embed_endpoint_available = False
+                    print("هشدار: endpoint /api/embed در دسترس نیست؛ از /api/embeddings استفاده می‌شود.")
+                else:
+                    response.raise_for_status()
+                    embeddings = response.json().get("embeddings", [])
+                    if len(embeddings) != len(texts):
+                        raise ValueError("تعداد embedding‌های دریافتی با تعداد متن‌ها برابر نیست.")
+                    self.batch_controller.record(time.perf_counter() - started, ok=True)
+                    return embeddings
+            except Exception as e:
+                self.batch_controller.record(time.perf_counter() - started, ok=False)
+                print(f"خطا در دریافت embedding دسته‌ای: {e}")
+                return [[] for _ in texts]
+
+        return [self._request_embedding(text, model) for text in texts]
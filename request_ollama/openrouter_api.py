@@ -1,13 +1,15 @@
 import requests
 import json
+from request_ollama.http_transport import HttpTransport
 
 class OpenRouterAPI:
-    def __init__(self, api_key: str, base_url: str):
+    def __init__(self, api_key: str, base_url: str, transport: HttpTransport = None):
         """
         کلاس برای ارتباط با OpenRouter API
         Args:
             api_key: کلید API برای احراز هویت
             base_url: آدرس پایه API OpenRouter
+            transport: لایه HTTP با اتصال‌های پایدار (پیش‌فرض: transport مشترک پردازه)
         """
         if not api_key:
             raise ValueError("کلید API تنظیم نشده است.")
@@ -16,6 +18,15 @@ class OpenRouterAPI:
 
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")  # حذف اسلش انتهایی در صورت وجود
+        self.transport = transport or HttpTransport.default()
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost",
+            "X-Title": "MyChatbot"
+        }
 
     def generate_response(self, messages: list, model: str = "deepseek/deepseek-v3-base:free") -> str:
         """
@@ -27,20 +38,13 @@ class OpenRouterAPI:
             str: پاسخ تولیدشده توسط مدل
         """
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost",
-                "X-Title": "MyChatbot"
-            }
-
             payload = {
                 "model": model,
                 "messages": messages  # ارسال تاریخچه مکالمه
             }
 
             url = f"{self.base_url}/chat/completions"
-            response = requests.post(url, headers=headers, json=payload)
+            response = self.transport.post(url, headers=self._headers(), json=payload)
 
             # بررسی وضعیت پاسخ
             if response.status_code != 200:
@@ -58,3 +62,52 @@ class OpenRouterAPI:
         except Exception as e:
             print(f"❌ خطای کلی: {e}")
             return "خطای کلی در ارتباط با OpenRouter API."
+
+    def generate_stream(self, messages: list, model: str = "deepseek/deepseek-v3-base:free"):
+        """
+        دریافت پاسخ به صورت جریانی (Server-Sent Events)؛ هر قطعه متن به محض تولید برگردانده می‌شود
+        Args:
+            messages: لیست پیام‌ها شامل system, user، و assistant
+            model: نام مدل
+        Yields:
+            str: قطعه‌های متوالی پاسخ مدل
+        """
+        try:
+            payload = {
+                "model": model,
+                "messages": messages,
+                "stream": True
+            }
+
+            url = f"{self.base_url}/chat/completions"
+            with self.transport.post(url, headers=self._headers(), json=payload, stream=True) as response:
+                if response.status_code != 200:
+                    print(f"❌ وضعیت HTTP: {response.status_code}")
+                    print(f"🧾 پاسخ سرور: {response.text}")
+                    yield "خطا در دریافت پاسخ از مدل آنلاین."
+                    return
+
+                for raw_line in response.iter_lines():
+                    # رمزگشایی صریح UTF-8؛ سرآیند text/event-stream معمولاً charset ندارد
+                    line = raw_line.decode("utf-8")
+                    # خطوط خالی جداکننده رویدادها و خطوط «:» توضیحات keep-alive هستند
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    error = event.get("error")
+                    if error:
+                        raise RuntimeError(error.get("message", error) if isinstance(error, dict) else error)
+                    content = event.get("choices", [{}])[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+
+        except requests.exceptions.RequestException as req_err:
+            print(f"⛔ خطای اتصال به OpenRouter: {req_err}")
+            yield "خطای اتصال به OpenRouter."
+
+        except Exception as e:
+            print(f"❌ خطای کلی: {e}")
+            yield "خطای کلی در ارتباط با OpenRouter API."
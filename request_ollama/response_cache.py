@@ -0,0 +1,206 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from request_ollama.embedding_cache import EmbeddingCache
+
+
+class ResponseCache:
+    """
+    کش پاسخ‌های مدل زبانی با دو نوع جستجو:
+    - دقیق: هش (مدل، پرسش نرمال‌شده، اثرانگشت متن زمینه و تاریخچه مکالمه، نسخه نمایه)
+    - معنایی: پرسش‌های تقریباً یکسان با همان مدل، متن زمینه، تاریخچه و نسخه نمایه که شباهت embedding آن‌ها از آستانه بیشتر است
+    تاریخچه در اثرانگشت می‌آید چون پاسخ پرسش‌های ادامه‌دار (مثلاً «بیشتر توضیح بده») به مکالمه قبلی وابسته است.
+    موارد در یک LRU حافظه و یک جدول SQLite نگهداری می‌شوند و با TTL و سقف تعداد حذف می‌شوند.
+    """
+
+    def __init__(self, disk_path: str = "request_ollama/cache/responses.sqlite", memory_items: int = 1000,
+                 ttl: float = 7 * 24 * 3600, max_entries: int = 5000, similarity_threshold: float = 0.95):
+        """
+        Args:
+            disk_path: مسیر فایل SQLite (None برای کش فقط در حافظه)
+            memory_items: حداکثر تعداد پاسخ‌های نگه‌داشته‌شده در حافظه
+            ttl: عمر هر پاسخ بر حسب ثانیه
+            max_entries: حداکثر تعداد پاسخ‌های ذخیره‌شده روی دیسک
+            similarity_threshold: حداقل شباهت کسینوسی پرسش‌ها برای استفاده از پاسخ یک پرسش مشابه
+        """
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._memory = OrderedDict()  # key -> (response, created)
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+                self._db = sqlite3.connect(disk_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, model TEXT NOT NULL, context_fp TEXT NOT NULL, scope TEXT NOT NULL, "
+                    "version TEXT NOT NULL, prompt TEXT NOT NULL, vector BLOB, response TEXT NOT NULL, "
+                    "created REAL NOT NULL, last_access REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_lookup ON responses(model, context_fp, scope, version)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+                self._db.commit()
+            except Exception as e:
+                print(f"خطا در راه‌اندازی کش پاسخ‌ها: {e}")
+                self._db = None
+
+    @staticmethod
+    def fingerprint(text: str, history: list = None) -> str:
+        """
+        اثرانگشت متن زمینه بازیابی‌شده و پیام‌های تاریخچه‌ای که همراه پرسش به مدل فرستاده می‌شوند
+        """
+        digest = hashlib.sha1(EmbeddingCache.normalize_text(text or "").encode("utf-8"))
+        for message in history or []:
+            digest.update(f"\0{message['role']}\0{message['content']}".encode("utf-8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def make_key(cls, model: str, prompt: str, context_fp: str, scope: str, version: str) -> str:
+        prompt = EmbeddingCache.normalize_text(prompt).lower()
+        return hashlib.sha1(f"{model}\0{prompt}\0{context_fp}\0{scope}\0{version}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str, context: str, scope: str, version: str, query_vector: list = None,
+            history: list = None):
+        """
+        جستجوی پاسخ ذخیره‌شده
+        Args:
+            scope: حوزه نمایه (مثلاً pdf:__corpus__ یا web)
+            version: نسخه فعلی نمایه؛ پاسخ‌های نسخه‌های دیگر استفاده نمی‌شوند
+            query_vector: embedding پرسش برای جستجوی معنایی (اختیاری)
+            history: پیام‌های تاریخچه مکالمه که همراه پرسش به مدل فرستاده می‌شوند
+        Returns:
+            tuple یا None: (پاسخ، "exact" یا "similar")
+        """
+        context_fp = self.fingerprint(context, history)
+        key = self.make_key(model, prompt, context_fp, scope, version)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return entry[0], "exact"
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    self._touch(key, now)
+                    self._remember(key, row[0], row[1])
+                    self._stats["exact_hits"] += 1
+                    return row[0], "exact"
+
+                if query_vector:
+                    query = EmbeddingCache.unit(query_vector)
+                    rows = self._db.execute(
+                        "SELECT key, vector, response, created FROM responses "
+                        "WHERE model = ? AND context_fp = ? AND scope = ? AND version = ? AND created >= ? "
+                        "AND vector IS NOT NULL",
+                        (model, context_fp, scope, version, now - self.ttl),
+                    ).fetchall()
+                    best = None
+                    for row_key, blob, response, created in rows:
+                        vector = array("f")
+                        vector.frombytes(blob)
+                        if len(vector) != len(query):
+                            continue
+                        similarity = sum(a * b for a, b in zip(query, vector))
+                        if similarity >= self.similarity_threshold and (best is None or similarity > best[0]):
+                            best = (similarity, row_key, response)
+                    if best is not None:
+                        self._touch(best[1], now)
+                        self._stats["similar_hits"] += 1
+                        return best[2], "similar"
+
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, model: str, prompt: str, context: str, scope: str, version: str, response: str,
+            query_vector: list = None, history: list = None):
+        """
+        ذخیره پاسخ مدل
+        """
+        context_fp = self.fingerprint(context, history)
+        key = self.make_key(model, prompt, context_fp, scope, version)
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            if self._db is None:
+                return
+            blob = EmbeddingCache.unit(query_vector).tobytes() if query_vector else None
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model, context_fp, scope, version, prompt, vector, response, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, context_fp, scope, version, EmbeddingCache.normalize_text(prompt), blob, response, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def invalidate(self, scope: str, current_version: str) -> int:
+        """
+        حذف پاسخ‌های یک حوزه که با نسخه‌ای غیر از نسخه فعلی نمایه ساخته شده‌اند
+        Returns:
+            int: تعداد پاسخ‌های حذف‌شده
+        """
+        with self._lock:
+            # کلیدهای حافظه شامل نسخه هستند و با نسخه جدید هرگز تطبیق نمی‌یابند؛ فقط حافظه را سبک می‌کنیم
+            self._memory.clear()
+            if self._db is None:
+                return 0
+            removed = self._db.execute(
+                "DELETE FROM responses WHERE scope = ? AND version != ?", (scope, current_version)
+            ).rowcount
+            self._db.commit()
+            self._stats["evictions"] += removed
+        return removed
+
+    def _touch(self, key: str, now: float):
+        self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        self._db.commit()
+
+    def _remember(self, key: str, response: str, created: float):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        """
+        حذف پاسخ‌های منقضی و در صورت عبور از سقف، کم‌استفاده‌ترین پاسخ‌ها تا ۹۰٪ سقف
+        """
+        self._stats["evictions"] += self._db.execute(
+            "DELETE FROM responses WHERE created < ?", (now - self.ttl,)
+        ).rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - int(self.max_entries * 0.9)
+            self._stats["evictions"] += self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            ).rowcount
+
+    def stats(self) -> dict:
+        """
+        آمار برخورد/عدم برخورد کش پاسخ‌ها
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_items"] = (
+                self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self._db is not None else 0
+            )
+        lookups = stats["exact_hits"] + stats["similar_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["similar_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,230 @@
+import os
+import time
+import numpy as np
+from search_pdf.embedding_store import EmbeddingStore, l2_normalize, select_top_k
+
+
+class ExactIndex:
+    """
+    جستجوی دقیق (اسکن کامل) روی همه بردارهای ذخیره‌ساز
+    """
+
+    name = "exact"
+
+    def __init__(self, store: EmbeddingStore):
+        self.store = store
+
+    def search(self, query_vectors, k: int = 5, threshold: float = None) -> list:
+        return self.store.top_k(query_vectors, k=k, threshold=threshold)
+
+
+class IVFIndex:
+    """
+    شاخص تقریبی IVF (Inverted File) پیاده‌سازی‌شده با NumPy
+    بردارها با k-means کروی به n_lists خوشه تقسیم می‌شوند و هنگام جستجو فقط n_probe خوشه نزدیک‌تر اسکن می‌شوند.
+    افزایش n_probe دقت (recall) را بالا و سرعت را پایین می‌آورد.
+    """
+
+    name = "ivf"
+
+    def __init__(self, n_lists: int = None, n_probe: int = 8, kmeans_iters: int = 10, seed: int = 0):
+        """
+        Args:
+            n_lists: تعداد خوشه‌ها (پیش‌فرض: جذر تعداد بردارها)
+            n_probe: تعداد خوشه‌هایی که در هر جستجو اسکن می‌شوند
+            kmeans_iters: تعداد تکرارهای k-means هنگام ساخت
+            seed: بذر تصادفی برای تکرارپذیری ساخت شاخص
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.store = None
+        self.centroids = None
+        self.list_offsets = None
+        self.list_ids = None
+        self.source_mtime = None
+
+    def build(self, store: EmbeddingStore, source_mtime: int = None):
+        """
+        ساخت شاخص با خوشه‌بندی بردارهای ذخیره‌ساز
+        """
+        vectors = store.vectors
+        n = len(vectors)
+        n_lists = max(1, min(self.n_lists or int(np.sqrt(n)), n))
+        rng = np.random.default_rng(self.seed)
+
+        # آموزش مراکز خوشه روی یک نمونه برای محدود کردن زمان ساخت
+        sample_size = min(n, n_lists * 64)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=n_lists)
+            filled = counts > 0
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+            # خوشه‌های خالی مرکز قبلی خود را حفظ می‌کنند
+            centroids[filled] = l2_normalize(np.add.reduceat(sample[order], starts, axis=0))
+
+        assignment = self._assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_lists)
+
+        self.n_lists = n_lists
+        self.store = store
+        self.centroids = centroids
+        self.list_ids = order.astype(np.int64)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.source_mtime = source_mtime
+        return self
+
+    @staticmethod
+    def _assign(vectors, centroids, batch_size: int = 8192) -> np.ndarray:
+        """
+        تخصیص همه بردارها به نزدیک‌ترین مرکز خوشه به صورت دسته‌ای
+        """
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), batch_size):
+            batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            assignment[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+        return assignment
+
+    def search(self, query_vectors, k: int = 5, threshold: float = None, n_probe: int = None) -> list:
+        """
+        جستجوی تقریبی؛ فقط بردارهای n_probe خوشه نزدیک‌تر امتیازدهی می‌شوند
+        اگر ذخیره‌ساز نسخه کوانتیزه داشته باشد، اعضای خوشه‌ها با آن امتیازدهی و فقط k * rescore_factor نامزد برتر
+        از ماتریس float32 دوباره امتیازدهی می‌شوند.
+        Returns:
+            list: برای هر پرسش یک زوج (اندیس‌ها، امتیازها)
+        """
+        queries = l2_normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        n_probe = max(1, min(n_probe or self.n_probe, self.n_lists))
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if queries.shape[1] != self.centroids.shape[1]:
+            return [empty for _ in range(len(queries))]
+
+        centroid_scores = queries @ self.centroids.T
+        results = []
+        for query, scores in zip(queries, centroid_scores):
+            probes = np.argpartition(scores, -n_probe)[-n_probe:] if n_probe < self.n_lists else np.arange(self.n_lists)
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes
+            ])
+            if len(candidates) == 0:
+                results.append(empty)
+                continue
+            candidates.sort()  # دسترسی ترتیبی به ماتریس memory-map شده
+            quantized = self.store.quantized
+            n_candidates = max(k, k * self.store.rescore_factor)
+            if quantized is not None and len(candidates) > n_candidates:
+                # امتیازدهی اعضای خوشه‌ها روی نسخه کوانتیزه مقیم و امتیازدهی دقیق float32 فقط برای نامزدهای برتر
+                positions, _ = select_top_k(quantized.row_scores(query, candidates), n_candidates)
+                candidates = np.sort(candidates[positions])
+            candidate_scores = np.asarray(self.store.vectors[candidates], dtype=np.float32) @ query
+            positions, top_scores = select_top_k(candidate_scores, k, threshold)
+            results.append((candidates[positions], top_scores))
+        return results
+
+    @staticmethod
+    def path_for(base_path: str) -> str:
+        return f"{base_path}.ivf.npz"
+
+    def save(self, path: str):
+        """
+        ذخیره شاخص (مراکز خوشه و فهرست‌های معکوس) در یک فایل npz
+        """
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_ids=self.list_ids,
+            params=np.array([self.n_lists, self.n_probe, self.kmeans_iters, self.seed], dtype=np.int64),
+            source_mtime=np.array([-1 if self.source_mtime is None else self.source_mtime], dtype=np.int64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, store: EmbeddingStore):
+        """
+        بارگذاری شاخص ذخیره‌شده و اتصال آن به ذخیره‌ساز بردارها
+        """
+        with np.load(path) as data:
+            n_lists, n_probe, kmeans_iters, seed = (int(v) for v in data["params"])
+            index = cls(n_lists=n_lists, n_probe=n_probe, kmeans_iters=kmeans_iters, seed=seed)
+            index.centroids = data["centroids"]
+            index.list_offsets = data["list_offsets"]
+            index.list_ids = data["list_ids"]
+            source_mtime = int(data["source_mtime"][0])
+            index.source_mtime = None if source_mtime < 0 else source_mtime
+        if len(index.list_ids) != len(store):
+            raise ValueError("شاخص IVF با ذخیره‌ساز بردارها هماهنگ نیست.")
+        index.store = store
+        return index
+
+
+def recall_latency_report(store: EmbeddingStore, queries, k: int = 5, n_lists: int = None,
+                          n_probe_values=(1, 2, 4, 8, 16, 32)) -> list:
+    """
+    مقایسه دقت (recall@k) و تأخیر شاخص IVF با جستجوی دقیق برای مقادیر مختلف n_probe
+    Returns:
+        list: برای هر n_probe یک دیکشنری شامل recall و میانگین تأخیر (میلی‌ثانیه)
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    exact = ExactIndex(store)
+
+    start = time.perf_counter()
+    truth = [set(idx.tolist()) for idx, _ in (exact.search(q, k)[0] for q in queries)]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    index = IVFIndex(n_lists=n_lists).build(store)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    report = []
+    for n_probe in n_probe_values:
+        if n_probe > index.n_lists:
+            break
+        start = time.perf_counter()
+        found = [index.search(q, k, n_probe=n_probe)[0][0] for q in queries]
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(truth[i] & set(f.tolist())) / max(1, len(truth[i])) for i, f in enumerate(found)])
+        report.append({
+            "n_lists": index.n_lists,
+            "n_probe": n_probe,
+            "recall": float(recall),
+            "ivf_ms": ivf_ms,
+            "exact_ms": exact_ms,
+            "build_ms": build_ms,
+        })
+    return report
+
+
+def main():
+    """
+    تابع اصلی برای اجرای گزارش recall/تأخیر روی یک فایل embedding ذخیره‌شده
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="گزارش recall و تأخیر شاخص IVF در مقایسه با جستجوی دقیق")
+    parser.add_argument("base_path", help="مسیر پایه فایل‌های embedding (بدون پسوند)، مثلاً search_pdf/embeddings/1")
+    parser.add_argument("--queries", type=int, default=100, help="تعداد پرسش‌های نمونه")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--n-lists", type=int, default=None)
+    args = parser.parse_args()
+
+    store = EmbeddingStore.load(args.base_path)
+    rng = np.random.default_rng(0)
+    # پرسش‌های نمونه: بردارهای موجود به همراه نویز کوچک
+    picks = rng.choice(len(store), min(args.queries, len(store)), replace=False)
+    queries = np.asarray(store.vectors[np.sort(picks)]) + rng.normal(scale=0.05, size=(len(picks), store.dim))
+
+    print(f"تعداد بردارها: {len(store)}، بعد: {store.dim}، k={args.k}")
+    print(f"{'n_lists':>8} {'n_probe':>8} {'recall':>8} {'ivf_ms':>10} {'exact_ms':>10}")
+    for row in recall_latency_report(store, queries, k=args.k, n_lists=args.n_lists):
+        print(f"{row['n_lists']:>8} {row['n_probe']:>8} {row['recall']:>8.3f} {row['ivf_ms']:>10.3f} {row['exact_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
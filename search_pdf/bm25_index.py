@@ -0,0 +1,136 @@
+import os
+import numpy as np
+from utils.text_processing import TextProcessor
+
+
+class BM25Index:
+    """
+    نمایه معکوس BM25 برای جستجوی واژگانی متون فارسی/انگلیسی
+    فهرست‌های معکوس به صورت آرایه‌های فشرده (CSR) نگهداری می‌شوند: برای هر واژه بازه‌ای از شناسه بخش‌ها و فراوانی‌ها.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.empty(0, dtype=np.int32)
+        self.term_freqs = np.empty(0, dtype=np.float32)
+        self.doc_lengths = np.empty(0, dtype=np.float32)
+        self.source_mtime = None
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def build(self, texts: list, source_mtime: int = None):
+        """
+        ساخت نمایه از لیست متن بخش‌ها (اندیس هر متن همان شناسه بخش است)
+        """
+        postings = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            tokens = TextProcessor.tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((doc_id, count))
+
+        terms = sorted(postings)
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        lengths = [len(postings[term]) for term in terms]
+        self.term_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.doc_ids = np.fromiter((d for term in terms for d, _ in postings[term]), dtype=np.int32,
+                                   count=int(self.term_offsets[-1]))
+        self.term_freqs = np.fromiter((c for term in terms for _, c in postings[term]), dtype=np.float32,
+                                      count=int(self.term_offsets[-1]))
+        self.doc_lengths = doc_lengths
+        self.source_mtime = source_mtime
+        return self
+
+    def search(self, query: str, k: int = 5):
+        """
+        امتیازدهی BM25 بخش‌ها برای یک پرسش
+        Returns:
+            tuple: (اندیس‌ها، امتیازها، تعداد واژه‌های پرسش موجود در هر نتیجه، تعداد واژه‌های یکتای پرسش)
+        """
+        query_terms = list(dict.fromkeys(TextProcessor.tokenize(query)))
+        empty = np.empty(0, dtype=np.int64)
+        if not query_terms or len(self) == 0:
+            return empty, np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32), len(query_terms)
+
+        n_docs = len(self)
+        avg_length = float(self.doc_lengths.mean()) or 1.0
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / avg_length)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        matched = np.zeros(n_docs, dtype=np.int32)
+
+        for term in query_terms:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            ids = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            df = end - start
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + length_norm[ids])
+            matched[ids] += 1
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return order, scores[order], matched[order], len(query_terms)
+
+    @staticmethod
+    def path_for(base_path: str) -> str:
+        return f"{base_path}.bm25.npz"
+
+    def save(self, path: str):
+        """
+        ذخیره نمایه در کنار فایل‌های embedding
+        """
+        terms = sorted(self.vocab, key=self.vocab.get)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            terms=np.array(terms, dtype=str),
+            term_offsets=self.term_offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+            source_mtime=np.array([-1 if self.source_mtime is None else self.source_mtime], dtype=np.int64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            k1, b = (float(v) for v in data["params"])
+            index = cls(k1=k1, b=b)
+            index.vocab = {str(term): i for i, term in enumerate(data["terms"])}
+            index.term_offsets = data["term_offsets"]
+            index.doc_ids = data["doc_ids"]
+            index.term_freqs = data["term_freqs"]
+            index.doc_lengths = data["doc_lengths"]
+            source_mtime = int(data["source_mtime"][0])
+            index.source_mtime = None if source_mtime < 0 else source_mtime
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> dict:
+    """
+    ادغام چند رتبه‌بندی با Reciprocal Rank Fusion
+    Args:
+        rankings: لیستی از لیست‌های شناسه به ترتیب رتبه
+    Returns:
+        dict: نگاشت شناسه به امتیاز ادغام‌شده
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return fused
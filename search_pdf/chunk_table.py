@@ -0,0 +1,148 @@
+import os
+import hashlib
+import numpy as np
+
+
+def chunk_hash(text: str) -> str:
+    """
+    هش محتوای یک بخش متنی برای تشخیص بخش‌های جدید، تغییرکرده یا حذف‌شده
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ChunkTable:
+    """
+    جدول ستونی بخش‌ها با شناسه عددی
+    برای هر بخش فقط (سند، صفحه، آفست بایتی، طول، هش محتوا) در حافظه نگه داشته می‌شود و متن همه بخش‌ها
+    در یک فایل UTF-8 پیوسته قرار دارد که memory-map شده و فقط برای نتایج نهایی خوانده می‌شود.
+    """
+
+    DTYPE = np.dtype([
+        ("doc", np.int32),      # اندیس نام سند در لیست docs (-1 یعنی نامشخص)
+        ("page", np.int32),     # شماره صفحه (-1 یعنی نامشخص)
+        ("offset", np.int64),   # آفست بایتی متن در فایل متن
+        ("length", np.int32),   # طول بایتی متن
+        ("hash", np.uint8, (20,)),  # هش sha1 محتوا (۲۰ بایت خام)
+    ])
+
+    def __init__(self, rows: np.ndarray, blob, docs: list = None):
+        """
+        Args:
+            rows: آرایه ساخت‌یافته با نوع DTYPE
+            blob: متن همه بخش‌ها به صورت bytes یا memmap از نوع uint8
+            docs: نام اسنادی که ستون doc به آن‌ها اشاره می‌کند
+        """
+        self.rows = rows
+        self.blob = blob
+        self.docs = list(docs or [])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, idx: int) -> dict:
+        """
+        نمای دیکشنری یک بخش (متن در همین لحظه از فایل متن خوانده می‌شود)
+        """
+        chunk = {"text": self.text(idx), "page": self.page(idx), "hash": self.rows[idx]["hash"].tobytes().hex()}
+        doc = self.doc(idx)
+        if doc is not None:
+            chunk["doc"] = doc
+        return chunk
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def text(self, idx: int) -> str:
+        row = self.rows[idx]
+        start = int(row["offset"])
+        return bytes(self.blob[start:start + int(row["length"])]).decode("utf-8")
+
+    def texts(self, indices=None) -> list:
+        if indices is None:
+            indices = range(len(self))
+        return [self.text(idx) for idx in indices]
+
+    def page(self, idx: int):
+        page = int(self.rows[idx]["page"])
+        return page if page >= 0 else None
+
+    def doc(self, idx: int):
+        doc = int(self.rows[idx]["doc"])
+        return self.docs[doc] if 0 <= doc < len(self.docs) else None
+
+    def hashes(self) -> list:
+        """
+        هش محتوای همه بخش‌ها به صورت رشته هگز (بدون خواندن متن)
+        """
+        return [h.tobytes().hex() for h in self.rows["hash"]]
+
+    @classmethod
+    def from_dicts(cls, chunks: list, docs: list = None):
+        """
+        ساخت جدول از لیست دیکشنری‌های بخش (text، page و در صورت وجود doc و hash)
+        """
+        docs = list(docs or [])
+        doc_ids = {name: i for i, name in enumerate(docs)}
+        rows = np.zeros(len(chunks), dtype=cls.DTYPE)
+        parts = []
+        offset = 0
+        for i, chunk in enumerate(chunks):
+            encoded = chunk["text"].encode("utf-8")
+            doc = chunk.get("doc")
+            if doc is not None and doc not in doc_ids:
+                doc_ids[doc] = len(docs)
+                docs.append(doc)
+            page = chunk.get("page")
+            rows[i] = (
+                doc_ids.get(doc, -1) if doc is not None else (0 if len(docs) == 1 else -1),
+                page if page is not None else -1,
+                offset,
+                len(encoded),
+                np.frombuffer(bytes.fromhex(chunk.get("hash") or chunk_hash(chunk["text"])), dtype=np.uint8),
+            )
+            parts.append(encoded)
+            offset += len(encoded)
+        return cls(rows, b"".join(parts), docs)
+
+    @classmethod
+    def concat(cls, tables: list, names: list):
+        """
+        ادغام جدول‌های چند سند بدون رمزگشایی متن‌ها؛ همه سطرهای جدول i به سند names[i] نسبت داده می‌شوند
+        """
+        rows = []
+        parts = []
+        offset = 0
+        for doc_id, table in enumerate(tables):
+            table_rows = table.rows.copy()
+            table_rows["doc"] = doc_id
+            table_rows["offset"] += offset
+            rows.append(table_rows)
+            blob = bytes(table.blob)
+            parts.append(blob)
+            offset += len(blob)
+        merged = np.concatenate(rows) if rows else np.zeros(0, dtype=cls.DTYPE)
+        return cls(merged, b"".join(parts), names)
+
+    @staticmethod
+    def paths(base_path: str):
+        return f"{base_path}.chunks.npy", f"{base_path}.text.bin"
+
+    def save(self, base_path: str):
+        rows_file, text_file = self.paths(base_path)
+        tmp_file = rows_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            np.save(f, self.rows)
+        os.replace(tmp_file, rows_file)
+        tmp_file = text_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(bytes(self.blob))
+        os.replace(tmp_file, text_file)
+
+    @classmethod
+    def load(cls, base_path: str, docs: list = None):
+        rows_file, text_file = cls.paths(base_path)
+        rows = np.load(rows_file)
+        # فایل خالی قابل memory-map نیست
+        blob = np.memmap(text_file, dtype=np.uint8, mode="r") if os.path.getsize(text_file) else b""
+        return cls(rows, blob, docs)
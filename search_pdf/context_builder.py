@@ -0,0 +1,130 @@
+import math
+import numpy as np
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    تخمین تعداد توکن‌های یک متن بدون نیاز به tokenizer مدل
+    تقریباً هر ۴ بایت UTF-8 یک توکن است (حدود ۴ نویسه انگلیسی یا ۲ نویسه فارسی).
+    """
+    return max(1, math.ceil(len(text.encode("utf-8")) / 4)) if text else 0
+
+
+class ContextBuilder:
+    """
+    ساخت متن زمینه (context) با بودجه توکنی
+    ابتدا بخش‌های تقریباً تکراری حذف می‌شوند، سپس با MMR به هر بخش ارزشی بر اساس ارتباط و تنوع داده می‌شود
+    و در نهایت با یک کوله‌پشتی ۰/۱ بهترین ترکیب بخش‌ها در بودجه توکنی انتخاب می‌شود.
+    اگر هیچ بخشی در بودجه جا نشود، ابتدای مرتبط‌ترین بخش تا سقف بودجه نگه داشته می‌شود تا متن زمینه خالی نماند.
+    بودجه پیش‌فرض یک بخش کامل (۱۰۰۰ نویسه فارسی، حدود ۵۰۰ توکن) را پوشش می‌دهد.
+    """
+
+    def __init__(self, token_budget: int = 600, mmr_lambda: float = 0.7, duplicate_threshold: float = 0.95,
+                 token_counter=None):
+        """
+        Args:
+            token_budget: حداکثر تعداد توکن متن زمینه
+            mmr_lambda: وزن ارتباط در برابر تنوع در MMR (۱ یعنی فقط ارتباط)
+            duplicate_threshold: شباهت کسینوسی که بالاتر از آن دو بخش تکراری در نظر گرفته می‌شوند
+            token_counter: تابع شمارش توکن (پیش‌فرض: estimate_tokens)
+        """
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.token_counter = token_counter or estimate_tokens
+
+    def build(self, results: list, vectors) -> tuple:
+        """
+        Args:
+            results: نتایج جستجو به ترتیب رتبه (هر نتیجه شامل context و score)
+            vectors: بردارهای نرمال‌شده نتایج به همان ترتیب (embedding‌های ذخیره‌شده)
+        Returns:
+            tuple: (متن زمینه، گزارش شامل نتایج انتخاب‌شده و توکن‌های صرفه‌جویی‌شده)
+        """
+        report = {"selected": [], "candidate_tokens": 0, "used_tokens": 0, "saved_tokens": 0, "duplicates": 0}
+        if not results:
+            return "", report
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        tokens = [self.token_counter(result["context"]) for result in results]
+        report["candidate_tokens"] = sum(tokens)
+
+        # ارتباط: امتیاز جستجو نرمال‌شده به بازه [0, 1]
+        scores = np.array([result["score"] for result in results], dtype=np.float32)
+        spread = scores.max() - scores.min()
+        relevance = (scores - scores.min()) / spread if spread > 0 else np.ones(len(results), dtype=np.float32)
+
+        similarity = vectors @ vectors.T if len(vectors) else np.zeros((len(results), len(results)), dtype=np.float32)
+
+        # حذف بخش‌های تقریباً تکراری (بخش با رتبه بالاتر نگه داشته می‌شود)
+        kept = []
+        for i in range(len(results)):
+            if any(similarity[i, j] >= self.duplicate_threshold for j in kept):
+                report["duplicates"] += 1
+            else:
+                kept.append(i)
+
+        # ارزش MMR هر بخش بر اساس ترتیب انتخاب حریصانه
+        values = {}
+        selected = []
+        remaining = list(kept)
+        while remaining:
+            best, best_value = None, None
+            for i in remaining:
+                redundancy = max((similarity[i, j] for j in selected), default=0.0)
+                value = self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+                if best_value is None or value > best_value:
+                    best, best_value = i, value
+            values[best] = max(float(best_value), 0.0) + 1e-6
+            selected.append(best)
+            remaining.remove(best)
+
+        chosen = self._knapsack(kept, tokens, values)
+        if not chosen:
+            # هیچ بخشی کامل در بودجه جا نمی‌شود؛ مرتبط‌ترین بخش کوتاه می‌شود
+            top = selected[0]
+            text = self.truncate(results[top]["context"])
+            report["selected"] = [{**results[top], "context": text}]
+            report["used_tokens"] = self.token_counter(text)
+            report["saved_tokens"] = report["candidate_tokens"] - report["used_tokens"]
+            return text, report
+        chosen.sort()  # حفظ ترتیب رتبه جستجو در متن نهایی
+
+        report["selected"] = [results[i] for i in chosen]
+        report["used_tokens"] = sum(tokens[i] for i in chosen)
+        report["saved_tokens"] = report["candidate_tokens"] - report["used_tokens"]
+        return "\n".join(results[i]["context"] for i in chosen), report
+
+    def truncate(self, text: str) -> str:
+        """
+        کوتاه کردن متن به بلندترین ابتدای آن که در بودجه توکنی جا شود (در صورت امکان روی مرز کلمه)
+        """
+        if self.token_counter(text) <= self.token_budget:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.token_counter(text[:middle]) <= self.token_budget:
+                low = middle
+            else:
+                high = middle - 1
+        cut = text.rfind(" ", 0, low + 1)
+        return text[:cut if cut > 0 else low].rstrip()
+
+    def _knapsack(self, items: list, tokens: list, values: dict) -> list:
+        """
+        انتخاب زیرمجموعه با بیشترین مجموع ارزش که مجموع توکن‌هایش از بودجه بیشتر نشود (کوله‌پشتی ۰/۱)
+        """
+        # best[t] = (ارزش، اندیس‌ها) بهترین انتخاب با دقیقاً t توکن
+        best = {0: (0.0, [])}
+        for i in items:
+            if tokens[i] > self.token_budget:
+                continue
+            for used, (value, chosen) in list(best.items()):
+                total = used + tokens[i]
+                if total > self.token_budget:
+                    continue
+                candidate = value + values[i]
+                if total not in best or candidate > best[total][0]:
+                    best[total] = (candidate, chosen + [i])
+        return max(best.values(), key=lambda entry: entry[0])[1]
@@ -0,0 +1,244 @@
+import os
+import json
+import numpy as np
+from search_pdf.chunk_table import ChunkTable, chunk_hash
+from search_pdf.quantization import QuantizedMatrix
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    نرمال‌سازی سطرهای ماتریس به طول واحد (سطرهای صفر بدون تغییر می‌مانند)
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def select_top_k(scores: np.ndarray, k: int, threshold: float = None):
+    """
+    انتخاب k امتیاز برتر با argpartition و اعمال آستانه به صورت ماسک برداری
+    Returns:
+        tuple: (اندیس‌ها، امتیازها) به ترتیب نزولی امتیاز
+    """
+    if threshold is not None:
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+
+    if k <= 0 or len(candidates) == 0:
+        return candidates[:0], scores[candidates[:0]]
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+
+    order = np.argsort(-scores[candidates], kind="stable")
+    indices = candidates[order]
+    return indices, scores[indices]
+
+
+class EmbeddingStore:
+    """
+    ذخیره‌ساز باینری embedding‌ها
+    بردارها در یک فایل ماتریسی float32 (قابل memory-map)، اطلاعات بخش‌ها در یک جدول ستونی (ChunkTable) با متن
+    memory-map شده و اطلاعات کلی در یک فایل meta.json نگهداری می‌شوند.
+    بردارها هنگام ساخت L2-نرمال می‌شوند تا شباهت کسینوسی به یک ضرب ماتریس-بردار تبدیل شود.
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, vectors: np.ndarray, chunks, meta: dict = None, docs: list = None):
+        """
+        Args:
+            vectors: ماتریس embedding‌ها با ابعاد (تعداد بخش‌ها، بعد بردار)
+            chunks: ChunkTable یا لیست بخش‌ها به ترتیب سطرهای ماتریس (هر بخش شامل text و page)
+            meta: اطلاعات تکمیلی ذخیره‌شده در فایل meta.json
+            docs: نام اسناد (فقط هنگام ساخت از لیست بخش‌ها)
+        """
+        if not isinstance(chunks, ChunkTable):
+            chunks = ChunkTable.from_dicts(list(chunks), docs)
+        if len(vectors) != len(chunks):
+            raise ValueError("تعداد بردارها با تعداد بخش‌ها برابر نیست.")
+        self.vectors = vectors
+        self.chunks = chunks
+        self.meta = meta or {}
+        self.quantized = None  # نسخه کوانتیزه مقیم در حافظه برای امتیازدهی مرحله اول (QuantizedMatrix)
+        self.rescore_factor = 4  # تعداد نامزدهای امتیازدهی دقیق = k * rescore_factor
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    @staticmethod
+    def paths(base_path: str):
+        """
+        مسیر فایل ماتریس و فایل meta برای یک پایه مسیر (بدون پسوند)
+        """
+        return f"{base_path}.npy", f"{base_path}.meta.json"
+
+    @staticmethod
+    def _v1_table_file(base_path: str) -> str:
+        """
+        جدول جانبی JSON نسخه اول قالب (شامل متن کامل بخش‌ها)
+        """
+        return f"{base_path}.chunks.json"
+
+    @classmethod
+    def exists(cls, base_path: str) -> bool:
+        matrix_file, meta_file = cls.paths(base_path)
+        return os.path.exists(matrix_file) and (
+            os.path.exists(meta_file) or os.path.exists(cls._v1_table_file(base_path))
+        )
+
+    @classmethod
+    def from_embeddings(cls, chunks: list, embeddings: list, meta: dict = None, docs: list = None):
+        """
+        ساخت ذخیره‌ساز از لیست بخش‌ها و embedding‌های متناظر
+        embedding‌های ناموفق یا با طول نامعتبر با بردار صفر جایگزین می‌شوند.
+        """
+        dim = max((len(e) for e in embeddings if e is not None and len(e)), default=0)
+        vectors = np.zeros((len(embeddings), dim), dtype=np.float32)
+        for i, embedding in enumerate(embeddings):
+            if embedding is not None and len(embedding) == dim:
+                vectors[i] = embedding
+        return cls(l2_normalize(vectors), chunks, {**(meta or {}), "normalized": True}, docs)
+
+    def save(self, base_path: str):
+        """
+        ذخیره ماتریس، جدول بخش‌ها و فایل meta؛ هر فایل ابتدا در فایل موقت نوشته و سپس جایگزین می‌شود
+        و فایل meta در آخر نوشته می‌شود.
+        """
+        matrix_file = self.paths(base_path)[0]
+        tmp_matrix = matrix_file + ".tmp"
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        os.replace(tmp_matrix, matrix_file)
+        self.chunks.save(base_path)
+        self.save_meta(base_path)
+
+    def save_meta(self, base_path: str):
+        """
+        ذخیره فقط فایل meta (مثلاً پس از تغییر اطلاعات تکمیلی) بدون بازنویسی ماتریس و جدول بخش‌ها
+        """
+        meta_file = self.paths(base_path)[1]
+        info = {
+            "version": self.FORMAT_VERSION,
+            "count": len(self.chunks),
+            "dim": self.dim,
+            "docs": self.chunks.docs,
+            "meta": self.meta,
+        }
+        tmp_meta = meta_file + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False)
+        os.replace(tmp_meta, meta_file)
+
+    @classmethod
+    def _upgrade_v1(cls, base_path: str):
+        """
+        تبدیل جدول جانبی JSON نسخه اول به جدول ستونی و فایل متن
+        """
+        table_file = cls._v1_table_file(base_path)
+        with open(table_file, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        chunks = ChunkTable.from_dicts(table["chunks"])
+        vectors = np.load(cls.paths(base_path)[0])
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(chunks), -1)
+        cls(vectors, chunks, table.get("meta", {})).save(base_path)
+        os.remove(table_file)
+
+    @classmethod
+    def load(cls, base_path: str, mmap: bool = True, quantization: str = None):
+        """
+        بارگذاری ذخیره‌ساز؛ ماتریس و متن بخش‌ها به صورت پیش‌فرض memory-map می‌شوند تا فقط صفحات مورد نیاز خوانده شوند.
+        Args:
+            quantization: "float16" یا "int8" برای نگه‌داشتن نسخه کوانتیزه در حافظه؛ ماتریس float32 فقط برای
+                امتیازدهی دقیق نامزدهای برتر از دیسک خوانده می‌شود
+        """
+        matrix_file, meta_file = cls.paths(base_path)
+        if not os.path.exists(meta_file) and os.path.exists(cls._v1_table_file(base_path)):
+            cls._upgrade_v1(base_path)
+
+        with open(meta_file, "r", encoding="utf-8") as f:
+            info = json.load(f)
+
+        # فایل خالی قابل memory-map نیست
+        use_mmap = mmap and info.get("count", 0) > 0
+        vectors = np.load(matrix_file, mmap_mode="r" if use_mmap else None)
+        chunks = ChunkTable.load(base_path, info.get("docs"))
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(chunks), -1)
+
+        meta = info.get("meta", {})
+        store = cls(vectors, chunks, meta)
+        if not meta.get("normalized"):
+            # فایل‌های ذخیره‌شده پیش از نرمال‌سازی یک بار نرمال و بازنویسی می‌شوند
+            store = cls(l2_normalize(vectors), chunks, {**meta, "normalized": True})
+            store.save(base_path)
+            if use_mmap:
+                store.vectors = np.load(matrix_file, mmap_mode="r")
+        if quantization and len(store):
+            store.quantized = QuantizedMatrix.load_or_build(base_path, quantization, store.vectors)
+        return store
+
+    @classmethod
+    def migrate_json(cls, json_file: str, base_path: str):
+        """
+        تبدیل فایل قدیمی JSON (نگاشت متن به بردار) به قالب باینری و حذف فایل قدیمی
+        شماره صفحه در قالب قدیمی ذخیره نشده بود و نامشخص باقی می‌ماند.
+        """
+        with open(json_file, "r") as f:
+            legacy = json.load(f)
+
+        chunks = [{"text": text, "page": None, "hash": chunk_hash(text)} for text in legacy]
+        store = cls.from_embeddings(chunks, list(legacy.values()), meta={"migrated_from": os.path.basename(json_file)})
+        store.save(base_path)
+        os.remove(json_file)
+        return store
+
+    def reusable_vectors(self) -> dict:
+        """
+        نگاشت هش محتوا به سطر ماتریس برای بخش‌هایی که embedding معتبر (غیرصفر) دارند
+        """
+        if len(self) == 0:
+            return {}
+        valid = np.any(np.asarray(self.vectors) != 0, axis=1)
+        rows = {}
+        for row, content_hash in enumerate(self.chunks.hashes()):
+            if valid[row]:
+                rows.setdefault(content_hash, row)
+        return rows
+
+    def top_k(self, query_vectors, k: int = 5, threshold: float = None) -> list:
+        """
+        امتیازدهی یک یا چند بردار پرسش با یک ضرب ماتریسی و انتخاب k نتیجه برتر برای هر پرسش
+        Args:
+            query_vectors: یک بردار یا ماتریس بردارهای پرسش
+            k: تعداد نتایج برای هر پرسش
+            threshold: حداقل شباهت کسینوسی
+        Returns:
+            list: برای هر پرسش یک زوج (اندیس‌ها، امتیازها)
+        """
+        queries = l2_normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        if len(self) == 0 or queries.shape[1] != self.dim:
+            empty = np.empty(0, dtype=np.int64)
+            return [(empty, np.empty(0, dtype=np.float32)) for _ in range(len(queries))]
+
+        if self.quantized is None:
+            scores = queries @ self.vectors.T
+            return [select_top_k(row, k, threshold) for row in scores]
+
+        # مرحله اول با ماتریس کوانتیزه و سپس امتیازدهی دقیق float32 فقط برای نامزدهای برتر
+        approximate = self.quantized.scores(queries)
+        n_candidates = min(len(self), max(k, k * self.rescore_factor))
+        results = []
+        for query, row in zip(queries, approximate):
+            candidates, _ = select_top_k(row, n_candidates)
+            candidates = np.sort(candidates)
+            exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+            positions, scores = select_top_k(exact, k, threshold)
+            results.append((candidates[positions], scores))
+        return results
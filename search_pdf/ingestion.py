@@ -0,0 +1,256 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader
+from search_pdf.embedding_store import chunk_hash
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> list:
+    """
+    استخراج متن صفحات [start, end) یک فایل PDF (اجرا در پردازه‌های جداگانه)
+    Returns:
+        list: لیست سه‌تایی‌های (شماره صفحه، متن، پیام خطا)
+    """
+    reader = PdfReader(pdf_path)
+    pages = []
+    for index in range(start, min(end, len(reader.pages))):
+        try:
+            pages.append((index + 1, reader.pages[index].extract_text(), None))
+        except Exception as e:
+            pages.append((index + 1, None, str(e)))
+    return pages
+
+
+def count_pages(pdf_path: str) -> int:
+    return len(PdfReader(pdf_path).pages)
+
+
+def split_page_text(text: str, page_num: int, max_chars: int = 1000) -> list:
+    """
+    تقسیم متن یک صفحه به بخش‌های حداکثر max_chars کاراکتری بر اساس جملات
+    """
+    chunks = []
+    sentences = [s.strip() for s in text.split('.') if s.strip()]
+    current_chunk = ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) < max_chars:
+            current_chunk += " " + sentence
+        else:
+            chunks.append({'text': current_chunk.strip(), 'page': page_num})
+            current_chunk = sentence
+    if current_chunk:
+        chunks.append({'text': current_chunk.strip(), 'page': page_num})
+    return [chunk for chunk in chunks if chunk['text']]
+
+
+class StageStats:
+    """
+    شمارنده‌های یک مرحله از خط لوله (تعداد آیتم‌ها و زمان مشغول بودن)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.busy_seconds if self.busy_seconds else 0.0
+
+
+class IngestionStats:
+    """
+    آمار کلی یک اجرای خط لوله پردازش PDF
+    """
+
+    def __init__(self):
+        self.extract = StageStats("extract")
+        self.chunk = StageStats("chunk")
+        self.embed = StageStats("embed")
+        self.reused = 0
+        self.failed = 0
+        self.queue_high_water = 0
+        self.producer_wait_seconds = 0.0  # زمان انتظار تولیدکننده به دلیل پر بودن صف (back-pressure)
+        self.wall_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def mark_failed(self):
+        with self._lock:
+            self.failed += 1
+
+    def summary(self) -> str:
+        lines = [f"زمان کل: {self.wall_seconds:.2f} ثانیه"]
+        for stage in (self.extract, self.chunk, self.embed):
+            lines.append(f"  {stage.name}: {stage.items} مورد، {stage.busy_seconds:.2f} ثانیه، {stage.throughput:.1f} مورد بر ثانیه")
+        lines.append(f"  استفاده مجدد: {self.reused}، ناموفق: {self.failed}، "
+                     f"بیشینه صف: {self.queue_high_water}، انتظار back-pressure: {self.producer_wait_seconds:.2f} ثانیه")
+        return "\n".join(lines)
+
+
+class IngestionPipeline:
+    """
+    خط لوله جریانی پردازش PDF
+    صفحات در یک process pool استخراج می‌شوند، به محض رسیدن به بخش تقسیم می‌شوند و بخش‌های نیازمند embedding
+    از طریق یک صف محدود به threadهای embedding داده می‌شوند؛ به این ترتیب استخراج (پردازنده‌محور) و
+    embedding (ورودی/خروجی‌محور) همپوشانی دارند و پر شدن صف سرعت استخراج را محدود می‌کند.
+    """
+
+    _STOP = object()
+
+    def __init__(self, embed_batch_fn, batch_size_fn=None, extract_workers: int = None, embed_workers: int = 4,
+                 queue_size: int = 64, pages_per_task: int = 8):
+        """
+        Args:
+            embed_batch_fn: تابعی که لیستی از متن‌ها می‌گیرد و لیست بردارهای embedding (لیست خالی برای موارد ناموفق) برمی‌گرداند
+            batch_size_fn: تابعی که حداکثر اندازه دسته فعلی را برمی‌گرداند (پیش‌فرض: 16)
+            extract_workers: تعداد پردازه‌های استخراج متن (پیش‌فرض: تعداد هسته‌ها)
+            embed_workers: تعداد threadهای embedding
+            queue_size: ظرفیت صف بین مرحله تقسیم و مرحله embedding
+            pages_per_task: تعداد صفحات هر کار استخراج
+        """
+        self.embed_batch_fn = embed_batch_fn
+        self.batch_size_fn = batch_size_fn or (lambda: 16)
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.embed_workers = embed_workers
+        self.queue_size = queue_size
+        self.pages_per_task = pages_per_task
+
+    def run(self, pdf_path: str, pdf_name: str, reusable: dict = None):
+        """
+        اجرای خط لوله روی یک فایل PDF
+        Args:
+            reusable: نگاشت هش محتوا به بردار embedding موجود (برای پردازش افزایشی)
+        Returns:
+            tuple: (لیست بخش‌ها، لیست embedding‌ها، آمار اجرا)
+        """
+        reusable = reusable or {}
+        stats = IngestionStats()
+        started = time.perf_counter()
+
+        chunks = []
+        embeddings = {}
+        work_queue = queue.Queue(maxsize=self.queue_size)
+        workers = [
+            threading.Thread(target=self._embed_worker, args=(work_queue, chunks, embeddings, stats), daemon=True)
+            for _ in range(self.embed_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            for page_num, text, error in self._extract_pages(pdf_path, stats):
+                if error:
+                    print(f"خطا در استخراج متن از صفحه {page_num} فایل {pdf_name}: {error}")
+                    continue
+                if not text or not text.strip():
+                    print(f"هشدار: صفحه {page_num} از فایل {pdf_name} حاوی متن قابل استخراج نیست.")
+                    continue
+
+                chunk_started = time.perf_counter()
+                page_chunks = split_page_text(text, page_num)
+                for chunk in page_chunks:
+                    chunk['hash'] = chunk_hash(chunk['text'])
+                stats.chunk.add(len(page_chunks), time.perf_counter() - chunk_started)
+
+                for chunk in page_chunks:
+                    index = len(chunks)
+                    chunks.append(chunk)
+                    vector = reusable.get(chunk['hash'])
+                    if vector is not None:
+                        embeddings[index] = vector
+                        stats.reused += 1
+                        continue
+                    wait_started = time.perf_counter()
+                    work_queue.put(index)  # در صورت پر بودن صف، استخراج متوقف می‌ماند
+                    stats.producer_wait_seconds += time.perf_counter() - wait_started
+                    stats.queue_high_water = max(stats.queue_high_water, work_queue.qsize())
+        finally:
+            for _ in workers:
+                work_queue.put(self._STOP)
+            for worker in workers:
+                worker.join()
+
+        stats.wall_seconds = time.perf_counter() - started
+        return chunks, [embeddings.get(i) for i in range(len(chunks))], stats
+
+    def _extract_pages(self, pdf_path: str, stats: IngestionStats):
+        """
+        تولید صفحات استخراج‌شده به ترتیب شماره صفحه؛ تعداد کارهای در جریان محدود است
+        """
+        total_pages = count_pages(pdf_path)
+        ranges = [(start, start + self.pages_per_task) for start in range(0, total_pages, self.pages_per_task)]
+
+        try:
+            # spawn به جای fork: این مرحله در یک thread اجرا می‌شود و fork یک پردازه چندthreadی (preload مدل‌ها،
+            # session‌های HTTP و SQLite) ممکن است قفل‌های گرفته‌شده را به پردازه فرزند منتقل کند و آن را قفل کند
+            executor = ProcessPoolExecutor(max_workers=self.extract_workers,
+                                           mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError) as e:
+            print(f"هشدار: process pool در دسترس نیست ({e})؛ استخراج در همین پردازه انجام می‌شود.")
+            executor = None
+
+        if executor is None:
+            for start, end in ranges:
+                task_started = time.perf_counter()
+                pages = extract_page_range(pdf_path, start, end)
+                stats.extract.add(len(pages), time.perf_counter() - task_started)
+                yield from pages
+            return
+
+        with executor:
+            in_flight = []
+            next_range = 0
+            max_in_flight = self.extract_workers * 2
+            while next_range < len(ranges) or in_flight:
+                while next_range < len(ranges) and len(in_flight) < max_in_flight:
+                    start, end = ranges[next_range]
+                    in_flight.append((time.perf_counter(), executor.submit(extract_page_range, pdf_path, start, end)))
+                    next_range += 1
+                submitted, future = in_flight.pop(0)
+                pages = future.result()
+                stats.extract.add(len(pages), time.perf_counter() - submitted)
+                yield from pages
+
+    def _embed_worker(self, work_queue: queue.Queue, chunks: list, embeddings: dict, stats: IngestionStats):
+        """
+        برداشتن بخش‌ها از صف به صورت دسته‌ای (تا اندازه دسته فعلی) و دریافت embedding آن‌ها در یک فراخوانی
+        """
+        stopping = False
+        while not stopping:
+            batch = [work_queue.get()]
+            if batch[0] is self._STOP:
+                return
+            while len(batch) < max(1, self.batch_size_fn()):
+                try:
+                    item = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            texts = [chunks[index]['text'] for index in batch]
+            started = time.perf_counter()
+            try:
+                batch_embeddings = self.embed_batch_fn(texts)
+            except Exception as e:
+                print(f"خطا در محاسبه embedding برای {len(texts)} بخش: {e}")
+                batch_embeddings = [None] * len(texts)
+            stats.embed.add(len(batch), time.perf_counter() - started)
+
+            for index, text, embedding in zip(batch, texts, batch_embeddings):
+                if embedding:
+                    embeddings[index] = embedding
+                else:
+                    stats.mark_failed()
+                    print(f"هشدار: embedding برای متن زیر تولید نشد:\n{text[:100]}...")
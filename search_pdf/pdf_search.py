@@ -1,14 +1,32 @@
 import os
 import json
 import numpy as np
-from PyPDF2 import PdfReader
-from concurrent.futures import ThreadPoolExecutor
 from request_ollama.ollama_api import OllamaAPI
+from search_pdf.embedding_store import EmbeddingStore
+from search_pdf.chunk_table import ChunkTable
+from search_pdf.ann_index import ExactIndex, IVFIndex
+from search_pdf.ingestion import IngestionPipeline
+from search_pdf.bm25_index import BM25Index, reciprocal_rank_fusion
+from search_pdf.context_builder import ContextBuilder
 
 class PDFSearcher:
-    def __init__(self, pdf_folder: str = "search_pdf/pdf_files", embeddings_folder: str = "search_pdf/embeddings"):
+    # نام ذخیره‌ساز ادغام‌شده همه PDF‌ها (حالت corpus)
+    CORPUS_NAME = "__corpus__"
+
+    def __init__(self, pdf_folder: str = "search_pdf/pdf_files", embeddings_folder: str = "search_pdf/embeddings",
+                 index_type: str = "auto", ann_min_size: int = 20000, ann_params: dict = None,
+                 embed_workers: int = 4, retrieval_mode: str = "hybrid", lexical_fast_path: bool = True,
+                 quantization: str = None):
         """
         مقداردهی اولیه کلاس جستجوگر PDF
+        Args:
+            index_type: نوع شاخص جستجو: "exact"، "ivf" یا "auto" (IVF فقط برای مجموعه‌های بزرگ)
+            ann_min_size: حداقل تعداد بخش‌ها برای استفاده از شاخص تقریبی در حالت "auto"
+            ann_params: تنظیمات شاخص IVF مانند n_lists و n_probe
+            embed_workers: تعداد threadهای embedding در خط لوله پردازش PDF
+            retrieval_mode: روش بازیابی پیش‌فرض: "vector"، "lexical" (BM25) یا "hybrid" (ادغام هر دو با RRF)
+            lexical_fast_path: در حالت hybrid اگر بخش‌هایی شامل همه واژه‌های پرسش باشند، بدون فراخوانی مدل embedding پاسخ داده شود
+            quantization: None، "float16" یا "int8"؛ نوع نسخه مقیم ماتریس embedding‌ها برای امتیازدهی مرحله اول
         """
         self.pdf_folder = os.path.abspath(pdf_folder)
         self.embeddings_folder = os.path.abspath(embeddings_folder)
@@ -16,137 +34,432 @@ class PDFSearcher:
         os.makedirs(self.embeddings_folder, exist_ok=True)
 
         self.ollama_api = OllamaAPI()
+        # هر thread embedding خط لوله تا سقف همزمانی کنترل‌کننده درخواست موازی می‌فرستد
+        self.ollama_api.transport.ensure_pool_size(embed_workers * self.ollama_api.batch_controller.max_concurrency)
         self.embedding_model = "nomic-embed-text:latest"  # اطمینان از استفاده از مدل مورد نظر
-        self.pdf_embeddings = {}
+        self.pdf_embeddings = {}  # ذخیره‌سازهای بارگذاری‌شده که در طول اجرای برنامه در حافظه می‌مانند
+        self.index_type = index_type
+        self.ann_min_size = ann_min_size
+        self.ann_params = ann_params or {}
+        self.pdf_indexes = {}  # شاخص‌های جستجوی ساخته‌شده برای هر PDF
+        self.embed_workers = embed_workers
+        self.retrieval_mode = retrieval_mode
+        self.lexical_fast_path = lexical_fast_path
+        self.lexical_indexes = {}  # نمایه‌های BM25 بارگذاری‌شده برای هر PDF
+        self.quantization = quantization
+
+    def _store_base_path(self, pdf_name: str) -> str:
+        """
+        مسیر پایه (بدون پسوند) فایل‌های embedding یک PDF
+        """
+        return os.path.join(self.embeddings_folder, os.path.splitext(pdf_name)[0])
+
+    def _legacy_embeddings_file(self, pdf_name: str) -> str:
+        """
+        مسیر فایل JSON قدیمی embedding‌ها
+        """
+        return self._store_base_path(pdf_name) + ".json"
+
+    @staticmethod
+    def _source_fingerprint(pdf_path: str) -> dict:
+        """
+        اثر انگشت فایل PDF (اندازه و زمان آخرین تغییر) برای تشخیص به‌روزرسانی آن
+        """
+        stat = os.stat(pdf_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
 
     def process_pdf(self, pdf_name: str):
         """
-        پردازش یک فایل PDF و ذخیره embedding‌ها در فایل JSON
+        پردازش یک فایل PDF و ذخیره embedding‌ها در قالب باینری
+        پردازش به صورت افزایشی انجام می‌شود: فقط بخش‌های جدید یا تغییرکرده embedding می‌شوند،
+        بخش‌های حذف‌شده کنار گذاشته می‌شوند و embedding بقیه بخش‌ها با کمک هش محتوا دوباره استفاده می‌شود.
         """
         pdf_path = os.path.join(self.pdf_folder, pdf_name)
-        embeddings_file = os.path.join(self.embeddings_folder, f"{os.path.splitext(pdf_name)[0]}.json")
+        base_path = self._store_base_path(pdf_name)
+        legacy_file = self._legacy_embeddings_file(pdf_name)
+
+        existing = None
+        if EmbeddingStore.exists(base_path):
+            existing = EmbeddingStore.load(base_path)
+        elif os.path.exists(legacy_file):
+            print(f"در حال تبدیل فایل JSON قدیمی {os.path.basename(legacy_file)} به قالب باینری...")
+            existing = EmbeddingStore.migrate_json(legacy_file, base_path)
+
+        if existing is not None and not os.path.exists(pdf_path):
+            print(f"فایل {pdf_name} یافت نشد؛ از embedding‌های ذخیره‌شده استفاده می‌شود.")
+            return
 
-        if os.path.exists(embeddings_file):
+        fingerprint = self._source_fingerprint(pdf_path)
+        if existing is not None and existing.meta.get("source") == fingerprint \
+                and existing.meta.get("model") == self.embedding_model:
             print(f"Embedding‌های فایل {pdf_name} قبلاً ذخیره شده‌اند.")
             return
 
-        reader = PdfReader(pdf_path)
-        chunks = []
+        reusable = {}
+        if existing is not None and existing.meta.get("model", self.embedding_model) == self.embedding_model:
+            reusable = {h: existing.vectors[row] for h, row in existing.reusable_vectors().items()}
 
-        for page_num, page in enumerate(reader.pages, start=1):
-            try:
-                text = page.extract_text()
-                if text and text.strip():
-                    sentences = [s.strip() for s in text.split('.') if s.strip()]
-                    current_chunk = ""
-                    for sentence in sentences:
-                        # بازگرداندن محدودیت طول متن در هر بخش به 1000 کاراکتر
-                        if len(current_chunk) + len(sentence) < 1000:
-                            current_chunk += " " + sentence
-                        else:
-                            chunks.append({'text': current_chunk.strip(), 'page': page_num})
-                            current_chunk = sentence
-                    if current_chunk:
-                        chunks.append({'text': current_chunk.strip(), 'page': page_num})
-                else:
-                    print(f"هشدار: صفحه {page_num} از فایل {pdf_name} حاوی متن قابل استخراج نیست.")
-            except Exception as e:
-                print(f"خطا در استخراج متن از صفحه {page_num} فایل {pdf_name}: {e}")
+        pipeline = IngestionPipeline(
+            embed_batch_fn=lambda texts: self.ollama_api.get_embeddings_batch(texts, self.embedding_model),
+            batch_size_fn=lambda: self.ollama_api.batch_controller.batch_size,
+            embed_workers=self.embed_workers,
+        )
+        chunks, chunk_embeddings, stats = pipeline.run(pdf_path, pdf_name, reusable=reusable)
+        print(f"آمار پردازش فایل {pdf_name}:\n{stats.summary()}")
 
         if chunks:
-            chunk_embeddings = self._compute_embeddings_parallel(chunks)
-            embeddings_to_save = {chunk['text']: embedding for chunk, embedding in zip(chunks, chunk_embeddings)}
+            store = EmbeddingStore.from_embeddings(
+                chunks, chunk_embeddings, meta={"model": self.embedding_model, "source": fingerprint}, docs=[pdf_name]
+            )
+            store.save(base_path)
+            self._build_lexical_index(base_path, store)
+            self.pdf_embeddings.pop(pdf_name, None)
+            self.pdf_indexes.pop(pdf_name, None)
+            self.lexical_indexes.pop(pdf_name, None)
 
-            with open(embeddings_file, "w") as f:
-                json.dump(embeddings_to_save, f, ensure_ascii=False, indent=4)
-                print(f"Embedding‌های فایل {pdf_name} ذخیره شدند.")
+            current_hashes = {chunk['hash'] for chunk in chunks}
+            removed = len({h for h in reusable if h not in current_hashes})
+            print(f"Embedding‌های فایل {pdf_name} ذخیره شدند "
+                  f"(جدید: {len(chunks) - stats.reused}، استفاده مجدد: {stats.reused}، حذف‌شده: {removed}).")
         else:
             print(f"هشدار: فایل {pdf_name} حاوی متن قابل استخراج نیست.")
 
-    def _compute_embeddings_parallel(self, chunks):
+    def index_version(self, pdf_name: str = None) -> str:
         """
-        محاسبه Embedding‌ها به صورت موازی
+        نسخه فعلی ذخیره‌ساز embedding‌ها (زمان آخرین تغییر ماتریس)؛ با هر بازسازی نمایه تغییر می‌کند
         """
-        embeddings = []
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = {executor.submit(self.ollama_api.get_embedding, chunk['text'], self.embedding_model): chunk for chunk in chunks}
-            for future in futures:
-                chunk = futures[future]
-                try:
-                    embedding = future.result()
-                    if embedding:
-                        embeddings.append(embedding)
-                    else:
-                        print(f"هشدار: embedding برای متن زیر تولید نشد:\n{chunk['text'][:100]}...")
-                        embeddings.append([0] * 384)  # مقدار پیش‌فرض برای embedding ناموفق
-                except Exception as e:
-                    print(f"خطا در محاسبه embedding برای متن زیر:\n{chunk['text'][:100]}...\nخطا: {e}")
-                    embeddings.append([0] * 384)
-        return embeddings
+        vectors_file = EmbeddingStore.paths(self._store_base_path(pdf_name or self.CORPUS_NAME))[0]
+        return str(os.stat(vectors_file).st_mtime_ns) if os.path.exists(vectors_file) else ""
+
+    def list_pdfs(self) -> list:
+        """
+        فهرست مرتب‌شده فایل‌های PDF موجود در پوشه pdf_folder
+        """
+        return sorted(name for name in os.listdir(self.pdf_folder) if name.lower().endswith(".pdf"))
+
+    def corpus_fingerprints(self) -> dict:
+        """
+        اثر انگشت (اندازه و زمان تغییر) همه فایل‌های PDF پوشه؛ تفاوت آن با مقدار ذخیره‌شده در مجموعه ادغام‌شده
+        یعنی فایلی اضافه، ویرایش یا حذف شده است
+        """
+        return {name: self._source_fingerprint(os.path.join(self.pdf_folder, name)) for name in self.list_pdfs()}
+
+    def _corpus_is_current(self, store: EmbeddingStore = None) -> bool:
+        """
+        بررسی ارزان به‌روز بودن مجموعه ادغام‌شده (فقط stat فایل‌ها، بدون خواندن PDF‌ها)
+        """
+        if store is None:
+            meta_file = EmbeddingStore.paths(self._store_base_path(self.CORPUS_NAME))[1]
+            if not os.path.exists(meta_file):
+                return True  # نبود مجموعه در load_embeddings بررسی می‌شود
+            try:
+                with open(meta_file, "r", encoding="utf-8") as f:
+                    meta = json.load(f).get("meta", {})
+            except Exception:
+                return False
+        else:
+            meta = store.meta
+        return meta.get("pdfs") == self.corpus_fingerprints()
+
+    def process_corpus(self):
+        """
+        پردازش همه فایل‌های PDF پوشه و ساخت یک ذخیره‌ساز ادغام‌شده با شناسه عددی برای هر بخش
+        هر بخش در ذخیره‌ساز ادغام‌شده نام سند (doc) و شماره صفحه خود را نگه می‌دارد تا یک جستجو
+        در یک اسکن روی همه اسناد انجام شود. ذخیره‌ساز ادغام‌شده فقط در صورت تغییر یکی از اسناد بازسازی می‌شود.
+        """
+        base_path = self._store_base_path(self.CORPUS_NAME)
+        pdf_names = self.list_pdfs()
+        # وضعیت پوشه در زمان ساخت (حتی فایل‌های ناموفق) تا load_embeddings تغییرات بعدی را تشخیص دهد
+        pdfs = self.corpus_fingerprints()
+        sources = {}
+        for pdf_name in pdf_names:
+            try:
+                self.process_pdf(pdf_name)
+                doc_base = self._store_base_path(pdf_name)
+                if EmbeddingStore.exists(doc_base):
+                    sources[pdf_name] = os.stat(EmbeddingStore.paths(doc_base)[0]).st_mtime_ns
+            except Exception as e:
+                print(f"خطا در پردازش فایل {pdf_name}: {e}")
 
-    def load_embeddings(self, pdf_name: str):
+        if EmbeddingStore.exists(base_path):
+            try:
+                current = EmbeddingStore.load(base_path)
+                if current.meta.get("sources") == sources:
+                    if current.meta.get("pdfs") != pdfs:
+                        current.meta["pdfs"] = pdfs
+                        current.save_meta(base_path)
+                        self.pdf_embeddings.pop(self.CORPUS_NAME, None)
+                    print(f"مجموعه ادغام‌شده {len(sources)} سند به‌روز است.")
+                    return
+            except Exception as e:
+                print(f"خطا در بارگذاری مجموعه ادغام‌شده: {e}")
+
+        tables, names, matrices = [], [], []
+        for pdf_name in list(sources):
+            store = EmbeddingStore.load(self._store_base_path(pdf_name))
+            if matrices and len(store) and store.dim != matrices[0].shape[1]:
+                print(f"هشدار: بعد embedding فایل {pdf_name} با بقیه اسناد یکسان نیست و در مجموعه ادغام‌شده قرار نمی‌گیرد.")
+                del sources[pdf_name]
+                continue
+            if len(store):
+                tables.append(store.chunks)
+                names.append(pdf_name)
+                matrices.append(np.asarray(store.vectors))
+
+        # بردارهای هر سند از قبل نرمال شده‌اند و جدول‌ها بدون رمزگشایی متن فقط کنار هم قرار می‌گیرند
+        vectors = np.concatenate(matrices) if matrices else np.zeros((0, 0), dtype=np.float32)
+        chunks = ChunkTable.concat(tables, names)
+        store = EmbeddingStore(
+            vectors, chunks,
+            meta={"model": self.embedding_model, "sources": sources, "pdfs": pdfs, "normalized": True}
+        )
+        store.save(base_path)
+        self._build_lexical_index(base_path, store)
+        self.pdf_embeddings.pop(self.CORPUS_NAME, None)
+        self.pdf_indexes.pop(self.CORPUS_NAME, None)
+        self.lexical_indexes.pop(self.CORPUS_NAME, None)
+        print(f"مجموعه ادغام‌شده با {len(sources)} سند و {len(chunks)} بخش ذخیره شد.")
+
+    def load_embeddings(self, pdf_name: str = None):
         """
-        بارگذاری embedding‌ها از فایل JSON
+        بارگذاری embedding‌ها؛ هر فایل فقط یک بار در هر اجرای برنامه خوانده و در حافظه نگه داشته می‌شود
+        مجموعه ادغام‌شده در هر بار فراخوانی با اثر انگشت فایل‌های PDF پوشه مقایسه و در صورت تغییر به‌روزرسانی می‌شود.
+        Args:
+            pdf_name: نام فایل PDF؛ اگر None باشد ذخیره‌ساز ادغام‌شده همه PDF‌ها بارگذاری می‌شود
+        Returns:
+            EmbeddingStore یا None در صورت خطا
         """
-        embeddings_file = os.path.join(self.embeddings_folder, f"{os.path.splitext(pdf_name)[0]}.json")
-        if not os.path.exists(embeddings_file):
+        pdf_name = pdf_name or self.CORPUS_NAME
+        store = self.pdf_embeddings.get(pdf_name)
+        if pdf_name == self.CORPUS_NAME and not self._corpus_is_current(store):
+            print("فایل‌های PDF پوشه تغییر کرده‌اند؛ مجموعه ادغام‌شده به‌روزرسانی می‌شود...")
+            self.process_corpus()
+            store = self.pdf_embeddings.get(pdf_name)
+        if store is not None:
+            return store
+
+        base_path = self._store_base_path(pdf_name)
+        if not EmbeddingStore.exists(base_path):
             print(f"فایل embedding برای {pdf_name} یافت نشد. در حال پردازش PDF...")
-            self.process_pdf(pdf_name)
+            if pdf_name == self.CORPUS_NAME:
+                self.process_corpus()
+            else:
+                self.process_pdf(pdf_name)
 
         try:
-            with open(embeddings_file, "r") as f:
-                return json.load(f)
+            store = self.pdf_embeddings.get(pdf_name) or EmbeddingStore.load(base_path, quantization=self.quantization)
+            self.pdf_embeddings[pdf_name] = store
+            return store
         except Exception as e:
-            print(f"خطا در بارگذاری فایل {embeddings_file}: {e}")
-            return {}
+            print(f"خطا در بارگذاری فایل‌های embedding {base_path}: {e}")
+            return None
+
+    def search(self, query: str, pdf_name: str = None, top_k: int = 5, similarity_threshold: float = 0.7,
+               mode: str = None) -> list:
+        """
+        جستجو در یک فایل PDF (یا در همه PDF‌ها اگر pdf_name برابر None باشد) و بازگرداندن فقط بخش‌های مرتبط
+        """
+        return self.search_batch([query], pdf_name, top_k, similarity_threshold, mode)[0]
 
-    def search(self, query: str, pdf_name: str, top_k: int = 5, similarity_threshold: float = 0.7) -> list:
+    def search_batch(self, queries: list, pdf_name: str = None, top_k: int = 5, similarity_threshold: float = 0.7,
+                     mode: str = None) -> list:
         """
-        جستجوی معنایی در یک فایل PDF و بازگرداندن فقط بخش‌های مرتبط
+        جستجوی همزمان چند پرسش
+        در حالت vector همه پرسش‌ها با یک ضرب ماتریسی روی embedding‌های نرمال‌شده امتیازدهی می‌شوند؛
+        در حالت hybrid نتایج BM25 و برداری با RRF ادغام می‌شوند و بخش‌هایی که نه شباهت برداری کافی و نه
+        تطابق واژگانی دارند کنار گذاشته می‌شوند.
+        Returns:
+            list: برای هر پرسش لیستی از نتایج به ترتیب نزولی امتیاز شامل شناسه بخش، نام سند و شماره صفحه
         """
-        query_embedding = self.ollama_api.get_embedding(query, self.embedding_model)
-        embeddings = self.load_embeddings(pdf_name)
+        mode = mode or self.retrieval_mode
+        pdf_name = pdf_name or self.CORPUS_NAME
+        store = self.load_embeddings(pdf_name)
+        if store is None:
+            return [[] for _ in queries]
 
-        results = []
-        for text, embedding in embeddings.items():
-            similarity = self._cosine_similarity(query_embedding, embedding)
-            if similarity >= similarity_threshold:  # بررسی آستانه شباهت
-                results.append({'context': text, 'similarity': similarity})
+        all_results = [[] for _ in queries]
+        candidates = max(top_k * 4, 20)
+
+        lexical_hits = [None] * len(queries)
+        pending = list(range(len(queries)))
+        if mode in ("lexical", "hybrid"):
+            lexical = self.get_lexical_index(pdf_name, store)
+            lexical_hits = [lexical.search(query, k=candidates) for query in queries]
+            if mode == "lexical":
+                pending = []
+            elif self.lexical_fast_path:
+                # پرسش‌هایی که بخش‌هایی شامل همه واژه‌هایشان دارند بدون embedding پاسخ داده می‌شوند
+                pending = [i for i, (_, _, matched, n_terms) in enumerate(lexical_hits)
+                           if not (n_terms and np.any(matched == n_terms))]
+
+            pending_set = set(pending)
+            for i, (indices, scores, matched, n_terms) in enumerate(lexical_hits):
+                if i in pending_set:
+                    continue
+                if mode == "hybrid":
+                    keep = matched == n_terms
+                    indices, scores = indices[keep], scores[keep]
+                all_results[i] = [
+                    self._make_result(store, pdf_name, idx, score=float(score), bm25=float(score))
+                    for idx, score in zip(indices[:top_k], scores[:top_k])
+                ]
+
+        if not pending:
+            return all_results
+
+        query_embeddings = dict(zip(pending, self._embed_queries([queries[i] for i in pending])))
+        valid = [i for i in pending if query_embeddings[i]]
+        if not valid:
+            return all_results
+
+        index = self.get_index(pdf_name, store)
+        vector_hits = index.search(
+            [query_embeddings[i] for i in valid],
+            k=top_k if mode == "vector" else candidates,
+            threshold=similarity_threshold if mode == "vector" else None,
+        )
+        for i, (indices, scores) in zip(valid, vector_hits):
+            if mode == "vector":
+                all_results[i] = [
+                    self._make_result(store, pdf_name, idx, score=float(score), similarity=float(score))
+                    for idx, score in zip(indices, scores)
+                ]
+                continue
+
+            lexical_indices, lexical_scores = lexical_hits[i][0], lexical_hits[i][1]
+            similarities = dict(zip(indices.tolist(), scores.tolist()))
+            bm25_scores = dict(zip(lexical_indices.tolist(), lexical_scores.tolist()))
+            fused = reciprocal_rank_fusion([indices.tolist(), lexical_indices.tolist()])
+            ranked = sorted(
+                (idx for idx in fused if similarities.get(idx, -1.0) >= similarity_threshold or idx in bm25_scores),
+                key=lambda idx: -fused[idx],
+            )
+            all_results[i] = [
+                self._make_result(store, pdf_name, idx, score=fused[idx],
+                                  similarity=similarities.get(idx), bm25=bm25_scores.get(idx))
+                for idx in ranked[:top_k]
+            ]
+        return all_results
+
+    @staticmethod
+    def _make_result(store: EmbeddingStore, pdf_name: str, idx: int, score: float,
+                     similarity: float = None, bm25: float = None) -> dict:
+        # متن بخش فقط برای نتایج نهایی از فایل متن memory-map شده خوانده می‌شود
+        chunks = store.chunks
+        return {
+            'id': int(idx),
+            'context': chunks.text(idx),
+            'doc': chunks.doc(idx) or pdf_name,
+            'page': chunks.page(idx),
+            'score': score,
+            'similarity': similarity,
+            'bm25': bm25,
+        }
 
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        return results[:top_k]  # فقط `top_k` نتیجه بازگردانده می‌شود
+    def _build_lexical_index(self, base_path: str, store: EmbeddingStore) -> BM25Index:
+        """
+        ساخت نمایه BM25 بخش‌های یک ذخیره‌ساز و ذخیره آن در کنار فایل‌های embedding
+        """
+        source_mtime = os.stat(EmbeddingStore.paths(base_path)[0]).st_mtime_ns
+        index = BM25Index().build(store.chunks.texts(), source_mtime=source_mtime)
+        index.save(BM25Index.path_for(base_path))
+        return index
 
-    def get_relevant_context(self, query: str, pdf_name: str, max_chars: int = 1000) -> str:
+    def get_lexical_index(self, pdf_name: str, store: EmbeddingStore) -> BM25Index:
         """
-        دریافت متن مرتبط با سوال کاربر با محدود کردن تعداد کاراکترهای خروجی
+        بارگذاری نمایه BM25 (و ساخت دوباره آن در صورت نبود یا قدیمی بودن)
         """
-        results = self.search(query, pdf_name, top_k=5, similarity_threshold=0.7)
+        index = self.lexical_indexes.get(pdf_name)
+        if index is not None and len(index) == len(store):
+            return index
 
-        context = ""
-        total_chars = 0
+        base_path = self._store_base_path(pdf_name)
+        index_file = BM25Index.path_for(base_path)
+        source_mtime = os.stat(EmbeddingStore.paths(base_path)[0]).st_mtime_ns
+        index = None
+        if os.path.exists(index_file):
+            try:
+                index = BM25Index.load(index_file)
+                if index.source_mtime != source_mtime or len(index) != len(store):
+                    index = None
+            except Exception as e:
+                print(f"خطا در بارگذاری نمایه BM25 {index_file}: {e}")
+                index = None
+        if index is None:
+            index = self._build_lexical_index(base_path, store)
 
-        if results:
-            print("\nمتن‌های مرتبط یافت شده:")
-            for result in results:
-                text_chunk = result['context']
-                similarity = result['similarity']
+        self.lexical_indexes[pdf_name] = index
+        return index
 
-                if total_chars + len(text_chunk) <= max_chars:
-                    context += text_chunk + "\n"
-                    total_chars += len(text_chunk)
+    def get_index(self, pdf_name: str, store: EmbeddingStore):
+        """
+        انتخاب شاخص جستجو؛ برای مجموعه‌های کوچک جستجوی دقیق و برای مجموعه‌های بزرگ شاخص IVF
+        شاخص IVF روی دیسک ذخیره می‌شود و در صورت تغییر فایل embedding دوباره ساخته می‌شود.
+        """
+        index = self.pdf_indexes.get(pdf_name)
+        if index is not None and index.store is store:
+            return index
 
-                    print(f"📌 متن مرتبط (Similarity: {similarity:.2f}): {text_chunk[:100]}...")
-                else:
-                    break
+        use_ann = self.index_type == "ivf" or (self.index_type == "auto" and len(store) >= self.ann_min_size)
+        if not use_ann or len(store) == 0:
+            index = ExactIndex(store)
         else:
-            print("\n⚠️ نتیجه مرتبطی یافت نشد.")
+            base_path = self._store_base_path(pdf_name)
+            index_file = IVFIndex.path_for(base_path)
+            source_mtime = os.stat(EmbeddingStore.paths(base_path)[0]).st_mtime_ns
+            index = None
+            if os.path.exists(index_file):
+                try:
+                    index = IVFIndex.load(index_file, store)
+                    if index.source_mtime != source_mtime:
+                        index = None
+                except Exception as e:
+                    print(f"خطا در بارگذاری شاخص IVF {index_file}: {e}")
+                    index = None
+            if index is None:
+                print(f"در حال ساخت شاخص IVF برای {pdf_name} ({len(store)} بخش)...")
+                index = IVFIndex(**self.ann_params).build(store, source_mtime=source_mtime)
+                index.save(index_file)
+            if "n_probe" in self.ann_params:
+                index.n_probe = self.ann_params["n_probe"]
 
-        return context.strip()
+        self.pdf_indexes[pdf_name] = index
+        return index
 
-    @staticmethod
-    def _cosine_similarity(vec1, vec2):
+    def _embed_queries(self, queries: list) -> list:
+        """
+        دریافت embedding پرسش‌ها (در صورت چند پرسش با یک درخواست دسته‌ای)
+        """
+        if len(queries) == 1:
+            return [self.ollama_api.get_embedding(queries[0], self.embedding_model)]
+        return self.ollama_api.get_embeddings_batch(queries, self.embedding_model)
+
+    def get_relevant_context(self, query: str, pdf_name: str = None, max_tokens: int = 600,
+                             candidates: int = 10) -> str:
         """
-        محاسبه شباهت کسینوسی
+        دریافت متن مرتبط با سوال کاربر در محدوده بودجه توکنی
+        بخش‌های تقریباً تکراری حذف و بهترین ترکیب بخش‌ها (از نظر ارتباط و تنوع) در بودجه انتخاب می‌شود.
+        Args:
+            max_tokens: حداکثر تعداد توکن تخمینی متن زمینه
+            candidates: تعداد نتایج جستجو که برای انتخاب در نظر گرفته می‌شوند
         """
-        vec1, vec2 = np.array(vec1), np.array(vec2)
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
\ No newline at end of file
+        results = self.search(query, pdf_name, top_k=candidates, similarity_threshold=0.7)
+        if not results:
+            print("\n⚠️ نتیجه مرتبطی یافت نشد.")
+            return ""
+
+        # بردارهای نتایج از embedding‌های ذخیره‌شده خوانده می‌شوند (بدون فراخوانی مجدد مدل)
+        store = self.load_embeddings(pdf_name)
+        vectors = store.vectors[[result['id'] for result in results]]
+        context, report = ContextBuilder(token_budget=max_tokens).build(results, vectors)
+
+        print("\nمتن‌های مرتبط یافت شده:")
+        for result in report["selected"]:
+            similarity = result['similarity']
+            similarity_text = f"{similarity:.2f}" if similarity is not None else "-"
+            print(f"📌 متن مرتبط ({result['doc']}، صفحه {result['page']}، Similarity: {similarity_text}، "
+                  f"Score: {result['score']:.3f}): {result['context'][:100]}...")
+        print(f"توکن‌های زمینه: {report['used_tokens']} از {report['candidate_tokens']} "
+              f"(صرفه‌جویی {report['saved_tokens']} توکن، {report['duplicates']} بخش تکراری حذف شد)")
+
+        return context
@@ -0,0 +1,183 @@
+import os
+import time
+import numpy as np
+
+
+class QuantizedMatrix:
+    """
+    نسخه کم‌حجم ماتریس embedding‌ها برای امتیازدهی مرحله اول
+    float16: نصف حجم float32 با خطای بسیار کم
+    int8: یک‌چهارم حجم با کوانتیزه‌سازی اسکالر متقارن برای هر بردار (یک ضریب مقیاس float32 برای هر سطر)
+    """
+
+    KINDS = ("float16", "int8")
+
+    def __init__(self, kind: str, data: np.ndarray, scales: np.ndarray = None):
+        if kind not in self.KINDS:
+            raise ValueError(f"نوع کوانتیزه‌سازی نامعتبر است: {kind}")
+        self.kind = kind
+        self.data = data
+        self.scales = scales
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def from_float(cls, matrix, kind: str, block_rows: int = 16384):
+        """
+        کوانتیزه کردن ماتریس float32 (ممکن است memory-map باشد) به صورت بلوکی
+        """
+        n, dim = matrix.shape
+        if kind == "float16":
+            data = np.empty((n, dim), dtype=np.float16)
+            for start in range(0, n, block_rows):
+                data[start:start + block_rows] = matrix[start:start + block_rows]
+            return cls(kind, data)
+
+        data = np.empty((n, dim), dtype=np.int8)
+        scales = np.empty(n, dtype=np.float32)
+        for start in range(0, n, block_rows):
+            block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+            block_scales = np.abs(block).max(axis=1) / 127.0
+            block_scales[block_scales == 0] = 1.0
+            data[start:start + block_rows] = np.clip(np.rint(block / block_scales[:, None]), -127, 127)
+            scales[start:start + block_rows] = block_scales
+        return cls(kind, data, scales)
+
+    def scores(self, queries: np.ndarray, block_rows: int = 16384) -> np.ndarray:
+        """
+        امتیاز تقریبی پرسش‌ها در برابر همه سطرها؛ محاسبه به صورت بلوکی در float32 انجام می‌شود
+        تا حافظه موقت محدود بماند.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        result = np.empty((len(queries), len(self.data)), dtype=np.float32)
+        for start in range(0, len(self.data), block_rows):
+            block = self.data[start:start + block_rows].astype(np.float32)
+            block_scores = queries @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + block_rows]
+            result[:, start:start + block_rows] = block_scores
+        return result
+
+    def row_scores(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        امتیاز تقریبی یک پرسش فقط در برابر سطرهای داده‌شده (مثلاً اعضای خوشه‌های IVF)
+        """
+        block_scores = self.data[rows].astype(np.float32) @ np.asarray(query, dtype=np.float32)
+        if self.scales is not None:
+            block_scores *= self.scales[rows]
+        return block_scores
+
+    @staticmethod
+    def paths(base_path: str, kind: str):
+        suffix = "f16" if kind == "float16" else "i8"
+        return f"{base_path}.{suffix}.npy", f"{base_path}.{suffix}.scales.npy"
+
+    def save(self, base_path: str):
+        data_file, scales_file = self.paths(base_path, self.kind)
+        tmp_file = data_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            np.save(f, self.data)
+        os.replace(tmp_file, data_file)
+        if self.scales is not None:
+            tmp_file = scales_file + ".tmp"
+            with open(tmp_file, "wb") as f:
+                np.save(f, self.scales)
+            os.replace(tmp_file, scales_file)
+
+    @classmethod
+    def load(cls, base_path: str, kind: str):
+        data_file, scales_file = cls.paths(base_path, kind)
+        data = np.load(data_file)
+        scales = np.load(scales_file) if kind == "int8" else None
+        return cls(kind, data, scales)
+
+    @classmethod
+    def load_or_build(cls, base_path: str, kind: str, matrix):
+        """
+        بارگذاری نسخه کوانتیزه در حافظه؛ اگر وجود نداشته باشد یا از ماتریس اصلی قدیمی‌تر باشد دوباره ساخته می‌شود
+        """
+        data_file, scales_file = cls.paths(base_path, kind)
+        source_mtime = os.stat(f"{base_path}.npy").st_mtime_ns
+        files = [data_file] + ([scales_file] if kind == "int8" else [])
+        if all(os.path.exists(f) and os.stat(f).st_mtime_ns >= source_mtime for f in files):
+            try:
+                quantized = cls.load(base_path, kind)
+                if len(quantized) == len(matrix):
+                    return quantized
+            except Exception as e:
+                print(f"خطا در بارگذاری ماتریس کوانتیزه {data_file}: {e}")
+
+        quantized = cls.from_float(matrix, kind)
+        quantized.save(base_path)
+        return quantized
+
+
+def quantization_report(store, queries, k: int = 5, kinds=("float16", "int8"), rescore_factors=(1, 4)) -> list:
+    """
+    مقایسه حافظه مقیم، دقت (recall@k نسبت به جستجوی دقیق float32) و تأخیر حالت‌های کوانتیزه
+    Args:
+        store: EmbeddingStore بدون کوانتیزه‌سازی
+        queries: ماتریس بردارهای پرسش
+    Returns:
+        list: برای هر حالت یک دیکشنری شامل resident_bytes، recall و ms
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    vectors = np.asarray(store.vectors, dtype=np.float32)
+
+    start = time.perf_counter()
+    truth = [set(idx.tolist()) for idx, _ in store.top_k(queries, k=k)]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    report = [{"kind": "float32", "rescore_factor": None, "resident_bytes": vectors.nbytes, "recall": 1.0, "ms": exact_ms}]
+
+    for kind in kinds:
+        store.quantized = QuantizedMatrix.from_float(vectors, kind)
+        for factor in rescore_factors:
+            store.rescore_factor = factor
+            start = time.perf_counter()
+            found = store.top_k(queries, k=k)
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            recall = np.mean([len(truth[i] & set(idx.tolist())) / max(1, len(truth[i])) for i, (idx, _) in enumerate(found)])
+            report.append({
+                "kind": kind,
+                "rescore_factor": factor,
+                "resident_bytes": store.quantized.nbytes,
+                "recall": float(recall),
+                "ms": ms,
+            })
+    store.quantized = None
+    return report
+
+
+def main():
+    """
+    تابع اصلی برای اجرای گزارش حافظه/دقت کوانتیزه‌سازی روی یک فایل embedding ذخیره‌شده
+    """
+    import argparse
+    from search_pdf.embedding_store import EmbeddingStore
+
+    parser = argparse.ArgumentParser(description="گزارش حافظه و دقت ذخیره‌سازی float16/int8")
+    parser.add_argument("base_path", help="مسیر پایه فایل‌های embedding (بدون پسوند)، مثلاً search_pdf/embeddings/1")
+    parser.add_argument("--queries", type=int, default=100, help="تعداد پرسش‌های نمونه")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    store = EmbeddingStore.load(args.base_path)
+    rng = np.random.default_rng(0)
+    # پرسش‌های نمونه: بردارهای موجود به همراه نویز کوچک
+    picks = rng.choice(len(store), min(args.queries, len(store)), replace=False)
+    queries = np.asarray(store.vectors[np.sort(picks)]) + rng.normal(scale=0.05, size=(len(picks), store.dim))
+
+    print(f"تعداد بردارها: {len(store)}، بعد: {store.dim}، k={args.k}")
+    print(f"{'kind':>8} {'rescore':>8} {'MB':>8} {'recall':>8} {'ms':>8}")
+    for row in quantization_report(store, queries, k=args.k):
+        factor = "-" if row["rescore_factor"] is None else row["rescore_factor"]
+        print(f"{row['kind']:>8} {factor:>8} {row['resident_bytes'] / 2**20:>8.2f} {row['recall']:>8.3f} {row['ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
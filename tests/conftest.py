@@ -0,0 +1,5 @@
+import os
+import sys
+
+# ماژول‌های پروژه از ریشه مخزن وارد می‌شوند (پروژه بسته‌بندی نشده است)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from search_pdf.ann_index import ExactIndex, IVFIndex
+from search_pdf.chunk_table import ChunkTable
+from search_pdf.embedding_store import EmbeddingStore, l2_normalize
+
+
+@pytest.fixture
+def base_path(tmp_path):
+    # بردارهای خوشه‌ای تا recall جستجوی تقریبی معنادار باشد
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32))
+    vectors = l2_normalize((centers[rng.integers(0, 20, 2000)] + rng.normal(scale=0.3, size=(2000, 32))).astype(np.float32))
+    path = str(tmp_path / "doc")
+    EmbeddingStore(vectors, ChunkTable.from_dicts([{"text": str(i), "page": 1} for i in range(2000)]),
+                   meta={"normalized": True}).save(path)
+    return path
+
+
+def queries(store, count=30):
+    rng = np.random.default_rng(1)
+    return np.asarray(store.vectors[:count]) + rng.normal(scale=0.05, size=(count, store.dim))
+
+
+def recall(store, index, k=5):
+    exact = ExactIndex(store).search(queries(store), k)
+    found = index.search(queries(store), k)
+    return np.mean([len(set(a[0].tolist()) & set(b[0].tolist())) / k for a, b in zip(exact, found)])
+
+
+def test_probing_all_lists_matches_exact_search(base_path):
+    store = EmbeddingStore.load(base_path)
+    index = IVFIndex(n_lists=16).build(store)
+    index.n_probe = index.n_lists
+
+    assert recall(store, index) == 1.0
+
+
+def test_partial_probe_recall(base_path):
+    store = EmbeddingStore.load(base_path)
+
+    assert recall(store, IVFIndex(n_lists=16, n_probe=4).build(store)) >= 0.9
+
+
+def test_quantized_lists_are_rescored_from_float32(base_path):
+    store = EmbeddingStore.load(base_path, quantization="int8")
+    index = IVFIndex(n_lists=16, n_probe=16).build(store)
+
+    exact = ExactIndex(EmbeddingStore.load(base_path)).search(queries(store), 5)
+    for (ids, scores), (exact_ids, exact_scores) in zip(index.search(queries(store), 5), exact):
+        assert ids[0] == exact_ids[0]
+        assert scores[0] == pytest.approx(exact_scores[0], abs=1e-5)
+
+
+def test_save_and_load(base_path):
+    store = EmbeddingStore.load(base_path)
+    index = IVFIndex(n_lists=16, n_probe=4).build(store, source_mtime=5)
+    index.save(IVFIndex.path_for(base_path))
+
+    loaded = IVFIndex.load(IVFIndex.path_for(base_path), store)
+
+    assert loaded.source_mtime == 5
+    assert loaded.search(queries(store), 5)[0][0].tolist() == index.search(queries(store), 5)[0][0].tolist()
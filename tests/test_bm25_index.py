@@ -0,0 +1,43 @@
+from search_pdf.bm25_index import BM25Index, reciprocal_rank_fusion
+
+TEXTS = [
+    "کتابخانه مرکزی دانشگاه تهران ساعت هشت باز می‌شود",
+    "قیمت بلیت قطار تهران به مشهد افزایش یافت",
+    "ساعت کاری کتابخانه در تابستان تغییر می‌کند",
+    "the quick brown fox jumps over the lazy dog",
+]
+
+
+def test_ranks_documents_by_query_terms():
+    index = BM25Index().build(TEXTS)
+
+    ids, scores, matched, n_terms = index.search("ساعت کتابخانه", k=3)
+
+    assert set(ids.tolist()) == {0, 2}
+    assert list(scores) == sorted(scores, reverse=True)
+    assert matched.tolist() == [n_terms, n_terms]
+
+
+def test_unknown_terms_return_nothing():
+    ids, scores, _, _ = BM25Index().build(TEXTS).search("هواپیما", k=3)
+    assert len(ids) == 0 and len(scores) == 0
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = BM25Index().build(TEXTS, source_mtime=123)
+    path = BM25Index.path_for(str(tmp_path / "doc"))
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+
+    assert loaded.source_mtime == 123
+    for query in ("قطار مشهد", "lazy fox"):
+        assert loaded.search(query)[0].tolist() == index.search(query)[0].tolist()
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 1, 4]], k=60)
+
+    assert fused[1] == fused[2]
+    assert fused[1] > fused[3] > 0
+    assert fused[3] == fused[4]
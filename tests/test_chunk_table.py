@@ -0,0 +1,44 @@
+from search_pdf.chunk_table import ChunkTable, chunk_hash
+from search_pdf.ingestion import split_page_text
+
+CHUNKS = [
+    {"text": "بخش نخست", "page": 1},
+    {"text": "second chunk", "page": None},
+    {"text": "بخش سوم با متن بلندتر", "page": 3},
+]
+
+
+def test_from_dicts_round_trip():
+    table = ChunkTable.from_dicts(CHUNKS)
+
+    assert len(table) == 3
+    assert table.texts() == [chunk["text"] for chunk in CHUNKS]
+    assert [table.page(i) for i in range(3)] == [1, None, 3]
+    assert table.hashes() == [chunk_hash(chunk["text"]) for chunk in CHUNKS]
+
+
+def test_concat_assigns_documents():
+    merged = ChunkTable.concat([ChunkTable.from_dicts(CHUNKS[:2]), ChunkTable.from_dicts(CHUNKS[2:])], ["a.pdf", "b.pdf"])
+
+    assert merged.texts() == [chunk["text"] for chunk in CHUNKS]
+    assert [merged.doc(i) for i in range(3)] == ["a.pdf", "a.pdf", "b.pdf"]
+    assert merged[2] == {"text": CHUNKS[2]["text"], "page": 3, "hash": chunk_hash(CHUNKS[2]["text"]), "doc": "b.pdf"}
+
+
+def test_save_and_load(tmp_path):
+    base_path = str(tmp_path / "doc")
+    ChunkTable.from_dicts(CHUNKS, docs=["a.pdf"]).save(base_path)
+
+    loaded = ChunkTable.load(base_path, ["a.pdf"])
+
+    assert loaded.texts([2, 0]) == [CHUNKS[2]["text"], CHUNKS[0]["text"]]
+    assert loaded.doc(1) == "a.pdf"
+
+
+def test_split_page_text_respects_max_chars():
+    text = ". ".join(f"جمله شماره {i} از یک صفحه نمونه" for i in range(200))
+
+    chunks = split_page_text(text, page_num=7, max_chars=300)
+
+    assert len(chunks) > 1
+    assert all(len(chunk["text"]) <= 300 and chunk["page"] == 7 for chunk in chunks)
@@ -0,0 +1,59 @@
+import numpy as np
+from search_pdf.context_builder import ContextBuilder, estimate_tokens
+from search_pdf.ingestion import split_page_text
+
+PERSIAN_CHUNK = ("این یک جمله آزمایشی فارسی برای بررسی بودجه توکنی است " * 30)[:990]
+
+
+def make_results(texts, scores=None):
+    scores = scores or [1.0 - 0.1 * i for i in range(len(texts))]
+    return [{"context": text, "score": score} for text, score in zip(texts, scores)]
+
+
+def test_persian_chunks_over_budget_keep_truncated_top_chunk():
+    texts = [PERSIAN_CHUNK + str(i) for i in range(5)]
+    assert estimate_tokens(texts[0]) > 400
+
+    context, report = ContextBuilder(token_budget=400).build(make_results(texts), np.eye(5, 8, dtype=np.float32))
+
+    assert context
+    assert texts[0].startswith(context)
+    assert 0 < report["used_tokens"] <= 400
+    assert len(report["selected"]) == 1
+
+
+def test_default_budget_covers_a_full_chunk():
+    chunks = split_page_text(". ".join([PERSIAN_CHUNK[:300]] * 10), page_num=1)
+    longest = max(chunks, key=lambda chunk: len(chunk["text"]))["text"]
+
+    context, _ = ContextBuilder().build(make_results([longest]), np.eye(1, 8, dtype=np.float32))
+
+    assert context == longest
+
+
+def test_near_duplicates_are_dropped_and_budget_respected():
+    texts = ["a" * 400, "b" * 400, "c" * 400]
+    vectors = np.array([[1, 0], [1, 0], [0, 1]], dtype=np.float32)
+
+    context, report = ContextBuilder(token_budget=250).build(make_results(texts), vectors)
+
+    assert report["duplicates"] == 1
+    assert report["used_tokens"] <= 250
+    assert context == "a" * 400 + "\n" + "c" * 400
+
+
+def test_knapsack_prefers_best_combination_in_rank_order():
+    texts = ["x" * 320, "y" * 200, "z" * 200, "w" * 200]
+    vectors = np.eye(4, dtype=np.float32)
+    results = make_results(texts, scores=[1.0, 0.95, 0.95, 0.0])
+
+    context, report = ContextBuilder(token_budget=100, mmr_lambda=1.0).build(results, vectors)
+
+    # دو بخش کوچک‌تر با هم از بخش اول (۸۰ توکن) ارزش بیشتری دارند و به ترتیب رتبه می‌آیند
+    assert [result["context"] for result in report["selected"]] == ["y" * 200, "z" * 200]
+    assert context == "y" * 200 + "\n" + "z" * 200
+
+
+def test_empty_results():
+    context, report = ContextBuilder().build([], np.zeros((0, 8), dtype=np.float32))
+    assert context == "" and report["used_tokens"] == 0
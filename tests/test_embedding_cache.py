@@ -0,0 +1,35 @@
+import math
+import sqlite3
+from array import array
+import pytest
+from request_ollama.embedding_cache import EmbeddingCache
+
+
+def test_unit_normalizes_and_keeps_zero_vectors():
+    assert EmbeddingCache.unit([3.0, 4.0]).tolist() == pytest.approx([0.6, 0.8])
+    assert EmbeddingCache.unit([0.0, 0.0]).tolist() == [0.0, 0.0]
+    assert EmbeddingCache.unit([]).tolist() == []
+
+
+def test_put_stores_unit_vectors_under_normalized_text():
+    cache = EmbeddingCache(disk_path=None)
+    cache.put("model", "  سلام   دنیا ", [3.0, 4.0])
+
+    vector = cache.get("model", "سلام دنیا")
+
+    assert vector == pytest.approx([0.6, 0.8])
+    assert cache.get("other-model", "سلام دنیا") is None
+
+
+def test_raw_rows_on_disk_are_normalized_when_read(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(disk_path=path)
+    cache.put("model", "text", [1.0, 1.0])
+    # ردیف نوشته‌شده پیش از نرمال‌سازی (بردار خام /api/embeddings)
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE embeddings SET vector = ?", (array("f", [6.0, 8.0]).tobytes(),))
+
+    vector = EmbeddingCache(disk_path=path).get("model", "text")
+
+    assert vector == pytest.approx([0.6, 0.8])
+    assert math.isclose(sum(v * v for v in vector), 1.0, rel_tol=1e-6)
@@ -0,0 +1,20 @@
+from web_scraping.http_cache import HttpCache
+
+
+def test_normalize_url_ignores_equivalent_differences():
+    first = HttpCache.normalize_url("HTTPS://Example.COM/search?b=2&a=1&utm_source=x#top")
+    second = HttpCache.normalize_url("https://example.com/search", {"a": 1, "b": 2, "fbclid": "y"})
+
+    assert first == second == "https://example.com/search?a=1&b=2"
+
+
+def test_normalize_url_normalizes_search_text_and_drops_api_key():
+    url = HttpCache.normalize_url("https://www.googleapis.com/customsearch/v1",
+                                  {"q": "  Persian   NEWS ", "key": "secret", "cx": "abc"})
+
+    assert url == "https://www.googleapis.com/customsearch/v1?cx=abc&q=persian+news"
+    assert HttpCache.make_key("https://a.com", {"q": "x"}) != HttpCache.make_key("https://a.com", {"q": "y"})
+
+
+def test_normalize_url_defaults_empty_path():
+    assert HttpCache.normalize_url("https://example.com") == "https://example.com/"
@@ -0,0 +1,77 @@
+import time
+from email.utils import formatdate
+import pytest
+from request_ollama import http_transport
+from request_ollama.http_transport import HttpTransport
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_transport(monkeypatch, statuses):
+    transport = HttpTransport(retries=3, backoff_factor=0.5)
+    responses = [FakeResponse(status, headers) for status, headers in statuses]
+    calls, sleeps = [], []
+
+    def request(method, url, **kwargs):
+        calls.append(method)
+        return responses[len(calls) - 1]
+
+    monkeypatch.setattr(transport.session, "request", request)
+    monkeypatch.setattr(http_transport.time, "sleep", sleeps.append)
+    return transport, calls, sleeps
+
+
+def test_retry_statuses_depend_on_idempotency():
+    assert HttpTransport.retry_statuses("GET") == HttpTransport.RETRY_STATUSES
+    assert HttpTransport.retry_statuses("POST") == (429, 503)
+    assert HttpTransport.retry_statuses("POST", idempotent=True) == HttpTransport.RETRY_STATUSES
+
+
+def test_retry_delay_honours_retry_after():
+    assert HttpTransport.retry_delay({"Retry-After": "7"}, attempt=0, backoff_factor=0.5) == 7.0
+    assert HttpTransport.retry_delay({}, attempt=2, backoff_factor=0.5) == 2.0
+    assert HttpTransport.retry_delay({"Retry-After": "3600"}, attempt=0, backoff_factor=0.5) is None
+    date = formatdate(time.time() + 10, usegmt=True)
+    assert HttpTransport.retry_delay({"Retry-After": date}, attempt=0, backoff_factor=0.5) == pytest.approx(10, abs=2)
+
+
+def test_generation_post_is_not_retried_after_server_error(monkeypatch):
+    transport, calls, sleeps = make_transport(monkeypatch, [(500, None), (200, None)])
+
+    response = transport.post("http://localhost/api/chat", json={})
+
+    assert response.status_code == 500
+    assert calls == ["POST"] and sleeps == []
+
+
+def test_post_is_retried_after_429_with_retry_after(monkeypatch):
+    transport, calls, sleeps = make_transport(monkeypatch, [(429, {"Retry-After": "2"}), (200, None)])
+
+    response = transport.post("http://localhost/api/chat", json={})
+
+    assert response.status_code == 200
+    assert calls == ["POST", "POST"] and sleeps == [2.0]
+
+
+def test_idempotent_requests_retry_server_errors(monkeypatch):
+    transport, calls, sleeps = make_transport(monkeypatch, [(502, None), (504, None), (200, None)])
+
+    response = transport.post("http://localhost/api/embed", json={}, idempotent=True)
+
+    assert response.status_code == 200
+    assert sleeps == [0.5, 1.0]
+
+
+def test_too_long_retry_after_returns_the_error(monkeypatch):
+    transport, calls, sleeps = make_transport(monkeypatch, [(503, {"Retry-After": "600"}), (200, None)])
+
+    assert transport.get("http://localhost/").status_code == 503
+    assert len(calls) == 1 and sleeps == []
@@ -0,0 +1,42 @@
+import os
+import numpy as np
+import pytest
+from search_pdf.chunk_table import ChunkTable
+from search_pdf.embedding_store import EmbeddingStore
+from search_pdf.pdf_search import PDFSearcher
+
+
+@pytest.fixture
+def searcher(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    searcher = PDFSearcher(pdf_folder=str(tmp_path / "pdfs"), embeddings_folder=str(tmp_path / "embeddings"))
+    for name in ("a.pdf", "b.pdf"):
+        (tmp_path / "pdfs" / name).write_bytes(b"%PDF-1.4 " + name.encode())
+    # مجموعه ادغام‌شده‌ای که با وضعیت فعلی پوشه ساخته شده است
+    EmbeddingStore(
+        np.array([[1.0, 0.0]], dtype=np.float32), ChunkTable.from_dicts([{"text": "x", "page": 1}]),
+        meta={"normalized": True, "pdfs": searcher.corpus_fingerprints()},
+    ).save(searcher._store_base_path(PDFSearcher.CORPUS_NAME))
+    return searcher
+
+
+def test_corpus_is_current_until_pdfs_change(searcher):
+    assert searcher._corpus_is_current()
+
+
+def test_edited_pdf_makes_corpus_stale(searcher):
+    path = os.path.join(searcher.pdf_folder, "a.pdf")
+    with open(path, "ab") as f:
+        f.write(b" edited")
+
+    assert not searcher._corpus_is_current()
+
+
+def test_added_and_removed_pdfs_make_corpus_stale(searcher):
+    open(os.path.join(searcher.pdf_folder, "c.pdf"), "wb").close()
+    assert not searcher._corpus_is_current()
+
+    os.remove(os.path.join(searcher.pdf_folder, "c.pdf"))
+    assert searcher._corpus_is_current()
+    os.remove(os.path.join(searcher.pdf_folder, "b.pdf"))
+    assert not searcher._corpus_is_current()
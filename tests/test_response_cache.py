@@ -0,0 +1,31 @@
+from request_ollama.response_cache import ResponseCache
+
+HISTORY = [{"role": "user", "content": "پایتخت ایران کجاست؟"}, {"role": "assistant", "content": "تهران"}]
+
+
+def test_history_is_part_of_the_key(tmp_path):
+    cache = ResponseCache(disk_path=str(tmp_path / "responses.sqlite"))
+    cache.put("ollama:m", "بیشتر توضیح بده", "ctx", "web", "", "پاسخ اول", history=HISTORY)
+
+    assert cache.get("ollama:m", "بیشتر توضیح بده", "ctx", "web", "", history=HISTORY) == ("پاسخ اول", "exact")
+    assert cache.get("ollama:m", "بیشتر توضیح بده", "ctx", "web", "", history=[]) is None
+    assert cache.get("online:m", "بیشتر توضیح بده", "ctx", "web", "", history=HISTORY) is None
+
+
+def test_similar_prompt_hit_requires_same_context(tmp_path):
+    cache = ResponseCache(disk_path=str(tmp_path / "responses.sqlite"), similarity_threshold=0.95)
+    cache.put("m", "ساعت کاری کتابخانه", "ctx", "pdf:a", "v1", "هشت تا چهار", query_vector=[1.0, 0.0, 0.0])
+
+    assert cache.get("m", "کتابخانه چه ساعتی باز است", "ctx", "pdf:a", "v1",
+                     query_vector=[0.99, 0.05, 0.0]) == ("هشت تا چهار", "similar")
+    assert cache.get("m", "کتابخانه چه ساعتی باز است", "other", "pdf:a", "v1", query_vector=[0.99, 0.05, 0.0]) is None
+
+
+def test_invalidate_removes_old_index_versions(tmp_path):
+    cache = ResponseCache(disk_path=str(tmp_path / "responses.sqlite"))
+    cache.put("m", "q", "ctx", "pdf:a", "v1", "old")
+    cache.put("m", "q", "ctx", "pdf:b", "v1", "other scope")
+
+    assert cache.invalidate("pdf:a", "v2") == 1
+    assert cache.get("m", "q", "ctx", "pdf:a", "v1") is None
+    assert cache.get("m", "q", "ctx", "pdf:b", "v1") == ("other scope", "exact")
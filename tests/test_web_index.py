@@ -0,0 +1,68 @@
+import pytest
+from web_scraping import web_index
+from web_scraping.web_index import WebIndex
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(web_index, "time", fake)
+    return fake
+
+
+def add(index, url, axis):
+    vector = [0.0, 0.0, 0.0]
+    vector[axis] = 1.0
+    index.add_page(url, [f"جمله‌ای از {url}"], [vector])
+
+
+def test_lru_page_is_evicted_over_max_pages(tmp_path, clock):
+    index = WebIndex(base_path=str(tmp_path / "web"), ttl=3600, max_pages=2)
+    add(index, "https://a", 0)
+    add(index, "https://b", 1)
+    index.flush()
+
+    clock.now += 10
+    assert [url for url, _ in index.search([1.0, 0.0, 0.0], k=5, threshold=0.5)] == ["https://a"]
+    clock.now += 10
+    add(index, "https://c", 2)
+    index.flush()
+
+    assert set(index.pages) == {"https://a", "https://c"}
+    assert index.stats()["evictions"] == 1
+    assert index.search([0.0, 1.0, 0.0], k=5, threshold=0.5) == []
+
+
+def test_expired_pages_are_not_returned_and_dropped_on_flush(tmp_path, clock):
+    index = WebIndex(base_path=str(tmp_path / "web"), ttl=100, max_pages=10)
+    add(index, "https://old", 0)
+    index.flush()
+
+    clock.now += 101
+    assert index.search([1.0, 0.0, 0.0], k=5, threshold=0.5) == []
+    add(index, "https://new", 1)
+    index.flush()
+
+    assert set(index.pages) == {"https://new"}
+    assert len(index.store) == 1
+
+
+def test_access_times_survive_reload(tmp_path, clock):
+    base_path = str(tmp_path / "web")
+    index = WebIndex(base_path=base_path)
+    add(index, "https://a", 0)
+    index.flush()
+
+    clock.now += 50
+    index.search([1.0, 0.0, 0.0], k=5, threshold=0.5)
+    index.flush()
+
+    assert WebIndex(base_path=base_path).pages["https://a"]["last_access"] == clock.now
@@ -0,0 +1,59 @@
+import time
+import asyncio
+import threading
+
+
+class RateLimiter:
+    """
+    محدودکننده نرخ با الگوریتم سطل توکن: به طور متوسط rate درخواست در ثانیه و حداکثر burst درخواست پشت‌سرهم
+    هر فراخوانی یک توکن رزرو می‌کند (حتی اگر سطل خالی باشد) تا درخواست‌های منتظر به ترتیب و با فاصله مناسب آزاد شوند.
+    از thread‌ها با acquire و از coroutine‌ها با acquire_async قابل استفاده است.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: تعداد مجاز درخواست در ثانیه
+            burst: حداکثر تعداد درخواست‌هایی که بدون انتظار پشت‌سرهم ارسال می‌شوند
+        """
+        if rate <= 0:
+            raise ValueError("نرخ درخواست باید بزرگ‌تر از صفر باشد.")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.total_wait = 0.0  # مجموع زمان انتظار همه درخواست‌ها (ثانیه)
+
+    def _reserve(self) -> float:
+        """
+        رزرو یک توکن و محاسبه زمان انتظار لازم تا آزاد شدن آن
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.total_wait += wait
+            return wait
+
+    def acquire(self) -> float:
+        """
+        انتظار (مسدودکننده) تا مجاز شدن درخواست بعدی
+        Returns:
+            float: مدت انتظار بر حسب ثانیه
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """
+        نسخه ناهمگام acquire که حلقه رویداد را مسدود نمی‌کند
+        """
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
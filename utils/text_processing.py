@@ -1,6 +1,28 @@
 import re
 
+# کلمات پرتکرار فارسی و انگلیسی که در نمایه واژگانی نادیده گرفته می‌شوند
+PERSIAN_STOPWORDS = frozenset(
+    "و در به از که این آن را با برای است هست بود شد میشود نیز یا تا بر هم اما اگر چه چی چیست کدام "
+    "یک های ها ای او ما شما آنها ایشان من تو خود همه هر بین پس نه باید شود کند کرد دارد داشت "
+    "the a an of to in on for and or is are was were be by with as at from this that it".split()
+)
+
+
 class TextProcessor:
+    # نگاشت نویسه‌های عربی و ارقام به معادل فارسی/لاتین برای یکسان‌سازی متن
+    _PERSIAN_NORMALIZATION = str.maketrans({
+        'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه', 'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+        '۰': '0', '۱': '1', '۲': '2', '۳': '3', '۴': '4', '۵': '5', '۶': '6', '۷': '7', '۸': '8', '۹': '9',
+        '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4', '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+        '\u200c': '',  # نیم‌فاصله: «می‌روم» و «میروم» یکسان در نظر گرفته می‌شوند
+        '\u0640': '',  # کشیده
+    })
+    _DIACRITICS = re.compile(r'[\u064B-\u065F\u0670]')
+    _TOKEN = re.compile(r'\w+')
+    _SUFFIXES = ('هایی', 'های', 'ها', 'ترین', 'تر')
+    # پایان جمله: علامت پایان (به همراه گیومه/پرانتز بسته) که بعد از آن فاصله آمده باشد، یا شکست خط
+    _SENTENCE_END = re.compile(r'[.!?؟…]+["»”)\]]*(?=\s)|\n+')
+
     @staticmethod
     def is_persian_char(char: str) -> bool:
         """بررسی می‌کند که آیا کاراکتر یک حرف فارسی است"""
@@ -43,3 +65,48 @@ class TextProcessor:
         """
         # فقط حروف فارسی، انگلیسی، فاصله و علامت‌های . , ! را نگه می‌دارد
         return re.sub(r'[^\u0600-\u06FFa-zA-Z\s.,!]', '', response)
+
+    @staticmethod
+    def normalize_persian(text: str) -> str:
+        """
+        یکسان‌سازی نویسه‌های عربی/فارسی، ارقام، اعراب، نیم‌فاصله و حروف بزرگ انگلیسی
+        """
+        text = text.translate(TextProcessor._PERSIAN_NORMALIZATION)
+        return TextProcessor._DIACRITICS.sub('', text).lower()
+
+    @staticmethod
+    def tokenize(text: str, remove_stopwords: bool = True) -> list:
+        """
+        تقسیم متن فارسی/انگلیسی به توکن‌های نرمال‌شده برای جستجوی واژگانی
+        پسوندهای جمع و صفت تفضیلی (ها، های، تر، ترین) از کلمات بلند حذف می‌شوند.
+        """
+        tokens = []
+        for token in TextProcessor._TOKEN.findall(TextProcessor.normalize_persian(text)):
+            if remove_stopwords and token in PERSIAN_STOPWORDS:
+                continue
+            for suffix in TextProcessor._SUFFIXES:
+                if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+                    token = token[:-len(suffix)]
+                    break
+            tokens.append(token)
+        return tokens
+
+    @staticmethod
+    def split_sentences(text: str, min_chars: int = 12) -> tuple:
+        """
+        جدا کردن جمله‌های کامل فارسی/انگلیسی از ابتدای متن در حال تولید
+        Args:
+            text: متن دریافت‌شده تا این لحظه
+            min_chars: جمله‌های کوتاه‌تر (مانند «۱.» در فهرست‌ها) به جمله بعدی متصل می‌شوند
+        Returns:
+            tuple: (لیست جمله‌های کامل، باقیمانده ناتمام متن)
+        """
+        sentences = []
+        start = 0
+        for match in TextProcessor._SENTENCE_END.finditer(text):
+            sentence = text[start:match.end()].strip()
+            if len(sentence) < min_chars:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+        return sentences, text[start:]
@@ -0,0 +1,184 @@
+import json
+import asyncio
+from urllib.parse import quote_plus
+from request_ollama.async_ollama_api import AsyncOllamaAPI
+from request_ollama.async_transport import AsyncHttpTransport
+from web_scraping.web_searcher import WebSearcher
+from web_scraping.http_cache import HttpCache
+
+
+class AsyncWebSearcher(WebSearcher):
+    """
+    نسخه asyncio کلاس WebSearcher
+    صفحه‌های نتایج به صورت همزمان دریافت می‌شوند و تجزیه HTML در thread جداگانه انجام می‌شود تا حلقه رویداد مسدود نشود.
+    """
+
+    def __init__(self, async_transport: AsyncHttpTransport = None):
+        super().__init__()
+        self.async_transport = async_transport or AsyncHttpTransport(read_timeout=10)
+        self.ollama_api = AsyncOllamaAPI()
+
+    async def search(self, query: str, max_results: int = 2, use_index: bool = True) -> str:
+        """
+        جستجو در وب و استخراج متن‌های مرتبط با استفاده از مدل زبانی (ابتدا در نمایه محلی صفحه‌ها)
+        """
+        if use_index:
+            local = await self._search_local(query)
+            if local:
+                return local
+        if self.api_key and self.cx:
+            return await self._search_with_api(query, max_results)
+        else:
+            return await self._search_with_scraping(query, max_results)
+
+    async def _get_text(self, url: str, params: dict = None) -> str:
+        """
+        دریافت متن یک نشانی از کش HTTP یا از شبکه (با رعایت نرخ مجاز میزبان و اعتبارسنجی مجدد پاسخ کهنه)
+        """
+        entry = self.http_cache.get(url, params)
+        if entry is not None and entry["fresh"]:
+            return entry["body"].decode(entry["encoding"] or "utf-8", errors="replace")
+
+        await self._host_limiter(url).acquire_async()
+        headers = {**self.headers, **HttpCache.conditional_headers(entry)}
+        async with self.async_transport.get(url, params=params, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                self.http_cache.revalidated(url, params)
+                return entry["body"].decode(entry["encoding"] or "utf-8", errors="replace")
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            self._check_content_type(url, content_type)
+
+            # دانلود جریانی تا سقف MAX_PAGE_BYTES؛ بقیه پاسخ خوانده نمی‌شود
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                body.extend(chunk)
+                if len(body) >= self.MAX_PAGE_BYTES:
+                    print(f"هشدار: فقط {self.MAX_PAGE_BYTES // 1024} کیلوبایت اول {url} استفاده می‌شود.")
+                    break
+            body = bytes(body[:self.MAX_PAGE_BYTES])
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+        encoding = self._detect_encoding(content_type, body)
+        self.http_cache.put(url, body, params, encoding=encoding, etag=etag, last_modified=last_modified)
+        return body.decode(encoding, errors="replace")
+
+    async def _search_local(self, query: str) -> str:
+        try:
+            query_vector = (await self.ollama_api.get_embeddings_batch([query], model=self.embedding_model))[0]
+        except Exception as e:
+            print(f"خطا در جستجوی نمایه محلی وب: {e}")
+            return ""
+        hits = await asyncio.to_thread(self.web_index.search, query_vector, self.TOP_K, self.LOCAL_THRESHOLD)
+        local = self._format_local_results(hits)
+        if local:
+            # زمان استفاده صفحه‌ها برای حذف LRU ذخیره می‌شود
+            await asyncio.to_thread(self.web_index.flush)
+        return local
+
+    async def _extract_relevant_text(self, full_text: str, query: str, url: str = None) -> str:
+        try:
+            sentences = self._candidate_sentences(full_text, query)
+            if not sentences:
+                return ""
+            all_embeddings = await self.ollama_api.get_embeddings_batch([query] + sentences, model=self.embedding_model)
+            if url:
+                self.web_index.add_page(url, sentences, all_embeddings[1:])
+            return self._select_relevant_sentences(sentences, all_embeddings)
+        except Exception as e:
+            print(f"خطا در استخراج متن‌های مرتبط: {e}")
+            return ""
+
+    async def _search_with_api(self, query: str, max_results: int) -> str:
+        """
+        جستجو با استفاده از Google Custom Search JSON API
+        """
+        try:
+            params = {
+                'q': query,
+                'key': self.api_key,
+                'cx': self.cx,
+                'num': max_results,
+            }
+            text = await self._get_text("https://www.googleapis.com/customsearch/v1", params=params)
+            return self._format_api_results(json.loads(text))
+
+        except Exception as e:
+            print(f"خطا در جستجوی وب با API: {e}")
+            return "خطا در جستجوی وب با API. لطفاً دوباره تلاش کنید."
+
+    async def _fetch_result(self, url: str, query: str) -> str:
+        """
+        دریافت یک صفحه نتیجه (از کش HTTP یا شبکه) و استخراج متن مرتبط آن
+        """
+        try:
+            html = await self._get_text(url)
+            full_text = await asyncio.to_thread(self._page_text, html)
+            return await self._extract_relevant_text(full_text, query, url)
+        except Exception as e:
+            print(f"خطا در پردازش لینک {url}: {e}")
+            return None
+
+    async def _fetch_results(self, urls: list, query: str, deadline: float = None) -> list:
+        """
+        دریافت همزمان صفحه‌ها با حداکثر FETCH_WORKERS صفحه در جریان؛ صفحه‌هایی که تا deadline آماده نشده‌اند لغو می‌شوند
+        Returns:
+            list: متن مرتبط هر نشانی به ترتیب urls (برای صفحه‌های ناموفق یا دیررس None)
+        """
+        deadline = self.FETCH_DEADLINE if deadline is None else deadline
+        if not urls:
+            return []
+        semaphore = asyncio.Semaphore(self.FETCH_WORKERS)
+
+        async def run(url):
+            async with semaphore:
+                return await self._fetch_result(url, query)
+
+        tasks = [asyncio.ensure_future(run(url)) for url in urls]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"⏱️ مهلت {deadline:.0f} ثانیه‌ای دریافت صفحه‌ها تمام شد؛ "
+                  f"از {len(done)} صفحه از {len(urls)} صفحه استفاده می‌شود.")
+        return [task.result() if task in done else None for task in tasks]
+
+    async def _search_with_scraping(self, query: str, max_results: int) -> str:
+        """
+        جستجو با استفاده از روش scraping و دریافت همزمان صفحه‌های نتایج
+        """
+        try:
+            url = f"https://www.google.com/search?q={quote_plus(query)}&num={max_results}"
+            html = await self._get_text(url)
+
+            # بررسی پاسخ نامعتبر از گوگل
+            if "did not match any documents" in html or "captcha" in html:
+                self.http_cache.invalidate(url)
+                return "گوگل درخواست شما را مسدود کرده است یا نتیجه‌ای یافت نشد. لطفاً دوباره تلاش کنید یا از یک سرویس جایگزین استفاده کنید."
+
+            search_results = await asyncio.to_thread(self._parse_result_links, html, max_results)
+            if not search_results:
+                return (
+                    "متاسفانه نتیجه‌ای یافت نشد. لطفاً سوال خود را به شکل دیگری مطرح کنید "
+                    "یا از یک API رسمی مانند Google Custom Search JSON API استفاده کنید."
+                )
+
+            relevant_texts = await self._fetch_results(search_results, query)
+            await asyncio.to_thread(self.web_index.flush)
+            results_text = ""
+            for i, relevant_text in enumerate(relevant_texts, 1):
+                if relevant_text is not None:
+                    results_text += f"نتیجه {i}:\nمحتوا: {relevant_text}\n\n"
+
+            return results_text.strip() if results_text else (
+                "متاسفانه نتیجه‌ای یافت نشد. لطفاً سوال خود را به شکل دیگری مطرح کنید "
+                "یا از یک API رسمی مانند Google Custom Search JSON API استفاده کنید."
+            )
+
+        except Exception as e:
+            print(f"خطا در جستجوی وب: {e}")
+            return "خطا در جستجوی وب. لطفاً دوباره تلاش کنید."
+
+    async def close(self):
+        await self.async_transport.close()
+        await self.ollama_api.close()
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import argparse
+from bs4 import BeautifulSoup
+from web_scraping.web_searcher import WebSearcher
+
+
+def legacy_page_text(html: str) -> str:
+    """
+    روش قبلی استخراج متن (html.parser و get_text روی کل صفحه) فقط برای مقایسه
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+def best_time(function, html: str, repeat: int) -> tuple:
+    """
+    کمترین زمان اجرا (میلی‌ثانیه) در repeat تکرار و خروجی تابع
+    """
+    best, result = float("inf"), ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(html)
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best, result
+
+
+def save_pages(folder: str, urls: list):
+    """
+    ذخیره صفحه‌های چند نشانی در پوشه مجموعه آزمون (با همان دانلود محدود WebSearcher)
+    """
+    os.makedirs(folder, exist_ok=True)
+    searcher = WebSearcher()
+    for i, url in enumerate(urls, 1):
+        try:
+            html = searcher._get_text(url)
+        except Exception as e:
+            print(f"خطا در دریافت {url}: {e}")
+            continue
+        path = os.path.join(folder, f"page_{i:03d}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"ذخیره شد: {path}")
+
+
+def main():
+    """
+    مقایسه زمان parse و حجم متن استخراج‌شده بین روش قبلی و WebSearcher._page_text روی صفحه‌های ذخیره‌شده
+    """
+    parser = argparse.ArgumentParser(description="بنچمارک استخراج متن اصلی صفحه‌های وب")
+    parser.add_argument("folder", nargs="?", default="web_scraping/saved_pages", help="پوشه فایل‌های HTML")
+    parser.add_argument("--save", nargs="+", metavar="URL", help="ابتدا این نشانی‌ها را در پوشه ذخیره کن")
+    parser.add_argument("--repeat", type=int, default=3, help="تعداد تکرار برای هر صفحه")
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.folder, args.save)
+
+    paths = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder) if name.endswith((".html", ".htm"))
+    ) if os.path.isdir(args.folder) else []
+    if not paths:
+        print(f"هیچ فایل HTML در {args.folder} یافت نشد. با --save URL ... چند صفحه ذخیره کنید.")
+        sys.exit(1)
+
+    totals = {"bytes": 0, "legacy_ms": 0.0, "new_ms": 0.0, "legacy_chars": 0, "new_chars": 0}
+    print(f"{'page':<28} {'KB':>7} {'legacy ms':>10} {'new ms':>8} {'legacy chars':>13} {'new chars':>10}")
+    for path in paths:
+        with open(path, "rb") as f:
+            body = f.read()
+        html = body.decode(WebSearcher._detect_encoding("", body), errors="replace")
+        legacy_ms, legacy_text = best_time(legacy_page_text, html, args.repeat)
+        new_ms, new_text = best_time(WebSearcher._page_text, html, args.repeat)
+
+        totals["bytes"] += len(body)
+        totals["legacy_ms"] += legacy_ms
+        totals["new_ms"] += new_ms
+        totals["legacy_chars"] += len(legacy_text)
+        totals["new_chars"] += len(new_text)
+        print(f"{os.path.basename(path)[:28]:<28} {len(body) / 1024:>7.1f} {legacy_ms:>10.1f} {new_ms:>8.1f} "
+              f"{len(legacy_text):>13} {len(new_text):>10}")
+
+    speedup = totals["legacy_ms"] / totals["new_ms"] if totals["new_ms"] else 0.0
+    reduction = 1 - totals["new_chars"] / totals["legacy_chars"] if totals["legacy_chars"] else 0.0
+    print(f"\n{len(paths)} صفحه، {totals['bytes'] / 1024:.0f} کیلوبایت: "
+          f"زمان parse {totals['legacy_ms']:.0f} → {totals['new_ms']:.0f} میلی‌ثانیه ({speedup:.1f} برابر سریع‌تر)، "
+          f"متن استخراج‌شده {totals['legacy_chars']} → {totals['new_chars']} نویسه ({reduction * 100:.0f}٪ کمتر)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+class HttpCache:
+    """
+    کش دیسکی پاسخ‌های HTTP جستجوگر وب (نتایج Google Custom Search و صفحه‌های دریافت‌شده)
+    پاسخ‌ها با zlib فشرده و در SQLite ذخیره می‌شوند. پاسخ تازه‌تر از ttl مستقیماً استفاده می‌شود و پاسخ کهنه‌تر
+    با ETag/Last-Modified اعتبارسنجی مجدد می‌شود (پاسخ 304 یعنی همان نسخه ذخیره‌شده معتبر است).
+    با عبور حجم فشرده از max_bytes، کم‌استفاده‌ترین پاسخ‌ها تا ۹۰٪ سقف حذف می‌شوند.
+    """
+
+    # پارامترهایی که در کلید کش نمی‌آیند (کلید API نباید روی دیسک ذخیره شود؛ پارامترهای ردیابی محتوا را تغییر نمی‌دهند)
+    IGNORED_PARAMS = {"key", "fbclid", "gclid"}
+    # پارامترهای متن جستجو که با حذف فاصله‌های اضافه و حروف کوچک یکسان می‌شوند
+    QUERY_PARAMS = {"q"}
+
+    def __init__(self, disk_path: str = "web_scraping/cache/http.sqlite", ttl: float = 24 * 3600,
+                 max_bytes: int = 200 * 1024 * 1024):
+        """
+        Args:
+            disk_path: مسیر فایل SQLite
+            ttl: مدتی (ثانیه) که پاسخ بدون اعتبارسنجی مجدد استفاده می‌شود
+            max_bytes: حداکثر حجم فشرده پاسخ‌های ذخیره‌شده
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale": 0, "revalidated": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS http_cache ("
+                "key TEXT PRIMARY KEY, url TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL, "
+                "encoding TEXT, etag TEXT, last_modified TEXT, fetched REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_http_cache_access ON http_cache(last_access)")
+            self._db.commit()
+        except Exception as e:
+            print(f"خطا در راه‌اندازی کش HTTP: {e}")
+            self._db = None
+
+    @classmethod
+    def normalize_url(cls, url: str, params: dict = None) -> str:
+        """
+        نشانی یکسان برای درخواست‌های هم‌ارز: حروف کوچک در scheme و میزبان، حذف fragment،
+        مرتب‌سازی پارامترها، یکسان‌سازی متن جستجو و حذف پارامترهای IGNORED_PARAMS و utm_*
+        """
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True) + [(k, str(v)) for k, v in (params or {}).items()]
+        query = sorted(
+            (k, " ".join(v.split()).lower() if k in cls.QUERY_PARAMS else v)
+            for k, v in query if k.lower() not in cls.IGNORED_PARAMS and not k.lower().startswith("utm_")
+        )
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
+
+    @classmethod
+    def make_key(cls, url: str, params: dict = None) -> str:
+        return hashlib.sha1(cls.normalize_url(url, params).encode("utf-8")).hexdigest()
+
+    def get(self, url: str, params: dict = None):
+        """
+        جستجوی پاسخ ذخیره‌شده
+        Returns:
+            dict یا None: body (بایت‌ها)، encoding، etag، last_modified و fresh (تازه‌تر از ttl)
+        """
+        if self._db is None:
+            return None
+        key = self.make_key(url, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, encoding, etag, last_modified, fetched FROM http_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            fresh = now - row[4] <= self.ttl
+            if fresh:
+                self._stats["hits"] += 1
+                self._db.execute("UPDATE http_cache SET last_access = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            elif row[2] or row[3]:
+                self._stats["stale"] += 1
+            else:
+                # پاسخ کهنه بدون ETag/Last-Modified قابل اعتبارسنجی نیست
+                self._stats["misses"] += 1
+                return None
+        return {
+            "body": zlib.decompress(row[0]),
+            "encoding": row[1],
+            "etag": row[2],
+            "last_modified": row[3],
+            "fresh": fresh,
+        }
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        """
+        هدرهای درخواست شرطی برای اعتبارسنجی مجدد یک پاسخ کهنه
+        """
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, body: bytes, params: dict = None, encoding: str = None, etag: str = None,
+            last_modified: str = None):
+        """
+        ذخیره یک پاسخ موفق
+        """
+        if self._db is None:
+            return
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(key, url, body, size, encoding, etag, last_modified, fetched, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(url, params), self.normalize_url(url, params), compressed, len(compressed),
+                 encoding, etag, last_modified, now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def revalidated(self, url: str, params: dict = None):
+        """
+        ثبت پاسخ 304: نسخه ذخیره‌شده برای ttl دیگر تازه حساب می‌شود
+        """
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE http_cache SET fetched = ?, last_access = ? WHERE key = ?", (now, now, self.make_key(url, params))
+            )
+            self._db.commit()
+            self._stats["revalidated"] += 1
+
+    def invalidate(self, url: str, params: dict = None):
+        """
+        حذف یک پاسخ (مثلاً صفحه captcha که نباید دوباره استفاده شود)
+        """
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM http_cache WHERE key = ?", (self.make_key(url, params),))
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        removed = 0
+        keys = []
+        for key, size in self._db.execute("SELECT key, size FROM http_cache ORDER BY last_access ASC"):
+            if removed >= target:
+                break
+            keys.append((key,))
+            removed += size
+        self._db.executemany("DELETE FROM http_cache WHERE key = ?", keys)
+        self._stats["evictions"] += len(keys)
+
+    def stats(self) -> dict:
+        """
+        آمار کش HTTP: برخورد مستقیم، پاسخ‌های کهنه و اعتبارسنجی مجدد موفق آن‌ها (304)، عدم برخورد، تعداد و حجم پاسخ‌ها
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            if self._db is not None:
+                stats["entries"], stats["bytes"] = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache"
+                ).fetchone()
+            else:
+                stats["entries"], stats["bytes"] = 0, 0
+        lookups = stats["hits"] + stats["stale"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["revalidated"]) / lookups if lookups else 0.0
+        return stats
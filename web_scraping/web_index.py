@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from collections import defaultdict
+import numpy as np
+from search_pdf.chunk_table import ChunkTable, chunk_hash
+from search_pdf.embedding_store import EmbeddingStore, l2_normalize
+
+
+class WebIndex:
+    """
+    نمایه محلی محتوای صفحه‌های وب با همان قالب ذخیره‌سازی PDF‌ها (EmbeddingStore و ChunkTable)
+    جمله‌های هر صفحه همراه با embedding‌هایی که هنگام استخراج متن مرتبط محاسبه شده‌اند نگه داشته می‌شوند
+    (هر صفحه یک سند با نشانی آن به عنوان نام) تا پرسش‌های بعدی درباره همان موضوع بدون دریافت و embedding دوباره
+    پاسخ داده شوند. صفحه‌های قدیمی‌تر از ttl کنار گذاشته و با عبور از max_pages کم‌استفاده‌ترین صفحه‌ها حذف می‌شوند.
+    محدودیت: از هر صفحه فقط جمله‌هایی نگه داشته می‌شوند که پیش‌فیلتر برای پرسشی که صفحه را دریافت کرد انتخاب کرده است
+    (حداکثر WebSearcher.MAX_CANDIDATES جمله). صفحه‌های کوتاه‌تر کامل هستند، ولی در صفحه‌های بلند پرسش دیگری درباره همان
+    نشانی ممکن است در نمایه نتیجه کافی نداشته باشد؛ در این حالت جستجو (با آستانه WebSearcher.LOCAL_MIN_HITS) آنلاین انجام می‌شود.
+    """
+
+    def __init__(self, base_path: str = "web_scraping/index/web", embedding_model: str = "nomic-embed-text",
+                 ttl: float = 7 * 24 * 3600, max_pages: int = 300):
+        """
+        Args:
+            base_path: مسیر پایه (بدون پسوند) فایل‌های نمایه
+            embedding_model: مدل embedding جمله‌ها؛ نمایه ساخته‌شده با مدل دیگر کنار گذاشته می‌شود
+            ttl: مدتی (ثانیه) که محتوای یک صفحه برای پاسخ‌دهی معتبر است
+            max_pages: حداکثر تعداد صفحه‌های نگه‌داشته‌شده
+        """
+        self.base_path = os.path.abspath(base_path)
+        self.embedding_model = embedding_model
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self._lock = threading.Lock()
+        self._pending = {}  # نشانی -> (جمله‌ها، ماتریس embedding) صفحه‌هایی که هنوز ذخیره نشده‌اند
+        self._access_changed = False  # زمان آخرین استفاده صفحه‌ها پس از آخرین ذخیره تغییر کرده است
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.store = None
+        self.pages = {}  # نشانی -> {"fetched": زمان دریافت، "last_access": زمان آخرین استفاده}
+
+        try:
+            os.makedirs(os.path.dirname(self.base_path), exist_ok=True)
+            if EmbeddingStore.exists(self.base_path):
+                store = EmbeddingStore.load(self.base_path)
+                if store.meta.get("model") == self.embedding_model:
+                    self.store = store
+                    self.pages = store.meta.get("pages", {})
+                else:
+                    print("مدل embedding نمایه محلی وب تغییر کرده است؛ نمایه از نو ساخته می‌شود.")
+        except Exception as e:
+            print(f"خطا در بارگذاری نمایه محلی وب: {e}")
+            self.store, self.pages = None, {}
+
+    def add_page(self, url: str, sentences: list, embeddings: list):
+        """
+        افزودن (یا جایگزینی) جمله‌های یک صفحه؛ تا فراخوانی flush فقط در حافظه نگه داشته می‌شوند
+        جمله‌هایی که embedding آن‌ها دریافت نشده کنار گذاشته می‌شوند. فقط جمله‌های داده‌شده (نه کل صفحه) نمایه می‌شوند.
+        """
+        dim = max((len(e) for e in embeddings if e), default=0)
+        kept = [(sentence, vector) for sentence, vector in zip(sentences, embeddings) if vector and len(vector) == dim]
+        if not kept:
+            return
+        vectors = l2_normalize(np.asarray([vector for _, vector in kept], dtype=np.float32))
+        with self._lock:
+            self._pending[url] = ([sentence for sentence, _ in kept], vectors)
+
+    def flush(self):
+        """
+        ادغام صفحه‌های جدید با نمایه، حذف صفحه‌های منقضی و کم‌استفاده و ذخیره روی دیسک
+        اگر صفحه جدیدی نباشد فقط زمان آخرین استفاده صفحه‌ها (برای حذف LRU پس از اجرای دوباره برنامه) ذخیره می‌شود.
+        """
+        with self._lock:
+            if not self._pending:
+                if self._access_changed and self.store is not None:
+                    try:
+                        self.store.meta["pages"] = self.pages
+                        self.store.save_meta(self.base_path)
+                        self._access_changed = False
+                    except Exception as e:
+                        print(f"خطا در ذخیره نمایه محلی وب: {e}")
+                return
+            pending, self._pending = self._pending, {}
+            now = time.time()
+            store = self.store
+            if store is not None and len(store) and store.dim != next(iter(pending.values()))[1].shape[1]:
+                store, self.pages = None, {}
+
+            pages = {url: info for url, info in self.pages.items() if now - info["fetched"] <= self.ttl}
+            for url in pending:
+                pages[url] = {"fetched": now, "last_access": now}
+            if len(pages) > self.max_pages:
+                by_access = sorted(pages, key=lambda url: pages[url]["last_access"])
+                for url in by_access[:len(pages) - self.max_pages]:
+                    pages.pop(url)
+            self._stats["evictions"] += sum(1 for url in self.pages if url not in pages)
+
+            chunks, vectors = [], []
+            if store is not None and len(store):
+                keep = np.asarray([
+                    (store.chunks.doc(i) in pages and store.chunks.doc(i) not in pending) for i in range(len(store))
+                ], dtype=bool)
+                rows = np.flatnonzero(keep)
+                chunks.extend({**store.chunks[int(i)], "page": None} for i in rows)
+                if len(rows):
+                    vectors.append(np.asarray(store.vectors[rows], dtype=np.float32))
+            for url, (sentences, matrix) in pending.items():
+                if url not in pages:
+                    continue
+                chunks.extend({"text": sentence, "page": None, "doc": url, "hash": chunk_hash(sentence)}
+                              for sentence in sentences)
+                vectors.append(matrix)
+
+            try:
+                matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+                EmbeddingStore(
+                    matrix, ChunkTable.from_dicts(chunks),
+                    meta={"model": self.embedding_model, "normalized": True, "pages": pages},
+                ).save(self.base_path)
+                self.store = EmbeddingStore.load(self.base_path)
+                self.pages = pages
+                self._access_changed = False
+            except Exception as e:
+                print(f"خطا در ذخیره نمایه محلی وب: {e}")
+
+    def search(self, query_vector, k: int, threshold: float) -> list:
+        """
+        جستجوی جمله‌های مرتبط در صفحه‌های معتبر (تازه‌تر از ttl)
+        Returns:
+            list: زوج‌های (نشانی، جمله‌ها به ترتیب متن صفحه) به ترتیب بهترین امتیاز هر صفحه
+        """
+        with self._lock:
+            store = self.store
+            if store is None or not len(store) or query_vector is None or not len(query_vector):
+                self._stats["misses"] += 1
+                return []
+            now = time.time()
+            # نامزدهای بیشتر از k تا پس از حذف صفحه‌های منقضی هنوز k نتیجه بماند
+            indices, scores = store.top_k(query_vector, k=k * 2, threshold=threshold)[0]
+            best, rows = {}, defaultdict(list)
+            for idx, score in zip(indices, scores):
+                url = store.chunks.doc(int(idx))
+                info = self.pages.get(url)
+                if info is None or now - info["fetched"] > self.ttl or sum(map(len, rows.values())) >= k:
+                    continue
+                rows[url].append(int(idx))
+                best.setdefault(url, float(score))
+            for url in rows:
+                self.pages[url]["last_access"] = now
+                self._access_changed = True
+            self._stats["hits" if rows else "misses"] += 1
+            return [(url, store.chunks.texts(sorted(rows[url]))) for url in sorted(best, key=best.get, reverse=True)]
+
+    def stats(self) -> dict:
+        """
+        آمار نمایه محلی وب: پرسش‌های دارای نتیجه و بدون نتیجه، صفحه‌های حذف‌شده، تعداد صفحه‌ها و جمله‌ها
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pages"] = len(self.pages)
+            stats["chunks"] = len(self.store) if self.store is not None else 0
+        return stats
@@ -1,13 +1,52 @@
 from request_ollama import OllamaAPI  # وارد کردن کلاس OllamaAPI به صورت ماژولار
-import requests
+from request_ollama.http_transport import HttpTransport
+from utils.text_processing import TextProcessor
+from utils.rate_limiter import RateLimiter
+from web_scraping.http_cache import HttpCache
+from web_scraping.web_index import WebIndex
+import numpy as np
+import lxml.html
+from lxml import etree
 from bs4 import BeautifulSoup
-import time
-import random
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from urllib.parse import quote_plus, urlsplit
 from dotenv import load_dotenv
 import os
 
 class WebSearcher:
-    def __init__(self):
+    # تنظیمات استخراج جمله‌های مرتبط از صفحه‌ها
+    MIN_SENTENCE_CHARS = 25  # جمله‌های کوتاه‌تر (منو، دکمه، برچسب) کنار گذاشته می‌شوند
+    MAX_SENTENCE_CHARS = 600  # «جمله‌های» بلندتر (معمولاً متن بدون نقطه‌گذاری) کوتاه می‌شوند
+    MAX_CANDIDATES = 200  # حداکثر جمله‌های هر صفحه که embedding آن‌ها محاسبه می‌شود
+    TOP_K = 15
+    SIMILARITY_THRESHOLD = 0.5  # حداقل شباهت کسینوسی با سوال
+    # تنظیمات دریافت همزمان صفحه‌ها
+    FETCH_WORKERS = 4  # حداکثر صفحه‌هایی که همزمان دریافت و پردازش می‌شوند
+    HOST_RATE = 0.5  # حداکثر درخواست در ثانیه به هر میزبان
+    FETCH_DEADLINE = 20.0  # پس از این مدت (ثانیه) نتایج صفحه‌های دریافت‌شده تا آن لحظه برگردانده می‌شوند
+    # تنظیمات دانلود و استخراج متن اصلی صفحه‌ها
+    MAX_PAGE_BYTES = 2 * 1024 * 1024  # بیش از این مقدار از هیچ پاسخی خوانده نمی‌شود
+    ALLOWED_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "application/json")
+    MIN_MAIN_TEXT = 200  # حداقل طول متن برای پذیرفتن یک بخش به عنوان متن اصلی صفحه
+    NON_CONTENT_TAGS = ("script", "style", "noscript", "template", "svg", "canvas", "iframe", "form", "button",
+                        "select", "nav", "aside")
+    BLOCK_TAGS = ("p", "div", "section", "article", "main", "li", "td", "th", "tr", "blockquote", "pre",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "br", "hr", "dd", "dt", "figcaption", "table", "ul", "ol")
+    # شناسه/کلاس بخش‌های حاشیه‌ای (منو، فوتر، تبلیغ، اشتراک‌گذاری، ...) و بخش‌هایی که با وجود آن حفظ می‌شوند
+    _BOILERPLATE = re.compile(
+        r"(^|[\s_-])(nav|navbar|menu|footer|sidebar|widget|comments?|cookie|consent|banner|advert\w*|ads?|promo|"
+        r"share|social|related|breadcrumbs?|popup|modal|subscribe|newsletter|pagination)($|[\s_-])", re.I
+    )
+    _CONTENT_HINT = re.compile(r"article|content|main|post|entry|story|body", re.I)
+    _CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.I)
+    # پاسخ از نمایه محلی صفحه‌ها وقتی کافی است که دست‌کم LOCAL_MIN_HITS جمله با شباهت LOCAL_THRESHOLD یافت شود
+    LOCAL_MIN_HITS = 5
+    LOCAL_THRESHOLD = 0.6
+
+    def __init__(self, transport: HttpTransport = None):
         # بارگذاری متغیرهای محیطی از فایل .env
         load_dotenv()
         self.headers = {
@@ -21,44 +60,283 @@ class WebSearcher:
         self.cx = os.getenv("GOOGLE_CX")  # شناسه موتور جستجوی سفارشی
         self.ollama_api = OllamaAPI()  # نمونه‌ای از کلاس OllamaAPI برای استفاده از مدل زبانی
         self.embedding_model = "nomic-embed-text"  # مدل مخصوص Web Search
+        # session مشترک با اتصال‌های پایدار و تلاش مجدد خطاهای گذرا برای همه صفحه‌ها و درخواست‌های API
+        self.transport = transport or HttpTransport(pool_size=self.FETCH_WORKERS, read_timeout=10)
+        self._host_limiters = {}  # میزبان -> RateLimiter
+        self._host_lock = threading.Lock()
+        # نتایج API و صفحه‌ها تا WEB_CACHE_TTL ثانیه بدون درخواست دوباره استفاده می‌شوند
+        self.http_cache = HttpCache(ttl=float(os.getenv("WEB_CACHE_TTL", 24 * 3600)))
+        # جمله‌های embedding‌شده صفحه‌ها برای پاسخ به پرسش‌های بعدی بدون جستجوی آنلاین نگه داشته می‌شوند
+        self.web_index = WebIndex(embedding_model=self.embedding_model,
+                                  ttl=float(os.getenv("WEB_INDEX_TTL", 7 * 24 * 3600)))
+
+    def _host_limiter(self, url: str) -> RateLimiter:
+        """
+        محدودکننده نرخ میزبان یک نشانی؛ درخواست‌ها به میزبان‌های مختلف منتظر یکدیگر نمی‌مانند
+        """
+        host = urlsplit(url).netloc.lower()
+        with self._host_lock:
+            limiter = self._host_limiters.get(host)
+            if limiter is None:
+                limiter = self._host_limiters[host] = RateLimiter(self.HOST_RATE)
+            return limiter
+
+    def _get_text(self, url: str, params: dict = None) -> str:
+        """
+        دریافت متن یک نشانی از کش HTTP یا از شبکه (با رعایت نرخ مجاز میزبان)
+        پاسخ کهنه با درخواست شرطی اعتبارسنجی می‌شود و در صورت پاسخ 304 همان نسخه ذخیره‌شده استفاده می‌شود.
+        """
+        entry = self.http_cache.get(url, params)
+        if entry is not None and entry["fresh"]:
+            return entry["body"].decode(entry["encoding"] or "utf-8", errors="replace")
+
+        self._host_limiter(url).acquire()
+        headers = {**self.headers, **HttpCache.conditional_headers(entry)}
+        with self.transport.get(url, params=params, headers=headers, stream=True) as response:
+            if response.status_code == 304 and entry is not None:
+                self.http_cache.revalidated(url, params)
+                return entry["body"].decode(entry["encoding"] or "utf-8", errors="replace")
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            self._check_content_type(url, content_type)
 
-    def search(self, query: str, max_results: int = 2) -> str:
+            # دانلود جریانی تا سقف MAX_PAGE_BYTES؛ بقیه پاسخ خوانده نمی‌شود
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body.extend(chunk)
+                if len(body) >= self.MAX_PAGE_BYTES:
+                    print(f"هشدار: فقط {self.MAX_PAGE_BYTES // 1024} کیلوبایت اول {url} استفاده می‌شود.")
+                    break
+            body = bytes(body[:self.MAX_PAGE_BYTES])
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+        encoding = self._detect_encoding(content_type, body)
+        self.http_cache.put(url, body, params, encoding=encoding, etag=etag, last_modified=last_modified)
+        return body.decode(encoding, errors="replace")
+
+    def _check_content_type(self, url: str, content_type: str):
+        """
+        رد پاسخ‌هایی که متن نیستند (PDF، تصویر، فایل فشرده و ...) پیش از دانلود بدنه
+        """
+        mime = content_type.split(";")[0].strip().lower()
+        if mime and mime not in self.ALLOWED_CONTENT_TYPES:
+            raise ValueError(f"نوع محتوای {mime} برای {url} پشتیبانی نمی‌شود.")
+
+    @classmethod
+    def _detect_encoding(cls, content_type: str, body: bytes) -> str:
+        """
+        کدگذاری متن: charset هدر Content-Type، سپس برچسب meta در ابتدای صفحه و در غیر این صورت UTF-8
+        (پیش‌فرض ISO-8859-1 در requests متن فارسی صفحه‌های بدون charset در هدر را خراب می‌کرد)
+        """
+        match = re.search(r"charset=[\"']?([\w-]+)", content_type, re.I)
+        if match is None:
+            match = cls._CHARSET.search(body[:4096])
+        encoding = match.group(1) if match else "utf-8"
+        if isinstance(encoding, bytes):
+            encoding = encoding.decode("ascii")
+        try:
+            "".encode(encoding)
+        except LookupError:
+            encoding = "utf-8"
+        return encoding
+
+    def search(self, query: str, max_results: int = 2, use_index: bool = True) -> str:
         """
         جستجو در وب و استخراج متن‌های مرتبط با استفاده از مدل زبانی
+        ابتدا نمایه محلی صفحه‌های قبلاً دریافت‌شده بررسی می‌شود و فقط اگر نتایج آن کافی نباشد جستجوی آنلاین انجام می‌شود.
         """
+        if use_index:
+            local = self._search_local(query)
+            if local:
+                return local
         if self.api_key and self.cx:
             return self._search_with_api(query, max_results)
         else:
             return self._search_with_scraping(query, max_results)
 
-    def _extract_relevant_text(self, full_text: str, query: str) -> str:
+    def _search_local(self, query: str) -> str:
+        """
+        جستجو در نمایه محلی صفحه‌ها
+        Returns:
+            str: نتایج قالب‌بندی‌شده یا رشته خالی اگر نتایج کافی نباشد
+        """
+        try:
+            query_vector = self.ollama_api.get_embeddings_batch([query], model=self.embedding_model)[0]
+        except Exception as e:
+            print(f"خطا در جستجوی نمایه محلی وب: {e}")
+            return ""
+        local = self._format_local_results(self.web_index.search(query_vector, self.TOP_K, self.LOCAL_THRESHOLD))
+        if local:
+            # زمان استفاده صفحه‌ها برای حذف LRU ذخیره می‌شود
+            self.web_index.flush()
+        return local
+
+    @classmethod
+    def _format_local_results(cls, hits: list) -> str:
+        """
+        قالب‌بندی نتایج نمایه محلی مانند نتایج جستجوی آنلاین؛ اگر تعداد جمله‌ها کمتر از LOCAL_MIN_HITS باشد رشته خالی
+        """
+        if sum(len(sentences) for _, sentences in hits) < cls.LOCAL_MIN_HITS:
+            return ""
+        print(f"📚 پاسخ از نمایه محلی صفحه‌های وب ({len(hits)} صفحه)")
+        return "\n\n".join(
+            f"نتیجه {i}:\nمحتوا: {' '.join(sentences)}" for i, (_, sentences) in enumerate(hits, 1)
+        )
+
+    def _extract_relevant_text(self, full_text: str, query: str, url: str = None) -> str:
         """
         استخراج متن‌های مرتبط با سوال کاربر با استفاده از مدل زبانی
         Args:
             full_text: متن کامل استخراج‌شده از وب‌سایت
             query: سوال کاربر
+            url: نشانی صفحه؛ در صورت وجود جمله‌ها و embedding‌های آن به نمایه محلی افزوده می‌شوند
         Returns:
             str: متن‌های مرتبط
         """
         try:
-            # ارسال متن کامل و سوال به مدل زبانی
-            embedding = self.ollama_api.get_embedding(query, model=self.embedding_model)  # ارسال مدل مخصوص
-            sentences = full_text.split(". ")  # تقسیم متن به جملات
-            relevant_sentences = []
-
-            for sentence in sentences:
-                sentence_embedding = self.ollama_api.get_embedding(sentence, model=self.embedding_model)  # ارسال مدل مخصوص
-                # محاسبه شباهت بین embedding سوال و جمله
-                similarity = sum(a * b for a, b in zip(embedding, sentence_embedding))
-                if similarity > 0.5:  # کاهش آستانه شباهت برای استخراج متن‌های بیشتر
-                    relevant_sentences.append(sentence)
-
-            # افزایش تعداد کاراکترهای پردازش‌شده
-            return ". ".join(relevant_sentences[:50])  # محدود کردن به 50 جمله مرتبط
+            sentences = self._candidate_sentences(full_text, query)
+            if not sentences:
+                return ""
+            # دریافت embedding سوال و جمله‌های باقی‌مانده از پیش‌فیلتر با درخواست‌های دسته‌ای
+            all_embeddings = self.ollama_api.get_embeddings_batch([query] + sentences, model=self.embedding_model)
+            if url:
+                self.web_index.add_page(url, sentences, all_embeddings[1:])
+            return self._select_relevant_sentences(sentences, all_embeddings)
         except Exception as e:
             print(f"خطا در استخراج متن‌های مرتبط: {e}")
             return ""
 
+    @classmethod
+    def _candidate_sentences(cls, full_text: str, query: str) -> list:
+        """
+        پیش‌فیلتر ارزان جمله‌ها پیش از محاسبه embedding
+        جمله‌های کوتاه و تکراری حذف می‌شوند و اگر تعداد جمله‌ها از MAX_CANDIDATES بیشتر باشد، جمله‌هایی
+        که واژه‌های مشترک بیشتری با سوال دارند (و در تساوی، جمله‌های ابتدای صفحه) نگه داشته می‌شوند.
+        Returns:
+            list: جمله‌های منتخب به ترتیب متن
+        """
+        sentences, remainder = TextProcessor.split_sentences(full_text + " ", min_chars=cls.MIN_SENTENCE_CHARS)
+        if len(remainder.strip()) >= cls.MIN_SENTENCE_CHARS:
+            sentences.append(remainder.strip())
+
+        query_terms = set(TextProcessor.tokenize(query))
+        seen = set()
+        scored = []
+        for position, sentence in enumerate(sentences):
+            sentence = sentence[:cls.MAX_SENTENCE_CHARS]
+            key = TextProcessor.normalize_persian(sentence)
+            if key in seen:
+                continue
+            seen.add(key)
+            overlap = len(query_terms.intersection(TextProcessor.tokenize(sentence)))
+            scored.append((-overlap, position, sentence))
+
+        kept = sorted(scored)[:cls.MAX_CANDIDATES]
+        return [sentence for _, _, sentence in sorted(kept, key=lambda item: item[1])]
+
+    @classmethod
+    def _select_relevant_sentences(cls, sentences: list, all_embeddings: list) -> str:
+        """
+        انتخاب TOP_K جمله با بیشترین شباهت کسینوسی به سوال (اولین بردار) با یک ضرب ماتریسی
+        جمله‌هایی که embedding آن‌ها دریافت نشده کنار گذاشته می‌شوند و جمله‌های منتخب به ترتیب متن برگردانده می‌شوند.
+        """
+        query = np.asarray(all_embeddings[0], dtype=np.float32)
+        available = [i for i, vector in enumerate(all_embeddings[1:]) if len(vector) == len(query)]
+        if not query.size or not available:
+            return ""
+
+        matrix = np.asarray([all_embeddings[i + 1] for i in available], dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = matrix @ query
+
+        k = min(cls.TOP_K, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[scores[top] >= cls.SIMILARITY_THRESHOLD]
+        return " ".join(sentences[available[i]] for i in sorted(top))
+
+    @staticmethod
+    def _format_api_results(data: dict) -> str:
+        """
+        تبدیل پاسخ Google Custom Search به متن نتایج
+        """
+        if 'items' not in data:
+            return "متاسفانه نتیجه‌ای یافت نشد. لطفاً سوال خود را به شکل دیگری مطرح کنید."
+
+        results_text = ""
+        for i, item in enumerate(data['items'], 1):
+            snippet = item.get('snippet', 'بدون توضیح')
+            # افزایش طول توضیحات به 500 کاراکتر
+            if len(snippet) > 500:
+                snippet = snippet[:500] + "..."
+            results_text += f"نتیجه {i}:\nمحتوا: {snippet}\n\n"  # حذف لینک از خروجی
+
+        return results_text.strip()
+
+    @staticmethod
+    def _parse_result_links(html: str, max_results: int) -> list:
+        """
+        استخراج لینک‌های واقعی نتایج از صفحه نتایج جستجوی گوگل
+        """
+        soup = BeautifulSoup(html, 'lxml')
+        search_results = []
+
+        for link in soup.select('a'):
+            href = link.get('href')
+            if href and "/url?q=" in href:
+                # استخراج لینک واقعی
+                actual_url = href.split("/url?q=")[1].split("&")[0]
+                search_results.append(actual_url)
+                if len(search_results) >= max_results:
+                    break
+        return search_results
+
+    @classmethod
+    def _page_text(cls, html: str) -> str:
+        """
+        استخراج متن اصلی یک صفحه HTML با parser سریع lxml
+        بخش‌های غیرمتنی و حاشیه‌ای (اسکریپت، منو، فوتر، تبلیغ، ...) حذف می‌شوند و سپس متن اصلی از article/main
+        یا در نبود آن‌ها از عنصری که بیشترین متن پاراگرافی را در خود دارد برداشته می‌شود.
+        Returns:
+            str: متن اصلی؛ هر بلوک (پاراگراف، عنوان، آیتم فهرست) در یک سطر
+        """
+        try:
+            root = lxml.html.fromstring(html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+        except (etree.ParserError, ValueError):
+            return ""
+
+        etree.strip_elements(root, *cls.NON_CONTENT_TAGS, etree.Comment, with_tail=False)
+        for element in root.xpath("//header[not(ancestor::article)] | //footer[not(ancestor::article)]"):
+            element.drop_tree()
+        for element in root.xpath("//*[@class or @id]"):
+            if element.tag in ("html", "body", "article", "main") or element.getparent() is None:
+                continue
+            names = f"{element.get('class', '')} {element.get('id', '')}"
+            if cls._BOILERPLATE.search(names) and not cls._CONTENT_HINT.search(names):
+                element.drop_tree()
+
+        main = max(root.xpath("//article | //main | //*[@role='main']"),
+                   key=lambda element: len(element.text_content()), default=None)
+        if main is None or len(main.text_content().strip()) < cls.MIN_MAIN_TEXT:
+            # امتیاز هر عنصر: طول پاراگراف‌های فرزند (و نصف آن برای عنصر بالاتر)
+            scores = {}
+            for paragraph in root.iter("p"):
+                length = len(paragraph.text_content().strip())
+                parent = paragraph.getparent()
+                if length < 40 or parent is None:
+                    continue
+                scores[parent] = scores.get(parent, 0) + length
+                if parent.getparent() is not None:
+                    scores[parent.getparent()] = scores.get(parent.getparent(), 0) + length / 2
+            best = max(scores, key=scores.get, default=None)
+            main = best if best is not None and scores[best] >= cls.MIN_MAIN_TEXT else root
+
+        # شکست سطر بعد از هر بلوک تا عنوان‌ها و آیتم‌ها به جمله بعدی نچسبند
+        for element in main.iter(*cls.BLOCK_TAGS):
+            element.tail = "\n" + (element.tail or "")
+        lines = (" ".join(line.split()) for line in main.text_content().splitlines())
+        return "\n".join(line for line in lines if line)
+
     def _search_with_api(self, query: str, max_results: int) -> str:
         """
         جستجو با استفاده از Google Custom Search JSON API
@@ -71,53 +349,67 @@ class WebSearcher:
                 'cx': self.cx,
                 'num': max_results,
             }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-
-            if 'items' not in data:
-                return "متاسفانه نتیجه‌ای یافت نشد. لطفاً سوال خود را به شکل دیگری مطرح کنید."
-
-            results_text = ""
-            for i, item in enumerate(data['items'], 1):
-                snippet = item.get('snippet', 'بدون توضیح')
-                # افزایش طول توضیحات به 500 کاراکتر
-                if len(snippet) > 500:
-                    snippet = snippet[:500] + "..."
-                results_text += f"نتیجه {i}:\nمحتوا: {snippet}\n\n"  # حذف لینک از خروجی
-
-            return results_text.strip()
+            return self._format_api_results(json.loads(self._get_text(url, params=params)))
 
         except Exception as e:
             print(f"خطا در جستجوی وب با API: {e}")
             return "خطا در جستجوی وب با API. لطفاً دوباره تلاش کنید."
 
+    def _fetch_result(self, url: str, query: str) -> str:
+        """
+        دریافت یک صفحه نتیجه (از کش HTTP یا شبکه) و استخراج متن مرتبط آن
+        """
+        full_text = self._page_text(self._get_text(url))
+        return self._extract_relevant_text(full_text, query, url)
+
+    def _fetch_results(self, urls: list, query: str, deadline: float = None) -> list:
+        """
+        دریافت همزمان صفحه‌ها با حداکثر FETCH_WORKERS کارگر
+        استخراج متن مرتبط هر صفحه بلافاصله پس از دریافت همان صفحه در همان کارگر انجام می‌شود.
+        Args:
+            deadline: حداکثر زمان انتظار (ثانیه)؛ صفحه‌هایی که تا این زمان آماده نشده‌اند کنار گذاشته می‌شوند
+        Returns:
+            list: متن مرتبط هر نشانی به ترتیب urls (برای صفحه‌های ناموفق یا دیررس None)
+        """
+        deadline = self.FETCH_DEADLINE if deadline is None else deadline
+        results = [None] * len(urls)
+        if not urls:
+            return results
+
+        executor = ThreadPoolExecutor(max_workers=min(self.FETCH_WORKERS, len(urls)), thread_name_prefix="fetch")
+        futures = {executor.submit(self._fetch_result, url, query): i for i, url in enumerate(urls)}
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"خطا در پردازش لینک {urls[i]}: {e}")
+        except FuturesTimeoutError:
+            ready = sum(1 for result in results if result is not None)
+            print(f"⏱️ مهلت {deadline:.0f} ثانیه‌ای دریافت صفحه‌ها تمام شد؛ "
+                  f"از {ready} صفحه از {len(urls)} صفحه استفاده می‌شود.")
+        finally:
+            # کارگرهای در حال اجرا با timeout درخواست‌ها پایان می‌یابند؛ منتظر آن‌ها نمی‌مانیم
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
     def _search_with_scraping(self, query: str, max_results: int) -> str:
         """
-        جستجو با استفاده از روش scraping و استخراج متن‌های مرتبط
+        جستجو با استفاده از روش scraping و دریافت همزمان صفحه‌های نتایج
         """
         try:
             # ارسال درخواست به گوگل
-            url = f"https://www.google.com/search?q={query}&num={max_results}"
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
+            url = f"https://www.google.com/search?q={quote_plus(query)}&num={max_results}"
+            html = self._get_text(url)
             
             # بررسی پاسخ نامعتبر از گوگل
-            if "did not match any documents" in response.text or "captcha" in response.text:
+            if "did not match any documents" in html or "captcha" in html:
+                self.http_cache.invalidate(url)
                 return "گوگل درخواست شما را مسدود کرده است یا نتیجه‌ای یافت نشد. لطفاً دوباره تلاش کنید یا از یک سرویس جایگزین استفاده کنید."
             
             # پردازش HTML صفحه نتایج جستجو
-            soup = BeautifulSoup(response.text, 'html.parser')
-            search_results = []
-            
-            for link in soup.select('a'):
-                href = link.get('href')
-                if href and "/url?q=" in href:
-                    # استخراج لینک واقعی
-                    actual_url = href.split("/url?q=")[1].split("&")[0]
-                    search_results.append(actual_url)
-                    if len(search_results) >= max_results:
-                        break
+            search_results = self._parse_result_links(html, max_results)
             
             if not search_results:
                 return (
@@ -125,36 +417,13 @@ class WebSearcher:
                     "یا از یک API رسمی مانند Google Custom Search JSON API استفاده کنید."
                 )
             
-            # استخراج متن از لینک‌ها
+            # دریافت همزمان صفحه‌ها و استخراج متن‌های مرتبط
+            relevant_texts = self._fetch_results(search_results, query)
+            self.web_index.flush()
             results_text = ""
-            for i, url in enumerate(search_results, 1):
-                try:
-                    # تأخیر تصادفی بین درخواست‌ها
-                    time.sleep(random.uniform(2, 5))
-                    
-                    response = requests.get(url, headers=self.headers, timeout=10)
-                    response.raise_for_status()
-                    
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # حذف اسکریپت‌ها و استایل‌ها
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    
-                    # استخراج متن اصلی
-                    text = soup.get_text()
-                    lines = (line.strip() for line in text.splitlines())
-                    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                    full_text = ' '.join(chunk for chunk in chunks if chunk)
-                    
-                    # حذف لینک‌ها و استخراج متن‌های مرتبط
-                    relevant_text = self._extract_relevant_text(full_text, query)
-                    
+            for i, relevant_text in enumerate(relevant_texts, 1):
+                if relevant_text is not None:
                     results_text += f"نتیجه {i}:\nمحتوا: {relevant_text}\n\n"
-                
-                except Exception as e:
-                    print(f"خطا در پردازش لینک {url}: {e}")
-                    continue
             
             return results_text.strip() if results_text else (
                 "متاسفانه نتیجه‌ای یافت نشد. لطفاً سوال خود را به شکل دیگری مطرح کنید "
@@ -166,4 +435,79 @@ class WebSearcher:
             return "خطا در جستجوی وب. لطفاً دوباره تلاش کنید."
 
 
+def main():
+    """
+    نمایش دریافت همزمان صفحه‌ها با یک سرور محلی جایگزین که هم صفحه‌ها و هم endpoint embedding اولاما را شبیه‌سازی می‌کند
+    نشانی‌های 127.0.0.1 و localhost دو میزبان جدا حساب می‌شوند؛ یکی از صفحه‌ها از مهلت کلی کندتر است.
+    """
+    import re
+    import json
+    import time
+    import hashlib
+    import tempfile
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from request_ollama.ollama_api import OllamaAPI
+
+    def embed(text: str) -> list:
+        vector = [0.0] * 64
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+        return vector
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            delay = float(self.path.rsplit("/", 1)[-1])
+            time.sleep(delay)
+            body = (
+                "<html><body><nav>Home About Contact</nav><p>"
+                + "Filler text about unrelated things goes here. " * 20
+                + f"Solar panel efficiency on this page was measured after {delay} seconds of waiting.</p></body></html>"
+            ).encode("utf-8")
+            self._reply(body, "text/html; charset=utf-8")
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            self._reply(json.dumps({"embeddings": [embed(text) for text in payload["input"]]}).encode(), "application/json")
+
+        def _reply(self, body: bytes, content_type: str):
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    searcher = WebSearcher()
+    searcher.ollama_api = OllamaAPI(base_url=f"http://127.0.0.1:{port}", use_cache=False)
+    searcher.http_cache = HttpCache(disk_path=":memory:")
+    # صفحه‌های ساختگی نباید وارد نمایه محلی واقعی شوند
+    index_dir = tempfile.TemporaryDirectory()
+    searcher.web_index = WebIndex(base_path=os.path.join(index_dir.name, "web"), embedding_model=searcher.embedding_model)
+    searcher.HOST_RATE = 2.0
+    delays = [0.5, 1.0, 0.2, 30.0, 0.8, 1.5]
+    urls = [f"http://{'127.0.0.1' if i % 2 == 0 else 'localhost'}:{port}/page/{delay}" for i, delay in enumerate(delays)]
+
+    started = time.perf_counter()
+    results = searcher._fetch_results(urls, "solar panel efficiency", deadline=5.0)
+    elapsed = time.perf_counter() - started
+
+    for url, result in zip(urls, results):
+        print(f"{url:<40} {'✅ ' + result[:60] if result else '❌ دیررس یا ناموفق'}")
+    # روش قبلی: دریافت پشت‌سرهم با تأخیر تصادفی ۲ تا ۵ ثانیه پیش از هر صفحه و timeout ده‌ثانیه‌ای
+    sequential = sum(min(delay, 10.0) + 3.5 for delay in delays)
+    print(f"\nزمان کل: {elapsed:.1f} ثانیه (دریافت پشت‌سرهم قبلی: حدود {sequential:.0f} ثانیه)")
+    server.shutdown()
+    index_dir.cleanup()
+
 
+if __name__ == "__main__":
+    main()